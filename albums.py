@@ -0,0 +1,60 @@
+"""
+Сборка альбомов (media group)
+
+Telegram присылает каждое фото альбома отдельным обновлением. Коллектор
+собирает сообщения с одинаковым media_group_id, пока они приходят чаще
+заданного окна, и передаёт их обработчику одной пачкой.
+"""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Set
+
+from aiogram.types import Message
+
+logger = logging.getLogger(__name__)
+
+AlbumHandler = Callable[[List[Message]], Awaitable[None]]
+
+class AlbumCollector:
+    def __init__(self, handler: AlbumHandler, window: float = 0.6):
+        self.handler = handler
+        self.window = window
+        self._albums: Dict[str, List[Message]] = {}
+        self._last_seen: Dict[str, float] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def add(self, message: Message):
+        """Добавить сообщение альбома; обработка начнётся после паузы в окно"""
+        loop = asyncio.get_running_loop()
+        group_id = message.media_group_id
+        self._last_seen[group_id] = loop.time()
+        if group_id in self._albums:
+            self._albums[group_id].append(message)
+            return
+        self._albums[group_id] = [message]
+        task = asyncio.create_task(self._flush_later(group_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def stop(self):
+        """Дождаться обработки всех собираемых альбомов"""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _flush_later(self, group_id: str):
+        loop = asyncio.get_running_loop()
+        # Окно продлевается, пока приходят новые фото альбома
+        while True:
+            delay = self._last_seen[group_id] + self.window - loop.time()
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+
+        messages = self._albums.pop(group_id)
+        del self._last_seen[group_id]
+        messages.sort(key=lambda m: m.message_id)
+        try:
+            await self.handler(messages)
+        except Exception:
+            logger.exception("Ошибка обработки альбома %s", group_id)
@@ -0,0 +1,227 @@
+"""
+Резервное копирование и архивирование
+
+Копия bot.db снимается онлайн через backup API SQLite отдельным соединением
+в потоке: страницы копируются небольшими порциями с паузами, а в режиме WAL
+чтение копии не блокирует запись, поэтому обработчики не простаивают. Если
+бот меняет БД между порциями, SQLite начинает копирование заново; после
+нескольких таких перезапусков копия снимается за один шаг (в WAL это одна
+читающая транзакция, запись при этом продолжается). Копия проверяется
+(quick_check), сжимается gzip и хранится в backup_dir, старые удаляются.
+
+Завершённые участия в выключенных заданиях старше срока хранения переносятся
+в сжатую таблицу participations_archive, а их файлы скриншотов - в архивы
+tar.gz в archive_dir, после чего удаляются из папки скриншотов.
+
+Восстановление (бот должен быть остановлен):
+    python backup.py restore backups/bot-20240101-030000.db.gz
+"""
+
+import argparse
+import asyncio
+import glob
+import gzip
+import logging
+import os
+import shutil
+import sqlite3
+import tarfile
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from database import Database
+from screenshot_store import ScreenshotStore
+
+logger = logging.getLogger(__name__)
+
+# Страниц за один шаг копирования (по 4 КБ) и пауза между шагами (секунды)
+BACKUP_PAGES = 256
+BACKUP_STEP_PAUSE = 0.005
+# После стольких перезапусков копирования копия снимается за один шаг
+BACKUP_MAX_RESTARTS = 3
+
+class _Restarted(Exception):
+    """Копирование слишком часто начинается заново из-за записей в БД"""
+
+def copy_database(
+    source_path: str,
+    target_path: str,
+    pages: int = BACKUP_PAGES,
+    step_pause: float = BACKUP_STEP_PAUSE,
+    max_restarts: int = BACKUP_MAX_RESTARTS,
+):
+    """Снять копию БД через backup API (блокирующая функция, вызывается в потоке)"""
+    restarts = 0
+    last_remaining = None
+
+    def progress(status, remaining, total):
+        nonlocal restarts, last_remaining
+        if last_remaining is not None and remaining > last_remaining:
+            restarts += 1
+            if restarts > max_restarts:
+                raise _Restarted
+        last_remaining = remaining
+        time.sleep(step_pause)
+
+    source = sqlite3.connect(source_path)
+    try:
+        target = sqlite3.connect(target_path)
+        try:
+            try:
+                source.backup(target, pages=pages, progress=progress)
+            except _Restarted:
+                logger.info("БД часто меняется, копия снимается за один шаг")
+                source.backup(target)
+            result = target.execute("PRAGMA quick_check").fetchone()[0]
+            if result != "ok":
+                raise sqlite3.DatabaseError(f"Копия БД повреждена: {result}")
+        finally:
+            target.close()
+    finally:
+        source.close()
+
+def gzip_file(source_path: str, target_path: str):
+    with open(source_path, "rb") as source, gzip.open(target_path, "wb", compresslevel=6) as target:
+        shutil.copyfileobj(source, target, 1024 * 1024)
+
+def restore_database(backup_path: str, db_path: str):
+    """Восстановить БД из копии (.db или .db.gz); бот должен быть остановлен"""
+    tmp_path = f"{db_path}.restore"
+    if backup_path.endswith(".gz"):
+        with gzip.open(backup_path, "rb") as source, open(tmp_path, "wb") as target:
+            shutil.copyfileobj(source, target, 1024 * 1024)
+    else:
+        shutil.copyfile(backup_path, tmp_path)
+    try:
+        check = sqlite3.connect(tmp_path)
+        try:
+            result = check.execute("PRAGMA quick_check").fetchone()[0]
+        finally:
+            check.close()
+        if result != "ok":
+            raise sqlite3.DatabaseError(f"Копия БД повреждена: {result}")
+        # Через backup API, а не копированием файла: старые -wal и -shm не смешаются с копией
+        copy_database(tmp_path, db_path, pages=-1, step_pause=0)
+    finally:
+        os.remove(tmp_path)
+
+class BackupManager:
+    def __init__(
+        self,
+        db: Database,
+        store: ScreenshotStore,
+        backup_dir: str = "backups",
+        archive_dir: str = "archive",
+        interval: float = 24 * 3600,
+        keep: int = 7,
+        archive_after_days: int = 90,
+    ):
+        self.db = db
+        self.store = store
+        self.backup_dir = backup_dir
+        self.archive_dir = archive_dir
+        self.interval = interval
+        self.keep = keep
+        self.archive_after_days = archive_after_days
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def backup(self) -> str:
+        """Снять копию БД и вернуть путь к ней"""
+        async with self._lock:
+            os.makedirs(self.backup_dir, exist_ok=True)
+            name = f"bot-{datetime.now().strftime('%Y%m%d-%H%M%S')}.db"
+            tmp_path = os.path.join(self.backup_dir, f"{name}.part")
+            path = os.path.join(self.backup_dir, f"{name}.gz")
+            started = time.monotonic()
+            try:
+                await asyncio.to_thread(copy_database, self.db.db_path, tmp_path)
+                await asyncio.to_thread(gzip_file, tmp_path, f"{path}.part")
+                os.replace(f"{path}.part", path)
+            finally:
+                for leftover in (tmp_path, f"{path}.part"):
+                    if os.path.exists(leftover):
+                        os.remove(leftover)
+            logger.info("Резервная копия %s снята за %.1f с", path, time.monotonic() - started)
+            self._rotate()
+            return path
+
+    def _rotate(self):
+        backups = sorted(glob.glob(os.path.join(self.backup_dir, "bot-*.db.gz")))
+        for path in backups[:-self.keep] if self.keep > 0 else []:
+            os.remove(path)
+
+    async def archive(self, batch_size: int = 500) -> int:
+        """Перенести в архив участия старше срока хранения, вернуть их количество"""
+        if self.archive_after_days <= 0:
+            return 0
+        async with self._lock:
+            before = (datetime.now() - timedelta(days=self.archive_after_days)).isoformat()
+            total = 0
+            while True:
+                # Имя архива файлов записывается в участие до переноса файлов
+                name = f"screenshots-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{total}.tar.gz"
+                count, hashes = await self.db.archive_participations(before, name, batch_size)
+                total += count
+                if hashes:
+                    # Картинку могли прислать снова, пока шёл перенос - такие файлы не трогаем
+                    hashes = set(hashes) - set(await self.db.get_referenced_hashes(hashes))
+                    await asyncio.to_thread(self._archive_files, name, sorted(hashes))
+                if count < batch_size:
+                    break
+            if total:
+                logger.info("В архив перенесено участий: %s", total)
+            return total
+
+    def _archive_files(self, name: str, hashes: List[str]):
+        """Сложить файлы скриншотов в tar.gz и удалить их из хранилища"""
+        paths = [path for path in map(self.store.path_for, hashes) if os.path.exists(path)]
+        if not paths:
+            return
+        os.makedirs(self.archive_dir, exist_ok=True)
+        target = os.path.join(self.archive_dir, name)
+        with tarfile.open(f"{target}.part", "w:gz") as archive:
+            for path in paths:
+                archive.add(path, arcname=os.path.basename(path))
+        os.replace(f"{target}.part", target)
+        # Удаляем только после того, как архив полностью записан
+        for path in paths:
+            os.remove(path)
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.backup()
+                await self.archive()
+            except Exception:
+                logger.exception("Ошибка резервного копирования")
+
+def main():
+    parser = argparse.ArgumentParser(description="Резервные копии bot.db")
+    parser.add_argument("--db", default="bot.db", help="путь к базе данных")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="список резервных копий").add_argument("--dir", default="backups")
+    restore = commands.add_parser("restore", help="восстановить БД из копии (бот должен быть остановлен)")
+    restore.add_argument("backup", help="файл копии (.db или .db.gz)")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for path in sorted(glob.glob(os.path.join(args.dir, "bot-*.db.gz"))):
+            print(f"{path}\t{os.path.getsize(path) // 1024} КБ")
+        return
+    restore_database(args.backup, args.db)
+    print(f"✅ База данных {args.db} восстановлена из {args.backup}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Бенчмарк: долгоживущие соединения Database против соединения на каждый запрос
+
+Сравнивает запросов в секунду для чтения участника и обновления его строки
+при разном числе одновременных обработчиков. «Соединение на запрос» повторяет
+прежнюю реализацию: aiosqlite.connect на каждый вызов, без PRAGMA и с commit().
+
+    python -m benchmarks.bench_connections --queries 2000 --concurrency 1 10 50
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from typing import Awaitable, Callable, List
+
+import aiosqlite
+
+from database import Database
+
+SELECT_PARTICIPANT = "SELECT * FROM participants WHERE user_id = ?"
+UPDATE_PARTICIPANT = "UPDATE participants SET username = ? WHERE user_id = ?"
+
+async def per_call_read(db_path: str, user_id: int):
+    async with aiosqlite.connect(db_path) as db:
+        db.row_factory = aiosqlite.Row
+        async with db.execute(SELECT_PARTICIPANT, (user_id,)) as cursor:
+            row = await cursor.fetchone()
+            return dict(row) if row else None
+
+async def per_call_write(db_path: str, user_id: int):
+    async with aiosqlite.connect(db_path) as db:
+        await db.execute(UPDATE_PARTICIPANT, (f"user{random.random()}", user_id))
+        await db.commit()
+
+async def pooled_read(db: Database, user_id: int):
+    return await db._fetchone(SELECT_PARTICIPANT, (user_id,))
+
+async def pooled_write(db: Database, user_id: int):
+    async with db._transaction() as connection:
+        await connection.execute(UPDATE_PARTICIPANT, (f"user{random.random()}", user_id))
+
+async def measure(operation: Callable[[int], Awaitable], queries: int, concurrency: int, users: int) -> float:
+    """Выполнить queries операций в concurrency обработчиков, вернуть операций в секунду"""
+    remaining = queries
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            await operation(random.randint(1, users))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return queries / (time.perf_counter() - started)
+
+async def main(queries: int, concurrency: List[int], users: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "bench.db"))
+        await db.init_db()
+        try:
+            for user_id in range(1, users + 1):
+                await db.add_participant(user_id, f"user{user_id}", f"User {user_id}")
+
+            cases = [
+                ("чтение", lambda u: per_call_read(db.db_path, u), lambda u: pooled_read(db, u)),
+                ("запись", lambda u: per_call_write(db.db_path, u), lambda u: pooled_write(db, u)),
+            ]
+            print(f"{'операция':<10}{'обработчиков':>14}{'на запрос, q/s':>18}{'пул, q/s':>12}{'ускорение':>12}")
+            for name, per_call, pooled in cases:
+                for level in concurrency:
+                    per_call_qps = await measure(per_call, queries, level, users)
+                    pooled_qps = await measure(pooled, queries, level, users)
+                    print(
+                        f"{name:<10}{level:>14}{per_call_qps:>18.0f}{pooled_qps:>12.0f}"
+                        f"{pooled_qps / per_call_qps:>11.1f}x"
+                    )
+        finally:
+            await db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--queries", type=int, default=2000, help="операций на каждое измерение")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50], help="уровни параллельности")
+    parser.add_argument("--users", type=int, default=1000, help="участников в тестовой БД")
+    args = parser.parse_args()
+    asyncio.run(main(args.queries, args.concurrency, args.users))
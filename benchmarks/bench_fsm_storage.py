@@ -0,0 +1,108 @@
+"""
+Бенчмарк: накладные расходы SQLiteStorage на одно обновление против MemoryStorage
+
+Каждое «обновление» делает то же, что типичный обработчик через FSMContext:
+читает состояние и данные, меняет состояние и дописывает данные. Сравниваются
+MemoryStorage, SQLiteStorage (кэш + запись пачками) и для наглядности та же
+SQLiteStorage с записью в БД на каждое изменение. Отдельно замеряется первое
+обращение пользователя, когда его состояния ещё нет в кэше.
+
+    python -m benchmarks.bench_fsm_storage --updates 20000 --users 2000 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from aiogram.fsm.storage.base import BaseStorage, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from database import Database
+from fsm_storage import SQLiteStorage
+
+STATES = ("ParticipantStates:waiting_for_screenshots", "ParticipantStates:waiting_for_requisites", None)
+
+class WriteThroughStorage(SQLiteStorage):
+    """SQLiteStorage без отложенной записи: каждое изменение сразу пишется в БД"""
+
+    async def set_state(self, key, state=None):
+        await super().set_state(key, state)
+        await self.flush()
+
+    async def set_data(self, key, data):
+        await super().set_data(key, data)
+        await self.flush()
+
+def storage_key(user_id: int) -> StorageKey:
+    return StorageKey(bot_id=1, chat_id=user_id, user_id=user_id)
+
+async def handle_update(storage: BaseStorage, user_id: int, step: int):
+    key = storage_key(user_id)
+    await storage.get_state(key)
+    data = await storage.get_data(key)
+    await storage.set_state(key, STATES[step % len(STATES)])
+    data["step"] = step
+    await storage.set_data(key, data)
+
+async def measure(storage: BaseStorage, updates: int, users: int, concurrency: int) -> float:
+    """Среднее время одного обновления, мкс"""
+    remaining = updates
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            await handle_update(storage, random.randint(1, users), remaining)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return (time.perf_counter() - started) / updates * 1_000_000
+
+def count_writes(db: Database) -> list:
+    """Считать транзакции записи состояний"""
+    calls = []
+    original = db.save_fsm_records
+
+    async def counted(records):
+        calls.append(len(records))
+        return await original(records)
+
+    db.save_fsm_records = counted
+    return calls
+
+async def main(updates: int, users: int, concurrency: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "bench.db"))
+        await db.init_db()
+        writes = count_writes(db)
+        try:
+            print(f"{'хранилище':<28}{'холодный, мкс':>15}{'тёплый, мкс':>14}{'записей в БД':>15}")
+            cases = [
+                ("MemoryStorage", MemoryStorage),
+                ("SQLiteStorage", lambda: SQLiteStorage(db)),
+                ("SQLiteStorage без пачек", lambda: WriteThroughStorage(db)),
+            ]
+            for name, factory in cases:
+                storage = factory()
+                writes.clear()
+                # Первый проход: каждого пользователя ещё нет в кэше
+                cold = await measure(storage, users, users, concurrency)
+                warm = await measure(storage, updates, users, concurrency)
+                await storage.close()
+                transactions = str(len(writes)) if isinstance(storage, SQLiteStorage) else "-"
+                print(f"{name:<28}{cold:>15.1f}{warm:>14.1f}{transactions:>15}")
+                async with db._transaction() as connection:
+                    await connection.execute("DELETE FROM fsm_states")
+        finally:
+            await db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--updates", type=int, default=20000, help="обновлений в тёплом проходе")
+    parser.add_argument("--users", type=int, default=2000, help="пользователей")
+    parser.add_argument("--concurrency", type=int, default=50, help="одновременных обработчиков")
+    args = parser.parse_args()
+    asyncio.run(main(args.updates, args.users, args.concurrency))
@@ -0,0 +1,68 @@
+"""
+Бенчмарк: пропускная способность записи с фиксацией каждой записи и с групповой фиксацией
+
+Одновременные обработчики добавляют скриншоты (вставка строки и увеличение
+счётчика участника). Сравниваются: отдельная транзакция на запись при
+synchronous=NORMAL (в WAL фиксация без fsync), то же при synchronous=FULL
+(fsync на каждую фиксацию) и групповая фиксация (synchronous=FULL, один fsync
+на группу). Результат зависит от диска: запускайте на том же разделе, где
+лежит bot.db (--dir), tmpfs покажет заниженную стоимость fsync.
+
+    python -m benchmarks.bench_group_commit --writes 2000 --concurrency 1 10 50 200 --dir .
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from typing import List, Optional
+
+from database import Database
+
+async def run(folder: str, mode: str, writes: int, concurrency: int) -> float:
+    """Записей в секунду"""
+    path = os.path.join(folder, f"bench-{mode}-{concurrency}.db")
+    db = Database(path, group_commit=mode == "group")
+    await db.init_db()
+    try:
+        if mode == "full":
+            await db._writer.execute("PRAGMA synchronous = FULL")
+        task_id = await db.add_task("Бенчмарк", max_participants=0)
+        for user_id in range(1, concurrency + 1):
+            await db.add_participant(user_id, f"user{user_id}", f"User {user_id}")
+            assert await db.claim_task_slot(user_id, task_id)
+
+        remaining = writes
+
+        async def worker(user_id: int):
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                await db.add_screenshots(user_id, task_id, [(f"file-{remaining}", None)])
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(user_id) for user_id in range(1, concurrency + 1)))
+        return writes / (time.perf_counter() - started)
+    finally:
+        await db.close()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+async def main(writes: int, concurrency: List[int], folder: Optional[str]):
+    with tempfile.TemporaryDirectory(dir=folder) as tmp:
+        print(f"{'обработчиков':<14}{'NORMAL, зап/с':>15}{'FULL, зап/с':>14}{'группа, зап/с':>16}{'группа/FULL':>13}")
+        for level in concurrency:
+            normal = await run(tmp, "normal", writes, level)
+            full = await run(tmp, "full", writes, level)
+            group = await run(tmp, "group", writes, level)
+            print(f"{level:<14}{normal:>15.0f}{full:>14.0f}{group:>16.0f}{group / full:>12.1f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--writes", type=int, default=2000, help="записей на каждое измерение")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50, 200], help="уровни параллельности")
+    parser.add_argument("--dir", default=None, help="папка для временной БД (по умолчанию системная временная)")
+    args = parser.parse_args()
+    asyncio.run(main(args.writes, args.concurrency, args.dir))
@@ -0,0 +1,84 @@
+"""
+Бенчмарк: чтения из БД на один сценарий участника с кэшем участников и без него
+
+Сценарий повторяет вызовы Database из обработчиков bot.py: /start, «Участвовать»,
+несколько скриншотов, «Готово» и реквизиты. Считаются запросы через соединение
+чтения и время сценария; кэш отключается размером 0.
+
+    python -m benchmarks.bench_participant_cache --users 500 --screenshots 3
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from typing import Dict, List
+
+from database import Database
+
+READ_METHODS = ("_fetchone", "_fetchall", "_fetchvalue")
+
+def count_reads(db: Database) -> List[str]:
+    """Считать запросы через соединение чтения"""
+    calls: List[str] = []
+    for name in READ_METHODS:
+        original = getattr(db, name)
+
+        async def counted(*args, _original=original, _name=name, **kwargs):
+            calls.append(_name)
+            return await _original(*args, **kwargs)
+
+        setattr(db, name, counted)
+    return calls
+
+async def participant_flow(db: Database, user_id: int, screenshots: int):
+    # /start
+    await db.add_participant(user_id, f"user{user_id}", f"User {user_id}")
+    await db.get_participant(user_id)
+    # «Участвовать»
+    await db.get_participant(user_id)
+    task = await db.claim_next_task(user_id)
+    assert task is not None
+    # Скриншоты: каждое фото - проверка статуса и добавление
+    for i in range(screenshots):
+        await db.get_participant(user_id)
+        await db.add_screenshots(user_id, task["id"], [(f"file-{user_id}-{i}", None)])
+        await db.get_screenshots_count(user_id)
+    # «Готово», затем реквизиты
+    await db.get_participant(user_id)
+    assert await db.move_to_review(user_id)
+    await db.get_participant(user_id)
+    assert await db.add_requisites(user_id, "4276 0000 0000 0000")
+
+async def run(cache_size: int, users: int, screenshots: int, folder: str) -> Dict:
+    db = Database(os.path.join(folder, f"bench-{cache_size}.db"), participant_cache_size=cache_size)
+    await db.init_db()
+    try:
+        await db.add_task("Бенчмарк", max_participants=0)
+        reads = count_reads(db)
+        started = time.perf_counter()
+        await asyncio.gather(*(participant_flow(db, user_id, screenshots) for user_id in range(1, users + 1)))
+        elapsed = time.perf_counter() - started
+        return {
+            "reads": len(reads) / users,
+            "ms": elapsed / users * 1000,
+            "hit_rate": db.participant_cache_stats()["hit_rate"],
+        }
+    finally:
+        await db.close()
+
+async def main(users: int, screenshots: int, cache_size: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'кэш участников':<20}{'чтений на сценарий':>20}{'мс на сценарий':>16}{'попаданий':>12}")
+        for name, size in (("выключен", 0), (f"{cache_size} записей", cache_size)):
+            result = await run(size, users, screenshots, tmp)
+            print(f"{name:<20}{result['reads']:>20.1f}{result['ms']:>16.2f}{result['hit_rate']:>11.0%}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=500, help="участников, проходящих сценарий одновременно")
+    parser.add_argument("--screenshots", type=int, default=3, help="скриншотов на участника")
+    parser.add_argument("--cache-size", type=int, default=10000, help="размер кэша участников")
+    args = parser.parse_args()
+    asyncio.run(main(args.users, args.screenshots, args.cache_size))
@@ -0,0 +1,88 @@
+"""
+Бенчмарк: задержка цикла событий во время проверки скриншотов
+
+Пока проверяются 100 картинок, фоновая задача каждые 10 мс просыпается и
+замеряет, на сколько позже срока её разбудили, - так обработчики остальных
+пользователей ощущают загрузку. Сравниваются проверка прямо в цикле событий
+и ScreenshotValidator с пулом процессов.
+
+    python -m benchmarks.bench_validation --images 100 --workers 2
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from typing import List
+
+from PIL import Image
+
+from validation import ScreenshotValidator, validate_image
+
+PROBE_INTERVAL = 0.01
+
+def make_images(folder: str, count: int) -> List[str]:
+    """Картинки размером со скриншот телефона с шумом (чтобы не были пустыми и размытыми)"""
+    paths = []
+    for i in range(count):
+        noise = Image.effect_noise((1080, 2340), 40 + i % 20).convert("RGB")
+        path = os.path.join(folder, f"{i}.jpg")
+        noise.save(path, quality=85)
+        paths.append(path)
+    return paths
+
+async def probe(lags: List[float], stop: asyncio.Event):
+    """Замерять опоздание пробуждений цикла событий"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + PROBE_INTERVAL
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append(max(0.0, loop.time() - expected))
+
+async def in_loop(paths: List[str]):
+    for path in paths:
+        validate_image(path)
+        # Уступаем циклу между картинками, как делал бы обработчик
+        await asyncio.sleep(0)
+
+async def in_pool(paths: List[str], workers: int):
+    validator = ScreenshotValidator(workers=workers, timeout=60)
+    validator.start()
+    try:
+        results = await asyncio.gather(*(validator.validate(path) for path in paths))
+    finally:
+        validator.stop()
+    assert all(result["verdict"] == "ok" for result in results), results[:3]
+
+async def measure(name: str, job) -> None:
+    lags: List[float] = []
+    stop = asyncio.Event()
+    probe_task = asyncio.create_task(probe(lags, stop))
+    started = time.perf_counter()
+    await job
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe_task
+    lags_ms = sorted(lag * 1000 for lag in lags) or [0.0]
+    p99 = lags_ms[min(len(lags_ms) - 1, int(len(lags_ms) * 0.99))]
+    print(
+        f"{name:<22}{elapsed:>9.2f}{statistics.median(lags_ms):>12.1f}"
+        f"{p99:>12.1f}{lags_ms[-1]:>12.1f}"
+    )
+
+async def main(images: int, workers: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"Готовим {images} картинок...")
+        paths = make_images(tmp, images)
+        print(f"{'режим':<22}{'время, с':>9}{'p50, мс':>12}{'p99, мс':>12}{'max, мс':>12}")
+        await measure("в цикле событий", in_loop(paths))
+        await measure(f"пул из {workers} процессов", in_pool(paths, workers))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--images", type=int, default=100, help="сколько картинок проверить")
+    parser.add_argument("--workers", type=int, default=2, help="процессов в пуле")
+    args = parser.parse_args()
+    asyncio.run(main(args.images, args.workers))
@@ -5,31 +5,126 @@
 Для полной версии требуется доработка и тестирование.
 
 TODO:
-- Добавить валидацию скриншотов
-- Реализовать систему уведомлений администраторам
-- Добавить экспорт данных в Excel/CSV
 - Улучшить обработку ошибок
 - Добавить логирование действий
 """
 
 import asyncio
+import logging
 import os
+import time
 from aiogram import Bot, Dispatcher, F
-from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton, FSInputFile
+from aiogram.types import (
+    Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton, FSInputFile, InputMediaPhoto,
+)
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from aiogram.fsm.storage.memory import MemoryStorage
-from database import Database
-from config import BOT_TOKEN, ADMIN_IDS, FOLDERS
+from typing import Dict, List, Optional, Tuple
+from albums import AlbumCollector
+from backup import BackupManager
+from broadcast import Broadcaster
+from database import Database, FINISHED_STATUSES
+from fsm_storage import SQLiteStorage
+from notifications import AdminNotifier, EVENT_REVIEW, EVENT_PAYMENT, EVENT_SOLD_OUT
+from downloads import DownloadJob, ScreenshotDownloader
+from screenshot_store import ScreenshotStore
+from validation import ScreenshotValidator, VERDICT_REJECTED
+from thumbnails import ContactSheetCache
+from throttling import ThrottlingMiddleware
+from export import EXPORT_USAGE, export_to_file, parse_export_args
+from scheduler import QuotaScheduler
+from metrics import HandlerMetricsMiddleware, MetricsRegistry, MetricsServer, instrument_database, summary
+from webhook import WebhookServer
+from config import (
+    BOT_TOKEN, ADMIN_IDS, FOLDERS, CACHE_DIR, TASK_SELECTION_POLICY, ADMIN_PAGE_SIZE,
+    DOWNLOAD_WORKERS, DOWNLOAD_QUEUE_SIZE, DOWNLOAD_RETRIES,
+    VALIDATION_WORKERS, VALIDATION_TIMEOUT, BROADCAST_RATE, ADMIN_DIGEST_INTERVAL, ADMIN_DIGEST_BATCH,
+    PARTICIPANT_CACHE_SIZE, PARTICIPANT_CACHE_TTL, DB_GROUP_COMMIT, DB_GROUP_COMMIT_WINDOW_MS, DB_GROUP_COMMIT_MAX,
+    METRICS_PORT, METRICS_HOST, SLOW_QUERY_MS, THROTTLE_PARTICIPATE, THROTTLE_START,
+    QUOTA_UTC_OFFSET, QUOTA_ROLLOVER_HOUR,
+    BACKUP_DIR, BACKUP_INTERVAL_HOURS, BACKUP_KEEP, ARCHIVE_DIR, ARCHIVE_AFTER_DAYS,
+    WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_MAX_IN_FLIGHT,
+    WEBHOOK_MAX_USER_QUEUE,
+)
 
 # Создаём папки если их нет
 for folder in FOLDERS.values():
     os.makedirs(folder, exist_ok=True)
 
 bot = Bot(token=BOT_TOKEN)
-dp = Dispatcher(storage=MemoryStorage())
-db = Database()
+db = Database(
+    participant_cache_size=PARTICIPANT_CACHE_SIZE,
+    participant_ttl=PARTICIPANT_CACHE_TTL,
+    group_commit=DB_GROUP_COMMIT,
+    group_commit_window=DB_GROUP_COMMIT_WINDOW_MS / 1000,
+    group_commit_max=DB_GROUP_COMMIT_MAX,
+)
+metrics = MetricsRegistry()
+instrument_database(db, metrics, slow_threshold=SLOW_QUERY_MS / 1000 if SLOW_QUERY_MS else None)
+storage = SQLiteStorage(db)
+dp = Dispatcher(storage=storage)
+# Флуд отсекается до замеров и до обращений обработчиков к БД
+throttling = ThrottlingMiddleware(ADMIN_IDS)
+dp.message.middleware(throttling)
+dp.callback_query.middleware(throttling)
+dp.message.middleware(HandlerMetricsMiddleware(metrics))
+dp.callback_query.middleware(HandlerMetricsMiddleware(metrics))
+screenshot_store = ScreenshotStore(FOLDERS["pending_review"])
+validator = ScreenshotValidator(workers=VALIDATION_WORKERS, timeout=VALIDATION_TIMEOUT)
+contact_sheets = ContactSheetCache(CACHE_DIR)
+backups = BackupManager(
+    db,
+    screenshot_store,
+    backup_dir=BACKUP_DIR,
+    archive_dir=ARCHIVE_DIR,
+    interval=BACKUP_INTERVAL_HOURS * 3600,
+    keep=BACKUP_KEEP,
+    archive_after_days=ARCHIVE_AFTER_DAYS,
+)
+
+async def store_downloaded_screenshot(job: DownloadJob):
+    """Перенос загруженного скриншота в хранилище, проверка и поиск повторов"""
+    content_hash, file_path = await screenshot_store.store(job.destination)
+    result = await validator.validate(file_path)
+    duplicate_of = await db.set_screenshot_content(
+        job.screenshot_id,
+        content_hash,
+        file_path,
+        phash=result["phash"],
+        verdict=result["verdict"],
+        verdict_reason=result["reason"],
+    )
+    if duplicate_of:
+        logging.warning(
+            "Скриншот #%s совпадает со скриншотом #%s другого участника", job.screenshot_id, duplicate_of
+        )
+    if result["verdict"] == VERDICT_REJECTED:
+        await bot.send_message(
+            job.user_id,
+            f"❌ Скриншот не принят: {result['reason']}.\n"
+            "Пожалуйста, отправьте другой скриншот."
+        )
+
+downloader = ScreenshotDownloader(
+    bot,
+    workers=DOWNLOAD_WORKERS,
+    queue_size=DOWNLOAD_QUEUE_SIZE,
+    retries=DOWNLOAD_RETRIES,
+    on_complete=store_downloaded_screenshot,
+)
+broadcaster = Broadcaster(bot, db, rate=BROADCAST_RATE)
+metrics.gauge("bot_download_queue_depth", lambda: downloader.stats()["queue_depth"], "Файлов в очереди загрузки")
+metrics.gauge("bot_participant_cache_hit_rate", lambda: db.participant_cache_stats()["hit_rate"], "Доля попаданий в кэш участников")
+metrics.gauge("bot_active_broadcasts", broadcaster.active, "Идущих рассылок")
+metrics.gauge("bot_throttled_total", lambda: throttling.throttled, "Отклонённых защитой от флуда запросов")
+notifier = AdminNotifier(bot, ADMIN_IDS, interval=ADMIN_DIGEST_INTERVAL, max_batch=ADMIN_DIGEST_BATCH)
+
+def participate_keyboard() -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="✅ Участвовать в раздаче", callback_data="participate")]
+    ])
 
 # Состояния для FSM
 class ParticipantStates(StatesGroup):
@@ -43,7 +138,7 @@ class AdminStates(StatesGroup):
 
 # ============= ОСНОВНЫЕ КОМАНДЫ =============
 
-@dp.message(Command("start"))
+@dp.message(Command("start"), flags={"throttle": THROTTLE_START})
 async def cmd_start(message: Message, state: FSMContext):
     """Команда /start"""
     user_id = message.from_user.id
@@ -62,40 +157,32 @@ async def cmd_start(message: Message, state: FSMContext):
         )
         return
     
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="✅ Участвовать в раздаче", callback_data="participate")]
-    ])
-    
     await message.answer(
         "👋 Добро пожаловать в бот для раздач по выкупу на ВБ!\n\n"
         "Нажмите кнопку ниже, чтобы принять участие в раздаче.",
-        reply_markup=keyboard
+        reply_markup=participate_keyboard()
     )
 
-@dp.callback_query(F.data == "participate")
+@dp.callback_query(F.data == "participate", flags={"throttle": THROTTLE_PARTICIPATE, "dedup": True})
 async def participate_handler(callback: CallbackQuery, state: FSMContext):
     """Обработка участия в раздаче"""
     user_id = callback.from_user.id
     
-    # Проверяем, не участвует ли уже
+    # Проверяем, не участвует ли уже (после завершённого участия можно взять новое задание)
     participant = await db.get_participant(user_id)
-    if participant and participant["current_task_id"]:
+    if participant and participant["current_task_id"] and participant["status"] not in FINISHED_STATUSES:
         await callback.answer("Вы уже участвуете в раздаче!", show_alert=True)
         return
     
     # Ищем доступное задание
-    tasks = await db.get_all_tasks(active_only=True)
+    tasks = await db.get_active_tasks()
     if not tasks:
         await callback.answer("На данный момент нет доступных заданий.", show_alert=True)
         return
     
-    # Берем первое активное задание
-    task = tasks[0]
-    task_id = task["id"]
-    
-    # Проверяем лимит
-    can_assign = await db.can_assign_task(task_id)
-    if not can_assign:
+    # Занимаем место в первом подходящем задании со свободными местами
+    task = await db.claim_next_task(user_id, TASK_SELECTION_POLICY)
+    if not task:
         await callback.answer(
             "К сожалению, сегодня лимит раздач выполнен.",
             show_alert=True
@@ -103,11 +190,16 @@ async def participate_handler(callback: CallbackQuery, state: FSMContext):
         await callback.message.answer("❌ К сожалению, сегодня лимит раздач выполнен.")
         return
     
-    # Назначаем задание
-    await db.assign_task(user_id, task_id)
-    
     await callback.answer("✅ Вы успешно зарегистрированы!")
     
+    # Участник занял последнее место - сообщаем админам сразу
+    if task["max_participants"] and task["current_participants"] >= task["max_participants"]:
+        notifier.notify(
+            EVENT_SOLD_OUT,
+            f"Задание #{task['id']} распродано ({task['max_participants']} участников)",
+            urgent=True,
+        )
+    
     # Отправляем задание
     await callback.message.answer(
         f"🎯 Ваше задание:\n\n{task['description']}\n\n"
@@ -120,6 +212,16 @@ async def participate_handler(callback: CallbackQuery, state: FSMContext):
 @dp.message(ParticipantStates.waiting_for_screenshots, F.photo)
 async def handle_screenshot(message: Message, state: FSMContext):
     """Обработка скриншотов"""
+    # Фото из альбома собираем и обрабатываем одной пачкой
+    if message.media_group_id:
+        await album_collector.add(message)
+        return
+    
+    await process_screenshots([message])
+
+async def process_screenshots(messages: List[Message]):
+    """Сохранение пачки скриншотов одного участника (одно фото или альбом)"""
+    message = messages[0]
     user_id = message.from_user.id
     participant = await db.get_participant(user_id)
     
@@ -127,46 +229,50 @@ async def handle_screenshot(message: Message, state: FSMContext):
         await message.answer("Сначала зарегистрируйтесь на участие в раздаче.")
         return
     
-    file_id = message.photo[-1].file_id
-    file_info = await bot.get_file(file_id)
-    
-    # TODO: Добавить проверку качества/размера скриншота
+    # Качество и размер скриншотов проверяются в фоне после загрузки
     # TODO: Добавить валидацию что это действительно скриншот выполнения задания
     
-    # Сохраняем файл
-    file_path = os.path.join(
-        FOLDERS["pending_review"],
-        f"{user_id}_{participant['current_task_id']}_{file_info.file_id}.jpg"
-    )
-    await bot.download_file(file_info.file_path, file_path)
-    
-    # Добавляем в БД
-    await db.add_screenshot(
-        user_id,
-        participant["current_task_id"],
-        file_id,
-        file_path
+    photos = [photo_message.photo[-1] for photo_message in messages]
+    
+    # Добавляем в БД одной транзакцией; путь к файлу появится после загрузки
+    screenshots_count, screenshot_ids = await db.add_screenshots(
+        user_id, participant["current_task_id"], [(photo.file_id, None) for photo in photos]
     )
     
-    screenshots_count = await db.get_screenshots_count(user_id)
+    # Файлы загружаются в фоне, пользователь не ждёт окончания загрузки.
+    # Картинка, которая уже загружается для другой записи, не скачивается второй раз:
+    # загрузчик передаст её каждой записи, и у каждой будут свои хэш и проверка
+    for photo, screenshot_id in zip(photos, screenshot_ids):
+        await downloader.enqueue(DownloadJob(
+            photo.file_id, photo.file_unique_id, screenshot_store.incoming_path(screenshot_id),
+            screenshot_id, user_id,
+        ))
     
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="✅ Все скриншоты отправлены", callback_data="screenshots_done")]
     ])
     
+    received_text = "✅ Скриншот получен!" if len(photos) == 1 else f"✅ Получено скриншотов: {len(photos)}!"
     await message.answer(
-        f"✅ Скриншот получен! (Всего: {screenshots_count})\n\n"
+        f"{received_text} (Всего: {screenshots_count})\n\n"
         "Если вы отправили все необходимые скриншоты, нажмите кнопку ниже.",
         reply_markup=keyboard
     )
 
-@dp.callback_query(F.data == "screenshots_done")
+album_collector = AlbumCollector(process_screenshots)
+
+@dp.callback_query(
+    ParticipantStates.waiting_for_screenshots, F.data == "screenshots_done", flags={"dedup": True}
+)
 async def screenshots_done_handler(callback: CallbackQuery, state: FSMContext):
     """Обработка завершения отправки скриншотов"""
     user_id = callback.from_user.id
     
-    await db.move_to_review(user_id)
+    if not await db.move_to_review(user_id):
+        await callback.answer("Ваша заявка уже обработана", show_alert=True)
+        return
     await callback.answer("✅ Скриншоты приняты на проверку!")
+    notifier.notify(EVENT_REVIEW, f"{callback.from_user.full_name} (ID {user_id}) отправил(а) скриншоты")
     
     await callback.message.answer(
         "✅ Ваши скриншоты приняты и отправлены на проверку!\n\n"
@@ -176,6 +282,11 @@ async def screenshots_done_handler(callback: CallbackQuery, state: FSMContext):
     
     await state.set_state(ParticipantStates.waiting_for_requisites)
 
+@dp.callback_query(F.data == "screenshots_done")
+async def stale_screenshots_done_handler(callback: CallbackQuery):
+    """Нажатие старой кнопки после того, как скриншоты уже отправлены на проверку"""
+    await callback.answer("Ваша заявка уже обработана", show_alert=True)
+
 @dp.message(ParticipantStates.waiting_for_requisites)
 async def handle_requisites(message: Message, state: FSMContext):
     """Обработка реквизитов"""
@@ -189,10 +300,12 @@ async def handle_requisites(message: Message, state: FSMContext):
     # TODO: Добавить валидацию формата реквизитов (номер карты, счет и т.д.)
     # TODO: Добавить маскировку чувствительных данных при сохранении
     
-    await db.add_requisites(user_id, requisites)
+    accepted = await db.add_requisites(user_id, requisites)
     await state.clear()
-    
-    # TODO: Отправить уведомление администратору о новом участнике на оплату
+    if not accepted:
+        await message.answer("❌ Ваша заявка уже обработана, реквизиты не требуются.")
+        return
+    notifier.notify(EVENT_PAYMENT, f"{message.from_user.full_name} (ID {user_id}) отправил(а) реквизиты")
     
     await message.answer(
         "✅ Ваши реквизиты получены!\n\n"
@@ -264,6 +377,22 @@ async def process_add_task(message: Message, state: FSMContext):
         reply_markup=keyboard
     )
 
+async def announce_task(task_id: int, admin_chat_id: Optional[int] = None):
+    """Разослать участникам сообщение о новом задании"""
+    task = await db.get_task(task_id)
+    if not task:
+        return
+    await broadcaster.start(
+        f"🆕 Новое задание!\n\n{task['description']}\n\n"
+        "Нажмите кнопку ниже, чтобы принять участие.",
+        task_id=task_id,
+        admin_chat_id=admin_chat_id,
+        reply_markup=participate_keyboard(),
+    )
+
+# Задания, включённые по расписанию, анонсируются так же, как новые
+scheduler = QuotaScheduler(db, QUOTA_UTC_OFFSET, QUOTA_ROLLOVER_HOUR, on_activate=announce_task)
+
 @dp.callback_query(F.data.startswith("task_limit_"))
 async def set_task_limit_handler(callback: CallbackQuery, state: FSMContext):
     """Установка лимита для задания"""
@@ -278,6 +407,8 @@ async def set_task_limit_handler(callback: CallbackQuery, state: FSMContext):
         await callback.message.edit_text(
             f"✅ Задание создано с лимитом: {limit_text}"
         )
+        # Рассылаем, когда задание полностью настроено
+        await announce_task(task_id, callback.message.chat.id)
     else:
         await callback.answer("Ошибка при создании задания", show_alert=True)
     
@@ -308,47 +439,107 @@ async def process_set_limit(message: Message, state: FSMContext):
         await db.update_task_limit(task_id, limit)
         limit_text = "без ограничений" if limit == 0 else f"{limit} человек"
         await message.answer(f"✅ Лимит установлен: {limit_text}")
+        await announce_task(task_id, message.chat.id)
     else:
         await message.answer("❌ Ошибка при установке лимита.")
     
     await state.clear()
 
-@dp.callback_query(F.data == "admin_list_tasks")
-async def admin_list_tasks_handler(callback: CallbackQuery):
-    """Список заданий"""
-    tasks = await db.get_all_tasks(active_only=False)
-    
-    if not tasks:
-        await callback.answer("Нет заданий", show_alert=True)
-        return
+# Фильтры списка заданий: код для callback_data -> (вид в БД, название)
+TASK_FILTERS = {
+    "a": ("active", "✅ Активные"),
+    "s": ("sold_out", "🚫 Распроданные"),
+    "r": ("archived", "🗄 Архив"),
+}
+
+# Отрисованные страницы списка заданий: (фильтр, страница) -> (текст, клавиатура).
+# Действительны, пока не изменилась версия заданий в БД.
+task_list_cache: Dict[Tuple[str, int], Tuple[str, InlineKeyboardMarkup]] = {}
+task_list_cache_version = -1
+
+async def render_task_list(code: str, page: int) -> Tuple[str, InlineKeyboardMarkup]:
+    """Текст и клавиатура страницы списка заданий (из кэша, если задания не менялись)"""
+    global task_list_cache_version
+    version = db.tasks_version
+    if version != task_list_cache_version:
+        task_list_cache.clear()
+        task_list_cache_version = version
+    cached = task_list_cache.get((code, page))
+    if cached is not None:
+        return cached
     
-    keyboard_buttons = []
-    for task in tasks:
-        status = "✅" if task["is_active"] else "❌"
-        limit = f"Лимит: {task['max_participants']}" if task["max_participants"] > 0 else "Без лимита"
-        participants = f"Участников: {task['current_participants']}"
-        keyboard_buttons.append([
-            InlineKeyboardButton(
-                text=f"{status} Задание #{task['id']}",
-                callback_data=f"task_info_{task['id']}"
-            )
-        ])
+    kind, title = TASK_FILTERS[code]
+    result = await db.get_tasks_page(kind, page, ADMIN_PAGE_SIZE)
+    if not result["rows"] and page > 0:
+        # Страница опустела (например, после удаления задания) - показываем предыдущую
+        return await render_task_list(code, page - 1)
     
+    keyboard_buttons = [[
+        InlineKeyboardButton(text=f"• {name}" if key == code else name, callback_data=f"tl_{key}_0")
+        for key, (_, name) in TASK_FILTERS.items()
+    ]]
+    for task in result["rows"]:
+        status = "✅" if task.get("available") else "🚫" if task["is_active"] else "❌"
+        keyboard_buttons.append([InlineKeyboardButton(
+            text=f"{status} #{task['id']} {task['description'][:40]}",
+            callback_data=f"task_info_{task['id']}_{code}_{page}"
+        )])
+    nav_buttons = []
+    if page > 0:
+        nav_buttons.append(InlineKeyboardButton(text="⬅️", callback_data=f"tl_{code}_{page - 1}"))
+    if result["has_next"]:
+        nav_buttons.append(InlineKeyboardButton(text="➡️", callback_data=f"tl_{code}_{page + 1}"))
+    if nav_buttons:
+        keyboard_buttons.append(nav_buttons)
     keyboard_buttons.append([InlineKeyboardButton(text="◀️ Назад", callback_data="admin_back")])
-    keyboard = InlineKeyboardMarkup(inline_keyboard=keyboard_buttons)
     
-    await callback.message.edit_text(
-        "📋 <b>Список заданий:</b>",
-        reply_markup=keyboard,
-        parse_mode="HTML"
-    )
+    pages = max(1, -(-result["total"] // ADMIN_PAGE_SIZE))
+    text = f"📋 <b>Список заданий</b>\n{title}: {result['total']}"
+    if result["total"] == 0:
+        text += "\n\nЗаданий нет"
+    elif pages > 1:
+        text += f"\nСтраница {page + 1} из {pages}"
+    rendered = (text, InlineKeyboardMarkup(inline_keyboard=keyboard_buttons))
+    # Версия могла смениться во время запроса - тогда результат уже устарел
+    if version == db.tasks_version:
+        task_list_cache[(code, page)] = rendered
+    return rendered
+
+async def show_task_list(callback: CallbackQuery, code: str = "a", page: int = 0):
+    text, keyboard = await render_task_list(code, page)
+    try:
+        await callback.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
+    except TelegramBadRequest as e:
+        # Повторное нажатие на текущий фильтр ничего не меняет
+        if "message is not modified" not in e.message:
+            raise
+
+@dp.callback_query(F.data == "admin_list_tasks")
+async def admin_list_tasks_handler(callback: CallbackQuery):
+    """Список заданий"""
+    await show_task_list(callback)
+
+@dp.callback_query(F.data.startswith("tl_"))
+async def task_list_page_handler(callback: CallbackQuery):
+    """Фильтр и страницы списка заданий"""
+    _, code, page = callback.data.split("_")
+    await show_task_list(callback, code, int(page))
+
+def parse_task_callback(data: str) -> Tuple[int, str, int]:
+    """Разобрать task_info_/task_delete_{id}_{фильтр}_{страница}: задание и куда вернуться.
+    
+    Кнопки в старых сообщениях содержат только id - для них возврат на первую страницу активных.
+    """
+    parts = data.split("_")
+    if len(parts) == 5 and parts[3] in TASK_FILTERS:
+        return int(parts[2]), parts[3], int(parts[4])
+    return int(parts[2]), "a", 0
 
 @dp.callback_query(F.data.startswith("task_info_"))
 async def task_info_handler(callback: CallbackQuery):
     """Информация о задании"""
-    task_id = int(callback.data.split("_")[-1])
-    tasks = await db.get_all_tasks(active_only=False)
-    task = next((t for t in tasks if t["id"] == task_id), None)
+    task_id, code, page = parse_task_callback(callback.data)
+    task = await db.get_task(task_id)
     
     if not task:
         await callback.answer("Задание не найдено", show_alert=True)
@@ -356,10 +547,19 @@ async def task_info_handler(callback: CallbackQuery):
     
     limit_text = f"{task['max_participants']} человек" if task['max_participants'] > 0 else "Без ограничений"
     status_text = "Активно" if task["is_active"] else "Неактивно"
+    used_today = await db.get_task_quota_used(task_id)
+    daily_text = f"{used_today} из {task['daily_limit']}" if task["daily_limit"] > 0 else f"{used_today} (без квоты)"
+    schedule_lines = ""
+    if task["starts_at"]:
+        schedule_lines += f"Включится: {task['starts_at'].replace('T', ' ')}\n"
+    if task["ends_at"]:
+        schedule_lines += f"Выключится: {task['ends_at'].replace('T', ' ')}\n"
+    task_stats = await db.get_task_statistics(task_id)
+    totals = task_stats["total"]
     
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="🗑️ Удалить", callback_data=f"task_delete_{task_id}")],
-        [InlineKeyboardButton(text="◀️ Назад", callback_data="admin_list_tasks")]
+        [InlineKeyboardButton(text="🗑️ Удалить", callback_data=f"task_delete_{task_id}_{code}_{page}")],
+        [InlineKeyboardButton(text="◀️ Назад", callback_data=f"tl_{code}_{page}")]
     ])
     
     await callback.message.edit_text(
@@ -368,6 +568,10 @@ async def task_info_handler(callback: CallbackQuery):
         f"Статус: {status_text}\n"
         f"Лимит: {limit_text}\n"
         f"Участников: {task['current_participants']}\n"
+        f"Сегодня выдано: {daily_text}\n"
+        f"{schedule_lines}"
+        f"На проверку отправили: {totals.get('reviewed', 0)}\n"
+        f"Оплачено: {totals.get('paid', 0)}\n"
         f"Создано: {task['created_date'][:10]}",
         reply_markup=keyboard,
         parse_mode="HTML"
@@ -376,70 +580,268 @@ async def task_info_handler(callback: CallbackQuery):
 @dp.callback_query(F.data.startswith("task_delete_"))
 async def task_delete_handler(callback: CallbackQuery):
     """Удаление задания"""
-    task_id = int(callback.data.split("_")[-1])
+    task_id, code, page = parse_task_callback(callback.data)
     await db.delete_task(task_id)
     await callback.answer("✅ Задание удалено!")
-    await admin_list_tasks_handler(callback)
+    await show_task_list(callback, code, page)
 
-@dp.callback_query(F.data == "admin_pending_review")
-async def admin_pending_review_handler(callback: CallbackQuery):
-    """Участники на проверку"""
-    participants = await db.get_participants_by_status("pending_review")
+# Короткие коды статусов для callback_data (ограничение Telegram - 64 байта)
+PAGE_STATUSES = {"rv": "pending_review", "pm": "pending_payment"}
+
+# Действия над выбранными участниками в каждом списке: (действие, текст кнопки)
+BULK_ACTIONS = {
+    "rv": (("approve", "✅ Одобрить"), ("reject", "❌ Отклонить")),
+    "pm": (("pay", "💸 Оплачено"), ("reject", "❌ Отклонить")),
+}
+
+# Сообщения участникам о решении админа
+TRANSITION_MESSAGES = {
+    "approve": "✅ Ваши скриншоты проверены и одобрены!",
+    "reject": "❌ К сожалению, ваша заявка отклонена.",
+    "pay": "💸 Кешбэк выплачен! Спасибо за участие.",
+}
+
+async def show_participants_page(
+    callback: CallbackQuery, state: FSMContext, code: str, cursor=None, backward: bool = False
+):
+    """Страница участников на проверку/оплату с выбором участников и кнопками Назад/Вперёд"""
+    status = PAGE_STATUSES[code]
+    page = await db.get_participants_page(status, cursor, backward, ADMIN_PAGE_SIZE)
+    participants = page["rows"]
     
     if not participants:
-        await callback.answer("Нет участников на проверку", show_alert=True)
+        empty_text = "Нет участников на проверку" if status == "pending_review" else "Нет участников на оплату"
+        await callback.answer(empty_text, show_alert=True)
         return
     
-    text = "👥 <b>Участники на проверку:</b>\n\n"
-    for p in participants[:20]:  # Показываем первые 20
+    # Выбор и текущая страница хранятся в FSM админа: переключение отметки перерисовывает ту же страницу
+    data = await state.get_data()
+    selected = set(data.get(f"selected_{code}", []))
+    await state.update_data(page=[code, list(cursor) if cursor else None, backward])
+    
+    total = await db.get_status_count(status)
+    if status == "pending_review":
+        text = f"👥 <b>Участники на проверку</b> (всего: {total}):\n\n"
+    else:
+        text = f"💰 <b>Участники на оплату</b> (всего: {total}):\n\n"
+    for p in participants:
         date = p["task_received_date"][:10] if p["task_received_date"] else "N/A"
         text += f"• {p['full_name']} (@{p['username']})\n"
         text += f"  Дата получения: {date}\n"
-        text += f"  Скриншотов: {p['screenshots_count']}\n\n"
+        if status == "pending_review":
+            text += f"  Скриншотов: {p['screenshots_count']}\n\n"
+        else:
+            text += f"  Реквизиты: {p['requisites'][:50]}...\n\n"
     
-    # TODO: Добавить кнопки для просмотра скриншотов каждого участника
-    # TODO: Добавить кнопку "Одобрить" / "Отклонить"
-    # TODO: Добавить пагинацию если участников больше 20
+    keyboard_buttons = []
+    for p in participants:
+        mark = "☑️" if p["user_id"] in selected else "⬜️"
+        row = [InlineKeyboardButton(text=f"{mark} {p['full_name']}", callback_data=f"sel_{code}_{p['user_id']}")]
+        if status == "pending_review":
+            row.append(InlineKeyboardButton(text="📷", callback_data=f"review_sheet_{p['user_id']}"))
+        keyboard_buttons.append(row)
+    select_buttons = [InlineKeyboardButton(text="☑️ Выбрать страницу", callback_data=f"selpage_{code}")]
+    if selected:
+        select_buttons.append(InlineKeyboardButton(text="✖️ Снять выбор", callback_data=f"selclear_{code}"))
+    keyboard_buttons.append(select_buttons)
+    if selected:
+        keyboard_buttons.append([
+            InlineKeyboardButton(text=f"{title} ({len(selected)})", callback_data=f"bulk_{code}_{action}")
+            for action, title in BULK_ACTIONS[code]
+        ])
     
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="◀️ Назад", callback_data="admin_back")]
-    ])
+    first, last = participants[0], participants[-1]
+    nav_buttons = []
+    if page["has_prev"]:
+        nav_buttons.append(InlineKeyboardButton(
+            text="⬅️", callback_data=f"pg_{code}_p_{first['task_received_date']}_{first['user_id']}"
+        ))
+    if page["has_next"]:
+        nav_buttons.append(InlineKeyboardButton(
+            text="➡️", callback_data=f"pg_{code}_n_{last['task_received_date']}_{last['user_id']}"
+        ))
+    if nav_buttons:
+        keyboard_buttons.append(nav_buttons)
+    keyboard_buttons.append([InlineKeyboardButton(text="◀️ Назад", callback_data="admin_back")])
+    keyboard = InlineKeyboardMarkup(inline_keyboard=keyboard_buttons)
     
-    await callback.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
+    try:
+        await callback.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
+    except TelegramBadRequest as e:
+        # Выбор уже выбранной страницы или снятие пустого выбора ничего не меняют
+        if "message is not modified" not in e.message:
+            raise
+
+@dp.callback_query(F.data == "admin_pending_review")
+async def admin_pending_review_handler(callback: CallbackQuery, state: FSMContext):
+    """Участники на проверку"""
+    await show_participants_page(callback, state, "rv")
 
 @dp.callback_query(F.data == "admin_pending_payment")
-async def admin_pending_payment_handler(callback: CallbackQuery):
+async def admin_pending_payment_handler(callback: CallbackQuery, state: FSMContext):
     """Участники на оплату"""
-    participants = await db.get_participants_by_status("pending_payment")
+    await show_participants_page(callback, state, "pm")
+
+@dp.callback_query(F.data.startswith("pg_"))
+async def participants_page_handler(callback: CallbackQuery, state: FSMContext):
+    """Переход по страницам списка участников"""
+    _, code, direction, date, user_id = callback.data.split("_")
+    await show_participants_page(callback, state, code, (date, int(user_id)), backward=direction == "p")
+
+async def redraw_participants_page(callback: CallbackQuery, state: FSMContext, code: str):
+    """Перерисовать страницу списка, которую админ смотрит сейчас"""
+    page = (await state.get_data()).get("page")
+    if page and page[0] == code:
+        _, cursor, backward = page
+        await show_participants_page(callback, state, code, tuple(cursor) if cursor else None, backward)
+    else:
+        await show_participants_page(callback, state, code)
+
+@dp.callback_query(F.data.startswith("sel_"))
+async def select_participant_handler(callback: CallbackQuery, state: FSMContext):
+    """Отметить участника в списке или снять отметку"""
+    if not is_admin(callback.from_user.id):
+        await callback.answer("❌ Нет доступа", show_alert=True)
+        return
     
-    if not participants:
-        await callback.answer("Нет участников на оплату", show_alert=True)
+    _, code, user_id = callback.data.split("_")
+    key = f"selected_{code}"
+    selected = set((await state.get_data()).get(key, []))
+    selected ^= {int(user_id)}
+    await state.update_data({key: sorted(selected)})
+    await callback.answer()
+    await redraw_participants_page(callback, state, code)
+
+@dp.callback_query(F.data.startswith("selpage_") | F.data.startswith("selclear_"))
+async def select_page_handler(callback: CallbackQuery, state: FSMContext):
+    """Выбрать всех участников на странице или снять выбор"""
+    if not is_admin(callback.from_user.id):
+        await callback.answer("❌ Нет доступа", show_alert=True)
         return
     
-    text = "💰 <b>Участники на оплату:</b>\n\n"
-    for p in participants[:20]:  # Показываем первые 20
-        date = p["task_received_date"][:10] if p["task_received_date"] else "N/A"
-        text += f"• {p['full_name']} (@{p['username']})\n"
-        text += f"  Дата получения: {date}\n"
-        text += f"  Реквизиты: {p['requisites'][:50]}...\n\n"
+    command, code = callback.data.split("_")
+    key = f"selected_{code}"
+    selected = set()
+    if command == "selpage":
+        # Участники страницы берутся из кнопок сообщения - без повторного запроса к БД
+        selected = set((await state.get_data()).get(key, []))
+        for row in callback.message.reply_markup.inline_keyboard:
+            data = row[0].callback_data or ""
+            if data.startswith(f"sel_{code}_"):
+                selected.add(int(data.split("_")[-1]))
+    await state.update_data({key: sorted(selected)})
+    await callback.answer()
+    await redraw_participants_page(callback, state, code)
+
+@dp.callback_query(F.data.startswith("bulk_"))
+async def bulk_action_handler(callback: CallbackQuery, state: FSMContext):
+    """Одобрить, отклонить или отметить оплаченными всех выбранных участников"""
+    if not is_admin(callback.from_user.id):
+        await callback.answer("❌ Нет доступа", show_alert=True)
+        return
     
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="◀️ Назад", callback_data="admin_back")]
-    ])
+    _, code, action = callback.data.split("_")
+    key = f"selected_{code}"
+    selected = (await state.get_data()).get(key, [])
+    changed = await db.apply_transition(action, selected)
+    await state.update_data({key: [], "page": None})
     
-    await callback.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
+    skipped = len(selected) - len(changed)
+    text = f"✅ Обработано: {len(changed)}"
+    if skipped:
+        text += f", пропущено (статус уже изменился): {skipped}"
+    await callback.answer(text, show_alert=bool(skipped))
+    
+    # Участники узнают о решении в фоне, с общим для всех рассылок ограничением скорости
+    broadcaster.send_many((p["user_id"], TRANSITION_MESSAGES[action]) for p in changed)
+    
+    if await db.get_status_count(PAGE_STATUSES[code]):
+        await show_participants_page(callback, state, code)
+    else:
+        await callback.message.edit_text("✅ Список пуст", reply_markup=InlineKeyboardMarkup(
+            inline_keyboard=[[InlineKeyboardButton(text="◀️ Назад", callback_data="admin_back")]]
+        ))
+
+# Не больше стольких фото в одном альбоме Telegram
+MEDIA_GROUP_SIZE = 10
+
+@dp.callback_query(F.data.startswith("review_sheet_"))
+async def review_sheet_handler(callback: CallbackQuery):
+    """Сводная картинка со всеми скриншотами участника"""
+    if not is_admin(callback.from_user.id):
+        await callback.answer("❌ Нет доступа", show_alert=True)
+        return
+    
+    user_id = int(callback.data.split("_")[-1])
+    participant = await db.get_participant(user_id)
+    if not participant or not participant["current_task_id"]:
+        await callback.answer("Участник не найден", show_alert=True)
+        return
+    
+    task_id = participant["current_task_id"]
+    screenshots = await db.get_screenshots(user_id, task_id)
+    if not screenshots:
+        await callback.answer("Скриншоты ещё не загружены", show_alert=True)
+        return
+    
+    await callback.answer()
+    duplicates = sum(1 for s in screenshots if s["duplicate_of"])
+    caption = (
+        f"📷 {participant['full_name']} (@{participant['username']}), задание #{task_id}\n"
+        f"Скриншотов: {len(screenshots)}"
+    )
+    if duplicates:
+        caption += f"\n⚠️ Совпадают со скриншотами других участников: {duplicates}"
+    
+    # Повторный просмотр того же набора скриншотов отправляется по file_id без загрузки
+    sheet_key = contact_sheets.sheet_key(screenshots)
+    file_ids = await db.get_sheet_file_ids(user_id, task_id, sheet_key)
+    if file_ids:
+        await send_sheets(callback.message, file_ids, caption)
+        return
+    
+    sheet_key, sheet_paths = await contact_sheets.get_sheets(user_id, task_id, screenshots)
+    file_ids = await send_sheets(callback.message, [FSInputFile(path) for path in sheet_paths], caption)
+    await db.save_sheet_file_ids(user_id, task_id, sheet_key, file_ids)
+
+async def send_sheets(message: Message, sheets: List, caption: str) -> List[str]:
+    """Отправить листы сводной картинки (файлы или file_id) альбомами, вернуть file_id листов"""
+    file_ids = []
+    for start in range(0, len(sheets), MEDIA_GROUP_SIZE):
+        chunk = sheets[start:start + MEDIA_GROUP_SIZE]
+        # Подпись - у первого листа, как у альбома в Telegram
+        first_caption = caption if start == 0 else None
+        if len(chunk) == 1:
+            sent = [await message.answer_photo(chunk[0], caption=first_caption)]
+        else:
+            sent = await message.answer_media_group([
+                InputMediaPhoto(media=sheet, caption=first_caption if index == 0 else None)
+                for index, sheet in enumerate(chunk)
+            ])
+        file_ids.extend(item.photo[-1].file_id for item in sent)
+    return file_ids
 
 @dp.callback_query(F.data == "admin_stats")
 async def admin_stats_handler(callback: CallbackQuery):
     """Статистика"""
     stats = await db.get_statistics()
+    downloads = downloader.stats()
+    participant_cache = db.participant_cache_stats()
     
     text = (
         "📊 <b>Статистика бота:</b>\n\n"
         f"👥 Всего участников: {stats['total_participants']}\n"
         f"🔍 На проверку: {stats['pending_review']}\n"
         f"💰 На оплату: {stats['pending_payment']}\n"
-        f"📝 Активных заданий: {stats['active_tasks']}"
+        f"📝 Активных заданий: {stats['active_tasks']}\n\n"
+        "📅 <b>Сегодня:</b>\n"
+        f"🎯 Выдано заданий: {stats['today_assigned']}\n"
+        f"📸 Отправлено на проверку: {stats['today_reviewed']}\n"
+        f"💸 Оплачено: {stats['today_paid']}\n\n"
+        f"📥 Очередь загрузок: {downloads['queue_depth']} "
+        f"(среднее время: {downloads['avg_latency']:.1f} с)\n"
+        f"🗂 Кэш участников: {participant_cache['size']} "
+        f"(попаданий: {participant_cache['hit_rate']:.0%})"
     )
     
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
@@ -448,6 +850,133 @@ async def admin_stats_handler(callback: CallbackQuery):
     
     await callback.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
 
+# Фоновые задачи выгрузки (храним ссылки, чтобы задачи не удалил сборщик мусора)
+export_jobs = set()
+
+async def run_export_job(status_message: Message, kind: str, filters: dict, fmt: str, compress: bool):
+    """Выгрузка в фоне с периодическим обновлением прогресса"""
+    last_update = time.monotonic()
+    
+    async def progress(rows: int):
+        nonlocal last_update
+        if time.monotonic() - last_update < 3:
+            return
+        last_update = time.monotonic()
+        await status_message.edit_text(f"⏳ Выгрузка {kind}: {rows} строк...")
+    
+    try:
+        path, rows = await export_to_file(
+            db, kind, filters, fmt, compress, os.path.join(CACHE_DIR, "exports"), progress
+        )
+    except Exception as e:
+        logging.exception("Ошибка выгрузки")
+        await status_message.edit_text(f"❌ Ошибка выгрузки: {e}")
+        return
+    
+    try:
+        await status_message.answer_document(FSInputFile(path), caption=f"📦 {kind}: {rows} строк")
+        await status_message.edit_text(f"✅ Выгрузка {kind} готова: {rows} строк")
+    finally:
+        os.remove(path)
+
+@dp.message(Command("metrics"))
+async def cmd_metrics(message: Message):
+    """Сводка метрик производительности"""
+    if not is_admin(message.from_user.id):
+        await message.answer("❌ У вас нет доступа к админ-панели.")
+        return
+    
+    await message.answer(summary(metrics), parse_mode="HTML")
+
+@dp.message(Command("export"))
+async def cmd_export(message: Message):
+    """Выгрузка участников, скриншотов или выплат в CSV/XLSX"""
+    if not is_admin(message.from_user.id):
+        await message.answer("❌ У вас нет доступа к админ-панели.")
+        return
+    
+    try:
+        kind, filters, fmt, compress = parse_export_args(message.text)
+    except ValueError as e:
+        await message.answer(f"❌ {e}\n\n{EXPORT_USAGE}")
+        return
+    
+    status_message = await message.answer(f"⏳ Выгрузка {kind} запущена...")
+    job = asyncio.create_task(run_export_job(status_message, kind, filters, fmt, compress))
+    export_jobs.add(job)
+    job.add_done_callback(export_jobs.discard)
+
+QUOTA_USAGE = "Использование: /quota ID_задания дневной_лимит (0 - без квоты)"
+SCHEDULE_USAGE = (
+    "Использование: /schedule ID_задания начало конец\n"
+    "Время в формате ГГГГ-ММ-ДДTЧЧ:ММ, «-» - без ограничения"
+)
+
+@dp.message(Command("quota"))
+async def cmd_quota(message: Message):
+    """Дневная квота задания"""
+    if not is_admin(message.from_user.id):
+        await message.answer("❌ У вас нет доступа к админ-панели.")
+        return
+    
+    try:
+        _, task_id, daily_limit = message.text.split()
+        task_id, daily_limit = int(task_id), int(daily_limit)
+        if daily_limit < 0:
+            raise ValueError
+    except ValueError:
+        await message.answer(QUOTA_USAGE)
+        return
+    
+    if not await db.get_task(task_id):
+        await message.answer("❌ Задание не найдено")
+        return
+    await db.update_task_daily_limit(task_id, daily_limit)
+    limit_text = "без квоты" if daily_limit == 0 else f"{daily_limit} в день"
+    await message.answer(f"✅ Квота задания #{task_id}: {limit_text}")
+
+@dp.message(Command("schedule"))
+async def cmd_schedule(message: Message):
+    """Расписание включения и выключения задания"""
+    if not is_admin(message.from_user.id):
+        await message.answer("❌ У вас нет доступа к админ-панели.")
+        return
+    
+    try:
+        _, task_id, starts_at, ends_at = message.text.split()
+        task_id = int(task_id)
+        starts_at = None if starts_at == "-" else scheduler.parse_time(starts_at)
+        ends_at = None if ends_at == "-" else scheduler.parse_time(ends_at)
+    except ValueError:
+        await message.answer(SCHEDULE_USAGE)
+        return
+    
+    if not await db.get_task(task_id):
+        await message.answer("❌ Задание не найдено")
+        return
+    await db.schedule_task(task_id, starts_at, ends_at, scheduler.now_text())
+    await message.answer(
+        f"✅ Расписание задания #{task_id}: "
+        f"с {starts_at.replace('T', ' ') if starts_at else 'сейчас'} "
+        f"до {ends_at.replace('T', ' ') if ends_at else 'без ограничения'}"
+    )
+
+@dp.message(Command("backup"))
+async def cmd_backup(message: Message):
+    """Снять резервную копию БД сейчас"""
+    if not is_admin(message.from_user.id):
+        await message.answer("❌ У вас нет доступа к админ-панели.")
+        return
+    
+    status_message = await message.answer("⏳ Снимаем резервную копию...")
+    try:
+        path = await backups.backup()
+    except Exception:
+        logging.exception("Не удалось снять резервную копию")
+        await status_message.edit_text("❌ Не удалось снять резервную копию")
+        return
+    await status_message.edit_text(f"✅ Резервная копия: {path} ({os.path.getsize(path) // 1024} КБ)")
+
 @dp.callback_query(F.data == "admin_back")
 async def admin_back_handler(callback: CallbackQuery):
     """Возврат в главное меню админки"""
@@ -457,10 +986,49 @@ async def admin_back_handler(callback: CallbackQuery):
 
 async def main():
     """Главная функция"""
+    logging.basicConfig(level=logging.INFO)
     await db.init_db()
     print("✅ База данных инициализирована")
+    for problem in await db.find_table_scans():
+        print(f"⚠️ Запрос без индекса: {problem}")
     print("🤖 Бот запущен!")
-    await dp.start_polling(bot)
+    validator.start()
+    await downloader.start()
+    await broadcaster.resume(participate_keyboard())
+    # Окно квот выставляется до приёма обновлений; после resume, чтобы анонсы
+    # заданий, включённых по расписанию, не продолжились второй раз
+    await scheduler.start()
+    if BACKUP_INTERVAL_HOURS > 0:
+        backups.start()
+    metrics_server = MetricsServer(metrics, METRICS_HOST, METRICS_PORT) if METRICS_PORT else None
+    if metrics_server is not None:
+        await metrics_server.start()
+    try:
+        if WEBHOOK_URL:
+            server = WebhookServer(
+                dp,
+                bot,
+                path=WEBHOOK_PATH,
+                secret_token=WEBHOOK_SECRET or None,
+                max_in_flight=WEBHOOK_MAX_IN_FLIGHT,
+                max_user_queue=WEBHOOK_MAX_USER_QUEUE,
+            )
+            await server.run(WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH, WEBHOOK_HOST, WEBHOOK_PORT)
+        else:
+            await dp.start_polling(bot)
+    finally:
+        if metrics_server is not None:
+            await metrics_server.stop()
+        await backups.stop()
+        await scheduler.stop()
+        await broadcaster.stop()
+        await notifier.stop()
+        await album_collector.stop()
+        await downloader.stop()
+        validator.stop()
+        # Диспетчер закрывает хранилище сам; повторный вызов только дописывает остатки
+        await storage.close()
+        await db.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
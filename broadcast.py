@@ -0,0 +1,227 @@
+"""
+Рассылка сообщений всем участникам
+
+Telegram ограничивает бота ~30 сообщениями в секунду, поэтому отправка идёт
+через «ведро токенов» с запасом ниже лимита. При RetryAfter отправка
+приостанавливается для всех на указанное время, участники, заблокировавшие
+бота, отмечаются и в следующие рассылки не попадают. Получатели
+перебираются по возрастанию user_id порциями, а после каждой порции
+прогресс сохраняется в БД - прерванная рассылка продолжается после
+перезапуска (сообщения порции, прерванной на середине, могут прийти повторно).
+"""
+
+import asyncio
+import logging
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+)
+from aiogram.types import InlineKeyboardMarkup
+
+from database import Database
+
+logger = logging.getLogger(__name__)
+
+SEND_SENT = "sent"
+SEND_BLOCKED = "blocked"
+SEND_FAILED = "failed"
+
+class TokenBucket:
+    """Ограничитель скорости: не более rate операций в секунду, всплеск до capacity.
+
+    По умолчанию всплесков нет (capacity=1): токены выдаются равномерно, и в любом
+    окне длиной в секунду операций не больше rate + 1.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = self.capacity
+        self._updated: Optional[float] = None
+        self._paused_until = 0.0
+        # Ожидающие получают токены по очереди
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float):
+        """Приостановить выдачу токенов (например, по RetryAfter)"""
+        loop = asyncio.get_running_loop()
+        self._paused_until = max(self._paused_until, loop.time() + seconds)
+        self._tokens = 0.0
+
+    async def acquire(self):
+        """Дождаться токена"""
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            while True:
+                now = loop.time()
+                if self._updated is not None:
+                    self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+class Broadcaster:
+    def __init__(
+        self,
+        bot: Bot,
+        db: Database,
+        rate: float = 25.0,
+        page_size: int = 100,
+        retries: int = 3,
+        stats_interval: float = 5.0,
+    ):
+        self.bot = bot
+        self.db = db
+        self.bucket = TokenBucket(rate)
+        self.page_size = page_size
+        self.retries = retries
+        self.stats_interval = stats_interval
+        self._tasks: Dict[int, asyncio.Task] = {}
+        self._notifications: Set[asyncio.Task] = set()
+
+    async def start(
+        self,
+        text: str,
+        task_id: Optional[int] = None,
+        admin_chat_id: Optional[int] = None,
+        reply_markup: Optional[InlineKeyboardMarkup] = None,
+    ) -> Dict:
+        """Создать рассылку и запустить её в фоне"""
+        broadcast = await self.db.create_broadcast(text, task_id, admin_chat_id)
+        self._spawn(broadcast, reply_markup)
+        return broadcast
+
+    async def resume(self, reply_markup: Optional[InlineKeyboardMarkup] = None):
+        """Продолжить рассылки, прерванные остановкой бота"""
+        for broadcast in await self.db.get_unfinished_broadcasts():
+            logger.info("Продолжаем рассылку #%s с user_id > %s", broadcast["id"], broadcast["last_user_id"])
+            self._spawn(broadcast, reply_markup)
+
+    def send_many(self, messages: Iterable[Tuple[int, str]]) -> asyncio.Task:
+        """Отправить в фоне личные сообщения участникам (user_id, текст).
+        
+        Сообщения идут через то же ведро токенов, что и рассылки, поэтому вместе
+        с ними не превышают лимит Telegram. Результат задачи - Counter по исходам.
+        """
+        task = asyncio.create_task(self._send_many(list(messages)))
+        self._notifications.add(task)
+        task.add_done_callback(self._notifications.discard)
+        return task
+    
+    async def _send_many(self, messages: List[Tuple[int, str]]) -> Counter:
+        results = await asyncio.gather(*(self._send(user_id, text, None) for user_id, text in messages))
+        blocked = {user_id for (user_id, _), result in zip(messages, results) if result == SEND_BLOCKED}
+        if blocked:
+            await self.db.mark_blocked(blocked)
+        return Counter(results)
+    
+    async def stop(self):
+        """Прервать рассылки; прогресс сохраняется, после запуска они продолжатся"""
+        tasks = list(self._tasks.values()) + list(self._notifications)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def active(self) -> int:
+        """Количество идущих рассылок"""
+        return len(self._tasks)
+
+    def _spawn(self, broadcast: Dict, reply_markup: Optional[InlineKeyboardMarkup]):
+        task = asyncio.create_task(self._run(broadcast, reply_markup))
+        self._tasks[broadcast["id"]] = task
+        task.add_done_callback(lambda _: self._tasks.pop(broadcast["id"], None))
+
+    async def _run(self, broadcast: Dict, reply_markup: Optional[InlineKeyboardMarkup]):
+        loop = asyncio.get_running_loop()
+        last_report = loop.time()
+        if not broadcast["status_message_id"]:
+            await self._report(broadcast)
+        try:
+            while True:
+                recipients = await self.db.get_broadcast_recipients(broadcast["last_user_id"], self.page_size)
+                if not recipients:
+                    break
+                results = await asyncio.gather(
+                    *(self._send(user_id, broadcast["text"], reply_markup) for user_id in recipients)
+                )
+                blocked: Set[int] = set()
+                for user_id, result in zip(recipients, results):
+                    broadcast[result] += 1
+                    if result == SEND_BLOCKED:
+                        blocked.add(user_id)
+                broadcast["last_user_id"] = recipients[-1]
+                await self.db.save_broadcast_progress(broadcast, blocked)
+                if loop.time() - last_report >= self.stats_interval:
+                    await self._report(broadcast)
+                    last_report = loop.time()
+        except asyncio.CancelledError:
+            logger.info("Рассылка #%s прервана на user_id %s", broadcast["id"], broadcast["last_user_id"])
+            raise
+        except Exception:
+            # Рассылка останется незавершённой и продолжится после перезапуска
+            logger.exception("Ошибка рассылки #%s", broadcast["id"])
+            return
+        await self.db.save_broadcast_progress(broadcast, finished=True)
+        await self._report(broadcast, finished=True)
+
+    async def _send(self, user_id: int, text: str, reply_markup: Optional[InlineKeyboardMarkup]) -> str:
+        """Отправить одно сообщение с учётом лимитов"""
+        for attempt in range(self.retries + 1):
+            await self.bucket.acquire()
+            try:
+                await self.bot.send_message(user_id, text, reply_markup=reply_markup)
+                return SEND_SENT
+            except TelegramRetryAfter as e:
+                # Флуд-контроль: притормаживаем всю рассылку, а не только это сообщение
+                logger.warning("RetryAfter %s с при рассылке", e.retry_after)
+                self.bucket.pause(e.retry_after)
+            except TelegramForbiddenError:
+                return SEND_BLOCKED
+            except TelegramBadRequest as e:
+                logger.info("Не удалось отправить сообщение %s: %s", user_id, e.message)
+                return SEND_FAILED
+            except TelegramNetworkError:
+                await asyncio.sleep(2 ** attempt)
+        return SEND_FAILED
+
+    def _status_text(self, broadcast: Dict, finished: bool) -> str:
+        done = broadcast["sent"] + broadcast["blocked"] + broadcast["failed"]
+        title = "✅ Рассылка завершена" if finished else "📣 Идёт рассылка"
+        return (
+            f"{title} #{broadcast['id']}\n\n"
+            f"Обработано: {done} из ~{broadcast['total']}\n"
+            f"• Доставлено: {broadcast['sent']}\n"
+            f"• Заблокировали бота: {broadcast['blocked']}\n"
+            f"• Ошибок: {broadcast['failed']}"
+        )
+
+    async def _report(self, broadcast: Dict, finished: bool = False):
+        """Обновить сообщение со статистикой у админа, запустившего рассылку"""
+        if not broadcast["admin_chat_id"]:
+            return
+        text = self._status_text(broadcast, finished)
+        try:
+            if broadcast["status_message_id"]:
+                await self.bot.edit_message_text(
+                    text, chat_id=broadcast["admin_chat_id"], message_id=broadcast["status_message_id"]
+                )
+            else:
+                message = await self.bot.send_message(broadcast["admin_chat_id"], text)
+                broadcast["status_message_id"] = message.message_id
+                await self.db.save_broadcast_progress(broadcast, finished=finished)
+        except TelegramBadRequest as e:
+            # "message is not modified" и удалённое сообщение не мешают рассылке
+            logger.debug("Не удалось обновить статус рассылки: %s", e.message)
+        except Exception:
+            logger.exception("Не удалось обновить статус рассылки #%s", broadcast["id"])
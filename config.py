@@ -15,3 +15,70 @@ FOLDERS = {
     "pending_payment": "На оплату"
 }
 
+# Кэш превью и сводных картинок скриншотов для админов
+CACHE_DIR = os.getenv("CACHE_DIR", "cache")
+
+
+# Политика выбора задания: newest, least_filled, round_robin, weighted
+TASK_SELECTION_POLICY = os.getenv("TASK_SELECTION_POLICY", "newest")
+
+# Фоновая загрузка скриншотов
+DOWNLOAD_WORKERS = int(os.getenv("DOWNLOAD_WORKERS", "4"))
+DOWNLOAD_QUEUE_SIZE = int(os.getenv("DOWNLOAD_QUEUE_SIZE", "1000"))
+DOWNLOAD_RETRIES = int(os.getenv("DOWNLOAD_RETRIES", "3"))
+
+# Проверка скриншотов: число процессов и таймаут на одну картинку (секунды)
+VALIDATION_WORKERS = int(os.getenv("VALIDATION_WORKERS", "2"))
+VALIDATION_TIMEOUT = float(os.getenv("VALIDATION_TIMEOUT", "10"))
+
+# Количество участников на странице списков в админ-панели
+ADMIN_PAGE_SIZE = int(os.getenv("ADMIN_PAGE_SIZE", "10"))
+
+# Режим вебхука: если WEBHOOK_URL задан, бот принимает обновления через aiohttp-сервер вместо polling
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+# Максимум обновлений, обрабатываемых одновременно
+WEBHOOK_MAX_IN_FLIGHT = int(os.getenv("WEBHOOK_MAX_IN_FLIGHT", "100"))
+# Максимум обновлений в очереди одного пользователя, сверх него Telegram получает 429
+WEBHOOK_MAX_USER_QUEUE = int(os.getenv("WEBHOOK_MAX_USER_QUEUE", "20"))
+
+# Рассылки: сообщений в секунду (лимит Telegram ~30)
+BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", "25"))
+
+# Сводка событий для админов: интервал отправки (секунды) и число событий для досрочной отправки
+ADMIN_DIGEST_INTERVAL = float(os.getenv("ADMIN_DIGEST_INTERVAL", "60"))
+ADMIN_DIGEST_BATCH = int(os.getenv("ADMIN_DIGEST_BATCH", "20"))
+
+# Кэш участников в памяти: максимум записей и время жизни записи (секунды)
+PARTICIPANT_CACHE_SIZE = int(os.getenv("PARTICIPANT_CACHE_SIZE", "10000"))
+PARTICIPANT_CACHE_TTL = float(os.getenv("PARTICIPANT_CACHE_TTL", "300"))
+
+# Групповая фиксация записей в БД: записи, пришедшие за окно (миллисекунды), фиксируются одной транзакцией
+DB_GROUP_COMMIT = os.getenv("DB_GROUP_COMMIT", "0") == "1"
+DB_GROUP_COMMIT_WINDOW_MS = float(os.getenv("DB_GROUP_COMMIT_WINDOW_MS", "5"))
+DB_GROUP_COMMIT_MAX = int(os.getenv("DB_GROUP_COMMIT_MAX", "100"))
+
+# Метрики в формате Prometheus: порт HTTP-сервера (0 - не запускать) и адрес
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+# Вызовы БД дольше порога (миллисекунды) пишутся в журнал медленных запросов (0 - не писать)
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+
+# Защита от флуда: минимальный интервал между нажатиями "Участвовать" и командами /start (секунды)
+THROTTLE_PARTICIPATE = float(os.getenv("THROTTLE_PARTICIPATE", "2"))
+THROTTLE_START = float(os.getenv("THROTTLE_START", "1"))
+
+# Дневные квоты и расписание заданий: часовой пояс (смещение от UTC в часах) и час начала нового дня квот
+QUOTA_UTC_OFFSET = float(os.getenv("QUOTA_UTC_OFFSET", "3"))
+QUOTA_ROLLOVER_HOUR = int(os.getenv("QUOTA_ROLLOVER_HOUR", "0"))
+
+# Резервные копии bot.db: папка, интервал в часах (0 - не снимать) и сколько копий хранить
+BACKUP_DIR = os.getenv("BACKUP_DIR", "backups")
+BACKUP_INTERVAL_HOURS = float(os.getenv("BACKUP_INTERVAL_HOURS", "24"))
+BACKUP_KEEP = int(os.getenv("BACKUP_KEEP", "7"))
+# Архив: через сколько дней завершённые участия и их скриншоты переносятся в архив (0 - не переносить)
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archive")
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "90"))
@@ -2,238 +2,1143 @@
 ДЕМО-ВЕРСИЯ: Модуль работы с базой данных
 
 Базовая реализация работы с SQLite.
-TODO: Добавить миграции, резервное копирование, оптимизацию запросов.
+Схема базы данных описана миграциями в migrations.py.
+Резервное копирование и архивирование старых данных - в backup.py.
 """
 
+import asyncio
+import random
+import time
 import aiosqlite
+from collections import OrderedDict
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import List, Optional, Dict
+from typing import Any, AsyncIterator, Iterable, List, Optional, Dict, Tuple
 import json
+import logging
+import zlib
+from migrations import MIGRATIONS, HOT_QUERIES
+
+logger = logging.getLogger(__name__)
+
+# Настройки соединений SQLite (применяются к каждому открытому соединению)
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA cache_size = -32000",
+    "PRAGMA temp_store = MEMORY",
+    # Нужно, чтобы INSERT OR REPLACE вызывал триггеры удаления (счётчики статистики)
+    "PRAGMA recursive_triggers = ON",
+)
+
+# Размер кэша подготовленных выражений sqlite3 на соединение
+STATEMENT_CACHE_SIZE = 256
+
+# Политики выбора задания для нового участника
+TASK_SELECTION_POLICIES = ("newest", "least_filled", "round_robin", "weighted")
+
+# Статусы завершённого участия: после них можно участвовать в следующей раздаче
+FINISHED_STATUSES = ("paid", "rejected")
+
+# Действия админа над участниками: действие -> (допустимые исходные статусы, новый статус)
+STATUS_TRANSITIONS = {
+    "approve": (("pending_review",), "approved"),
+    "reject": (("pending_review", "approved", "pending_payment"), "rejected"),
+    "pay": (("pending_payment",), "paid"),
+}
+
+# Статусы, в которых участник может прислать реквизиты
+REQUISITES_STATUSES = ("pending_review", "approved")
+
+class _Rollback(Exception):
+    """Откатить транзакцию без ошибки для вызывающего кода"""
+
+class _GroupOp:
+    """Запись, ожидающая своей очереди в групповой транзакции"""
+    __slots__ = ("started", "finished", "committed")
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        # Транзакция открыта и создана точка сохранения - можно писать
+        self.started = loop.create_future()
+        # Запись выполнена (результат - исключение или None)
+        self.finished = loop.create_future()
+        # Транзакция с записью зафиксирована
+        self.committed = loop.create_future()
 
 class Database:
-    def __init__(self, db_path: str = "bot.db"):
+    def __init__(
+        self,
+        db_path: str = "bot.db",
+        participant_cache_size: int = 10000,
+        participant_ttl: float = 300.0,
+        group_commit: bool = False,
+        group_commit_window: float = 0.005,
+        group_commit_max: int = 100,
+    ):
         self.db_path = db_path
+        # Одно соединение на запись и одно на чтение (WAL позволяет читать параллельно с записью)
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._reader: Optional[aiosqlite.Connection] = None
+        self._write_lock: Optional[asyncio.Lock] = None
+        # Индекс активных заданий по id (None - не загружен) и подмножество заданий со свободными местами.
+        # Изменяется только под _write_lock, сбрасывается при изменении заданий.
+        self._active_tasks: Optional[Dict[int, Dict]] = None
+        self._available_tasks: Dict[int, Dict] = {}
+        self._round_robin_counter = 0
+        # Текущее окно дневных квот; задаётся планировщиком, поэтому при выдаче заданий
+        # не нужно вычислять дату. В индексе заданий period_used - выдано в этом окне.
+        self._quota_period = ""
+        # Версия списка заданий для кэша отрисовки в админке: растёт после фиксации
+        # изменений заданий и когда задание распродаётся
+        self._tasks_version = 0
+        self._tasks_changed = False
+        # Кэш статистики; поколение защищает от записи в кэш устаревшего результата
+        self._stats_cache: Optional[Dict] = None
+        self._stats_generation = 0
+        # LRU-кэш участников: user_id -> (срок годности, строка). Все изменения участников
+        # проходят через этот класс и сразу записываются в кэш; TTL ограничивает срок жизни
+        # записей на случай изменений в обход бота. Поколение - как у кэша статистики.
+        self._participants: "OrderedDict[int, Tuple[float, Dict]]" = OrderedDict()
+        self._participant_cache_size = participant_cache_size
+        self._participant_ttl = participant_ttl
+        self._participant_generation = 0
+        self._participant_hits = 0
+        self._participant_misses = 0
+        # Групповая фиксация: записи разных обработчиков, пришедшие за group_commit_window
+        # секунд (но не больше group_commit_max), фиксируются одной транзакцией
+        self._group_commit = group_commit
+        self._group_commit_window = group_commit_window
+        self._group_commit_max = group_commit_max
+        self._group_queue: Optional[asyncio.Queue] = None
+        self._committer: Optional[asyncio.Task] = None
+    
+    async def _open_connection(self, read_only: bool = False) -> aiosqlite.Connection:
+        """Открыть соединение с настроенными PRAGMA"""
+        # isolation_level=None: транзакциями управляем сами через BEGIN/COMMIT
+        conn = await aiosqlite.connect(
+            self.db_path,
+            isolation_level=None,
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
+        conn.row_factory = aiosqlite.Row
+        for pragma in PRAGMAS:
+            await conn.execute(pragma)
+        if read_only:
+            await conn.execute("PRAGMA query_only = ON")
+        elif self._group_commit:
+            # Фиксация группы оплачивается одним fsync, поэтому можно ждать полной
+            # надёжности: запись не теряется даже при отключении питания
+            await conn.execute("PRAGMA synchronous = FULL")
+        return conn
+    
+    async def connect(self):
+        """Открыть долгоживущие соединения (вызывается из init_db)"""
+        if self._writer is not None:
+            return
+        self._write_lock = asyncio.Lock()
+        self._writer = await self._open_connection()
+        self._reader = await self._open_connection(read_only=True)
+    
+    async def close(self):
+        """Закрыть соединения при остановке бота"""
+        if self._committer is not None:
+            # Дописываем уже поставленные в очередь записи
+            await self._group_queue.put(None)
+            await self._committer
+            self._committer = None
+            self._group_queue = None
+        if self._reader is not None:
+            await self._reader.close()
+            self._reader = None
+        if self._writer is not None:
+            await self._writer.close()
+            self._writer = None
+    
+    @asynccontextmanager
+    async def _transaction(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Транзакция на соединении записи (записи выполняются по одной)"""
+        if self._group_commit:
+            async with self._group_transaction() as db:
+                yield db
+            return
+        async with self._write_lock:
+            try:
+                await self._writer.execute("BEGIN IMMEDIATE")
+                yield self._writer
+            except BaseException:
+                # При отмене задачи BEGIN мог выполниться уже после выхода из await
+                if self._writer.in_transaction:
+                    await self._writer.execute("ROLLBACK")
+                raise
+            await self._writer.execute("COMMIT")
+            self.invalidate_statistics()
+    
+    @asynccontextmanager
+    async def _group_transaction(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Запись в составе групповой транзакции.
+        
+        Тело выполняется в задаче вызывающего внутри общей транзакции, под своей точкой
+        сохранения: ошибка откатывает только эту запись. Выход из блока происходит
+        только после фиксации всей группы.
+        """
+        if self._committer is None:
+            self._group_queue = asyncio.Queue()
+            self._committer = asyncio.create_task(self._group_committer())
+        op = _GroupOp(asyncio.get_running_loop())
+        await self._group_queue.put(op)
+        # При отмене ожидания future отменяется, и коммиттер пропустит запись
+        await op.started
+        try:
+            yield self._writer
+        except BaseException as e:
+            op.finished.set_result(e)
+            raise
+        op.finished.set_result(None)
+        await op.committed
+    
+    async def _group_committer(self):
+        """Собирать записи в группы и фиксировать каждую группу одной транзакцией"""
+        last_batch = 0
+        while True:
+            op = await self._group_queue.get()
+            if op is None:
+                return
+            if self._group_commit_window > 0 and (last_batch > 1 or not self._group_queue.empty()):
+                # Под нагрузкой даём другим обработчикам поставить записи в эту же группу;
+                # одиночные записи не задерживаем
+                await asyncio.sleep(self._group_commit_window)
+            batch = [op]
+            stop = False
+            while len(batch) < self._group_commit_max and not self._group_queue.empty():
+                op = self._group_queue.get_nowait()
+                if op is None:
+                    stop = True
+                    break
+                batch.append(op)
+            last_batch = len(batch)
+            await self._commit_group(batch)
+            if stop:
+                return
+    
+    async def _commit_group(self, batch: List[_GroupOp]):
+        """Выполнить записи группы в одной транзакции"""
+        done: List[_GroupOp] = []
+        async with self._write_lock:
+            try:
+                await self._writer.execute("BEGIN IMMEDIATE")
+                for op in batch:
+                    if op.started.done():
+                        continue
+                    await self._writer.execute("SAVEPOINT group_op")
+                    op.started.set_result(None)
+                    error = await op.finished
+                    if error is None:
+                        await self._writer.execute("RELEASE group_op")
+                        done.append(op)
+                    else:
+                        await self._writer.execute("ROLLBACK TO group_op")
+                        await self._writer.execute("RELEASE group_op")
+                await self._writer.execute("COMMIT")
+            except BaseException as e:
+                if self._writer.in_transaction:
+                    await self._writer.execute("ROLLBACK")
+                # Изменения в памяти, сделанные записями группы, больше не соответствуют БД
+                self._invalidate_task_index()
+                self._forget_participants(list(self._participants))
+                failure = e if isinstance(e, Exception) else RuntimeError("групповая транзакция прервана")
+                for op in batch:
+                    if not op.started.done():
+                        op.started.set_exception(failure)
+                    elif op.started.cancelled() or op.committed.done():
+                        continue
+                    elif not op.finished.done() or op.finished.result() is None:
+                        # Запись выполнена, но не зафиксирована - сообщаем вызывающему
+                        op.committed.set_exception(failure)
+                if not isinstance(e, Exception):
+                    raise
+                logger.exception("Не удалось зафиксировать групповую транзакцию")
+                return
+        self.invalidate_statistics()
+        for op in done:
+            if not op.committed.done():
+                op.committed.set_result(None)
+    
+    async def _fetchone(self, query: str, params: Iterable[Any] = ()) -> Optional[Dict]:
+        """Прочитать одну строку через соединение чтения"""
+        async with self._reader.execute(query, params) as cursor:
+            row = await cursor.fetchone()
+            return dict(row) if row else None
+    
+    async def _fetchall(self, query: str, params: Iterable[Any] = ()) -> List[Dict]:
+        """Прочитать все строки через соединение чтения"""
+        async with self._reader.execute(query, params) as cursor:
+            rows = await cursor.fetchall()
+            return [dict(row) for row in rows]
+    
+    async def _fetchvalue(self, query: str, params: Iterable[Any] = ()) -> Any:
+        """Прочитать одно значение через соединение чтения"""
+        async with self._reader.execute(query, params) as cursor:
+            row = await cursor.fetchone()
+            return row[0] if row else None
+    
+    @staticmethod
+    def _has_capacity(task: Dict) -> bool:
+        """Есть ли в задании свободные места всего и в текущем окне квоты (лимит 0 - без ограничений)"""
+        return (
+            (task["max_participants"] == 0 or task["current_participants"] < task["max_participants"])
+            and (task["daily_limit"] == 0 or task["period_used"] < task["daily_limit"])
+        )
+    
+    async def _load_task_index(self, db: aiosqlite.Connection):
+        """Загрузить индекс активных заданий (вызывается под _write_lock)"""
+        async with db.execute("SELECT * FROM tasks WHERE is_active = 1 ORDER BY id DESC") as cursor:
+            rows = await cursor.fetchall()
+        async with db.execute(
+            "SELECT task_id, used FROM task_quotas WHERE period = ?", (self._quota_period,)
+        ) as cursor:
+            used = {row["task_id"]: row["used"] for row in await cursor.fetchall()}
+        self._active_tasks = {row["id"]: dict(row, period_used=used.get(row["id"], 0)) for row in rows}
+        self._available_tasks = {
+            task_id: task for task_id, task in self._active_tasks.items() if self._has_capacity(task)
+        }
+    
+    async def _get_task_index(self) -> Dict[int, Dict]:
+        """Получить индекс активных заданий, загрузив его при необходимости"""
+        if self._active_tasks is None:
+            async with self._write_lock:
+                if self._active_tasks is None:
+                    await self._load_task_index(self._writer)
+        return self._active_tasks
+    
+    def _cache_participants(self, rows: Iterable[Dict]):
+        """Записать в кэш свежие строки участников (только после COMMIT)"""
+        self._participant_generation += 1
+        expires = time.monotonic() + self._participant_ttl
+        for row in rows:
+            self._participants[row["user_id"]] = (expires, row)
+            self._participants.move_to_end(row["user_id"])
+        while len(self._participants) > self._participant_cache_size:
+            self._participants.popitem(last=False)
+    
+    def _forget_participants(self, user_ids: Iterable[int]):
+        """Убрать участников из кэша"""
+        self._participant_generation += 1
+        for user_id in user_ids:
+            self._participants.pop(user_id, None)
+    
+    @staticmethod
+    async def _update_participant(db: aiosqlite.Connection, query: str, params: Iterable[Any]) -> Optional[Dict]:
+        """Выполнить UPDATE/INSERT участника и вернуть новую строку (RETURNING *)"""
+        async with db.execute(f"{query} RETURNING *", params) as cursor:
+            row = await cursor.fetchone()
+            return dict(row) if row else None
+    
+    def participant_cache_stats(self) -> Dict:
+        """Метрики кэша участников"""
+        total = self._participant_hits + self._participant_misses
+        return {
+            "size": len(self._participants),
+            "hits": self._participant_hits,
+            "misses": self._participant_misses,
+            "hit_rate": self._participant_hits / total if total else 0.0,
+        }
+    
+    def _invalidate_task_index(self):
+        """Сбросить индекс заданий (после добавления/удаления/изменения лимита)"""
+        self._active_tasks = None
+        self._available_tasks = {}
+        self._tasks_changed = True
+    
+    def _mark_sold_out(self, task_id: int):
+        """Убрать задание из доступных (мест или дневной квоты больше нет)"""
+        if self._available_tasks.pop(task_id, None) is not None:
+            self._tasks_changed = True
+    
+    @property
+    def tasks_version(self) -> int:
+        """Версия списка заданий; меняется после каждого зафиксированного изменения заданий"""
+        return self._tasks_version
+    
+    async def stream_rows(
+        self, query: str, params: Iterable[Any] = (), chunk_size: int = 1000
+    ) -> AsyncIterator[Tuple[List[str], List[tuple]]]:
+        """Читать результат запроса порциями через отдельное соединение.
+        
+        Отдаёт (названия колонок, строки); первая порция отдаётся даже для пустого результата.
+        """
+        conn = await self._open_connection(read_only=True)
+        try:
+            async with conn.execute(query, params) as cursor:
+                columns = [column[0] for column in cursor.description]
+                first = True
+                while True:
+                    rows = await cursor.fetchmany(chunk_size)
+                    if not rows and not first:
+                        break
+                    first = False
+                    yield columns, [tuple(row) for row in rows]
+                    if not rows:
+                        break
+        finally:
+            await conn.close()
     
     async def init_db(self):
-        """Инициализация базы данных"""
-        # TODO: Добавить систему миграций для обновления схемы БД
-        async with aiosqlite.connect(self.db_path) as db:
-            # Таблица участников
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS participants (
-                    user_id INTEGER PRIMARY KEY,
-                    username TEXT,
-                    full_name TEXT,
-                    registration_date TEXT,
-                    current_task_id INTEGER,
-                    status TEXT DEFAULT 'registered',
-                    task_received_date TEXT,
-                    screenshots_count INTEGER DEFAULT 0,
-                    requisites TEXT,
-                    FOREIGN KEY (current_task_id) REFERENCES tasks(id)
-                )
-            """)
-            
-            # Таблица заданий
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS tasks (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    description TEXT NOT NULL,
-                    created_date TEXT,
-                    is_active INTEGER DEFAULT 1,
-                    max_participants INTEGER DEFAULT 0,
-                    current_participants INTEGER DEFAULT 0
-                )
-            """)
-            
-            # Таблица скриншотов
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS screenshots (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER,
-                    task_id INTEGER,
-                    file_id TEXT,
-                    file_path TEXT,
-                    upload_date TEXT,
-                    FOREIGN KEY (user_id) REFERENCES participants(user_id),
-                    FOREIGN KEY (task_id) REFERENCES tasks(id)
-                )
-            """)
-            
-            # Таблица настроек
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS settings (
-                    key TEXT PRIMARY KEY,
-                    value TEXT
-                )
-            """)
-            
-            await db.commit()
+        """Инициализация базы данных: открыть соединения и применить миграции"""
+        await self.connect()
+        current_version = await self._fetchvalue("PRAGMA user_version")
+        for version, statements in MIGRATIONS:
+            if version <= current_version:
+                continue
+            async with self._transaction() as db:
+                for statement in statements:
+                    await db.execute(statement)
+                # user_version меняется в той же транзакции, что и схема
+                await db.execute(f"PRAGMA user_version = {version}")
+        # Окно квот, в котором бот работал до перезапуска; планировщик сменит его при необходимости
+        self._quota_period = await self._fetchvalue(
+            "SELECT value FROM settings WHERE key = 'quota_period'"
+        ) or ""
+    
+    async def find_table_scans(self) -> List[str]:
+        """Проверить планы горячих запросов и вернуть те, что сканируют таблицу целиком"""
+        problems = []
+        for query, params in HOT_QUERIES:
+            plan = await self._fetchall(f"EXPLAIN QUERY PLAN {query}", params)
+            for step in plan:
+                detail = step["detail"]
+                if detail.startswith("SCAN") or "TEMP B-TREE" in detail:
+                    problems.append(f"{' '.join(query.split())} -> {detail}")
+        return problems
     
     async def add_participant(self, user_id: int, username: str, full_name: str):
-        """Добавить участника"""
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("""
-                INSERT OR REPLACE INTO participants 
-                (user_id, username, full_name, registration_date, status)
-                VALUES (?, ?, ?, ?, ?)
-            """, (user_id, username, full_name, datetime.now().isoformat(), "registered"))
-            await db.commit()
+        """Добавить участника или обновить изменившиеся данные профиля.
+        
+        Статус, задание и реквизиты уже зарегистрированного участника не меняются,
+        а повторный /start без изменений профиля не пишет в БД.
+        """
+        cached = self._participants.get(user_id)
+        if cached is not None:
+            row = cached[1]
+            if row["username"] == username and row["full_name"] == full_name and row["blocked_date"] is None:
+                return
+        
+        async with self._transaction() as db:
+            # Участник снова написал боту - значит, он его не блокирует
+            row = await self._update_participant(db, """
+                INSERT INTO participants (user_id, username, full_name, registration_date, status)
+                VALUES (?, ?, ?, ?, 'registered')
+                ON CONFLICT (user_id) DO UPDATE
+                SET username = excluded.username, full_name = excluded.full_name, blocked_date = NULL
+                WHERE username IS NOT excluded.username OR full_name IS NOT excluded.full_name
+                   OR blocked_date IS NOT NULL
+            """, (user_id, username, full_name, datetime.now().isoformat()))
+        if row is not None:
+            self._cache_participants([row])
     
     async def get_participant(self, user_id: int) -> Optional[Dict]:
-        """Получить информацию об участнике"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            async with db.execute("SELECT * FROM participants WHERE user_id = ?", (user_id,)) as cursor:
-                row = await cursor.fetchone()
-                return dict(row) if row else None
+        """Получить информацию об участнике (из кэша, если есть)"""
+        cached = self._participants.get(user_id)
+        if cached is not None and cached[0] > time.monotonic():
+            self._participants.move_to_end(user_id)
+            self._participant_hits += 1
+            return dict(cached[1])
+        
+        self._participant_misses += 1
+        generation = self._participant_generation
+        row = await self._fetchone("SELECT * FROM participants WHERE user_id = ?", (user_id,))
+        # Пока читали, участник мог измениться - тогда в кэше уже более новая строка
+        if row is not None and generation == self._participant_generation:
+            self._cache_participants([dict(row)])
+        return row
     
-    async def assign_task(self, user_id: int, task_id: int):
-        """Назначить задание участнику"""
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("""
-                UPDATE participants 
-                SET current_task_id = ?, status = 'task_assigned', 
-                    task_received_date = ?, screenshots_count = 0
-                WHERE user_id = ?
-            """, (task_id, datetime.now().isoformat(), user_id))
-            
-            await db.execute("""
-                UPDATE tasks 
-                SET current_participants = current_participants + 1
-                WHERE id = ?
-            """, (task_id,))
-            
-            await db.commit()
+    async def claim_task_slot(self, user_id: int, task_id: int) -> bool:
+        """Атомарно занять место в задании и назначить его участнику"""
+        # Распроданное или неактивное задание отклоняем из памяти, без обращения к БД
+        if self._active_tasks is not None and task_id not in self._available_tasks:
+            return False
+        
+        try:
+            async with self._transaction() as db:
+                if self._active_tasks is None:
+                    await self._load_task_index(db)
+                task = self._available_tasks.get(task_id)
+                if task is None:
+                    raise _Rollback
+                
+                # В каждом задании участвуют один раз
+                now = datetime.now().isoformat()
+                cursor = await db.execute("""
+                    INSERT INTO participations (user_id, task_id, status, assigned_date, updated_date)
+                    VALUES (?, ?, 'task_assigned', ?, ?)
+                    ON CONFLICT (user_id, task_id) DO NOTHING
+                """, (user_id, task_id, now, now))
+                if cursor.rowcount == 0:
+                    raise _Rollback
+                
+                # Новое задание можно взять, только если предыдущее участие завершено
+                participant = await self._update_participant(db, f"""
+                    UPDATE participants 
+                    SET current_task_id = ?, status = 'task_assigned', 
+                        task_received_date = ?, screenshots_count = 0, requisites = NULL
+                    WHERE user_id = ?
+                      AND (current_task_id IS NULL OR status IN {FINISHED_STATUSES})
+                """, (task_id, now, user_id))
+                if participant is None:
+                    raise _Rollback
+                
+                cursor = await db.execute("""
+                    UPDATE tasks 
+                    SET current_participants = current_participants + 1
+                    WHERE id = ? AND is_active = 1
+                      AND (max_participants = 0 OR current_participants < max_participants)
+                """, (task_id,))
+                if cursor.rowcount == 0:
+                    self._mark_sold_out(task_id)
+                    raise _Rollback
+                
+                # Учёт в окне квоты; условие повторяет проверку по памяти на уровне БД
+                cursor = await db.execute("""
+                    INSERT INTO task_quotas (period, task_id, used) VALUES (?, ?, 1)
+                    ON CONFLICT (period, task_id) DO UPDATE SET used = used + 1
+                    WHERE ? = 0 OR used < ?
+                """, (self._quota_period, task_id, task["daily_limit"], task["daily_limit"]))
+                if cursor.rowcount == 0:
+                    self._mark_sold_out(task_id)
+                    raise _Rollback
+                
+                task["current_participants"] += 1
+                task["period_used"] += 1
+                if not self._has_capacity(task):
+                    self._mark_sold_out(task_id)
+        except _Rollback:
+            return False
+        except Exception:
+            # Состояние счётчиков неизвестно - перечитаем индекс из БД при следующем запросе
+            self._invalidate_task_index()
+            raise
+        self._cache_participants([participant])
+        return True
+    
+    def _select_task(self, policy: str, exclude: Iterable[int] = ()) -> Optional[Dict]:
+        """Выбрать задание со свободными местами согласно политике"""
+        candidates = [task for task_id, task in self._available_tasks.items() if task_id not in exclude]
+        if not candidates:
+            return None
+        
+        if policy == "least_filled":
+            # Задания без лимита считаем пустыми
+            return min(
+                candidates,
+                key=lambda t: (t["current_participants"] / t["max_participants"] if t["max_participants"] else 0, -t["id"])
+            )
+        
+        if policy == "round_robin":
+            candidates.sort(key=lambda t: t["id"])
+            self._round_robin_counter += 1
+            return candidates[self._round_robin_counter % len(candidates)]
+        
+        if policy == "weighted":
+            # Вес - количество свободных мест; задания без лимита получают максимальный вес
+            remaining = [t["max_participants"] - t["current_participants"] for t in candidates if t["max_participants"]]
+            unlimited_weight = max(remaining, default=1)
+            weights = [
+                t["max_participants"] - t["current_participants"] if t["max_participants"] else unlimited_weight
+                for t in candidates
+            ]
+            return random.choices(candidates, weights=weights)[0]
+        
+        # newest: самое новое задание, у которого остались места
+        return max(candidates, key=lambda t: t["id"])
+    
+    async def claim_next_task(self, user_id: int, policy: str = "newest") -> Optional[Dict]:
+        """Назначить участнику подходящее задание со свободными местами"""
+        await self._get_task_index()
+        # Все задания распроданы - отказываем, не читая историю участника
+        if not self._available_tasks:
+            return None
+        tried = set()
+        participant = await self.get_participant(user_id)
+        if participant and participant["current_task_id"]:
+            # Задания, в которых участник уже участвовал, не предлагаем
+            tried.update(await self.get_participation_task_ids(user_id))
+        while True:
+            task = self._select_task(policy, exclude=tried)
+            if task is None:
+                return None
+            if await self.claim_task_slot(user_id, task["id"]):
+                return dict(task)
+            tried.add(task["id"])
+    
+    async def get_participation_task_ids(self, user_id: int) -> List[int]:
+        """id заданий, в которых участник уже участвовал"""
+        rows = await self._fetchall("SELECT task_id FROM participations WHERE user_id = ?", (user_id,))
+        return [row["task_id"] for row in rows]
+    
+    async def get_participations(self, user_id: int) -> List[Dict]:
+        """История участия (новые задания первыми)"""
+        return await self._fetchall("""
+            SELECT * FROM participations WHERE user_id = ? ORDER BY task_id DESC
+        """, (user_id,))
+    
+    async def get_active_tasks(self) -> List[Dict]:
+        """Получить активные задания из индекса (новые первыми)"""
+        tasks = await self._get_task_index()
+        return [dict(task) for task in tasks.values()]
+    
+    async def get_task(self, task_id: int) -> Optional[Dict]:
+        """Получить задание по id"""
+        tasks = await self._get_task_index()
+        if task_id in tasks:
+            return dict(tasks[task_id])
+        return await self._fetchone("SELECT * FROM tasks WHERE id = ?", (task_id,))
     
     async def add_task(self, description: str, max_participants: int = 0) -> int:
         """Добавить задание"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._transaction() as db:
             cursor = await db.execute("""
                 INSERT INTO tasks (description, created_date, max_participants)
                 VALUES (?, ?, ?)
             """, (description, datetime.now().isoformat(), max_participants))
-            await db.commit()
+            self._invalidate_task_index()
             return cursor.lastrowid
     
     async def get_all_tasks(self, active_only: bool = False) -> List[Dict]:
         """Получить все задания"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            query = "SELECT * FROM tasks"
-            if active_only:
-                query += " WHERE is_active = 1"
-            query += " ORDER BY id DESC"
-            async with db.execute(query) as cursor:
-                rows = await cursor.fetchall()
-                return [dict(row) for row in rows]
+        query = "SELECT * FROM tasks"
+        if active_only:
+            query += " WHERE is_active = 1"
+        query += " ORDER BY id DESC"
+        return await self._fetchall(query)
+    
+    async def get_tasks_page(self, kind: str, page: int, page_size: int = 10) -> Dict:
+        """Страница списка заданий (новые первыми).
+        
+        kind: active - активные, sold_out - активные без свободных мест или дневной квоты,
+        archived - выключенные. Активные берутся из индекса в памяти, архив - по индексу (is_active, id).
+        У активных заданий available - есть ли свободные места.
+        """
+        if kind == "archived":
+            rows = await self._fetchall("""
+                SELECT id, description, is_active FROM tasks
+                WHERE is_active = 0 ORDER BY id DESC LIMIT ? OFFSET ?
+            """, (page_size + 1, page * page_size))
+            total = await self._fetchvalue("SELECT COUNT(*) FROM tasks WHERE is_active = 0")
+        else:
+            tasks = await self._get_task_index()
+            if kind == "sold_out":
+                rows = [task for task_id, task in tasks.items() if task_id not in self._available_tasks]
+            else:
+                rows = list(tasks.values())
+            total = len(rows)
+            rows = [
+                dict(task, available=task["id"] in self._available_tasks)
+                for task in rows[page * page_size:(page + 1) * page_size + 1]
+            ]
+        return {"rows": rows[:page_size], "has_next": len(rows) > page_size, "total": total}
     
     async def delete_task(self, task_id: int):
         """Удалить задание"""
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("UPDATE tasks SET is_active = 0 WHERE id = ?", (task_id,))
-            await db.commit()
+        async with self._transaction() as db:
+            # Снимаем и с расписания, чтобы планировщик не включил задание снова
+            await db.execute("UPDATE tasks SET is_active = 0, starts_at = NULL WHERE id = ?", (task_id,))
+            self._invalidate_task_index()
     
     async def update_task_limit(self, task_id: int, max_participants: int):
         """Обновить лимит участников для задания"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._transaction() as db:
             await db.execute("""
                 UPDATE tasks 
                 SET max_participants = ?
                 WHERE id = ?
             """, (max_participants, task_id))
-            await db.commit()
+            self._invalidate_task_index()
     
-    async def can_assign_task(self, task_id: int) -> bool:
-        """Проверить, можно ли назначить задание (лимит не исчерпан)"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
+    async def update_task_daily_limit(self, task_id: int, daily_limit: int):
+        """Обновить дневную квоту задания (0 - без квоты)"""
+        async with self._transaction() as db:
+            await db.execute("UPDATE tasks SET daily_limit = ? WHERE id = ?", (daily_limit, task_id))
+            self._invalidate_task_index()
+    
+    async def schedule_task(self, task_id: int, starts_at: Optional[str], ends_at: Optional[str], now: str):
+        """Задать время включения и выключения задания (строки ГГГГ-ММ-ДДTЧЧ:ММ в часовом поясе квот).
+        
+        Задание с будущим временем включения выключается до наступления этого времени.
+        """
+        async with self._transaction() as db:
+            await db.execute("""
+                UPDATE tasks
+                SET starts_at = ?, ends_at = ?,
+                    is_active = CASE WHEN ? IS NOT NULL AND ? > ? THEN 0 ELSE is_active END
+                WHERE id = ?
+            """, (starts_at, ends_at, starts_at, starts_at, now, task_id))
+            self._invalidate_task_index()
+    
+    @property
+    def quota_period(self) -> str:
+        """Текущее окно дневных квот"""
+        return self._quota_period
+    
+    async def rollover_quota_period(self, period: str):
+        """Начать новое окно квот.
+        
+        Выполняется под блокировкой записи, как и выдача заданий, поэтому каждая выдача
+        учитывается целиком либо в старом, либо в новом окне.
+        """
+        async with self._transaction() as db:
+            await db.execute("""
+                INSERT INTO settings (key, value) VALUES ('quota_period', ?)
+                ON CONFLICT (key) DO UPDATE SET value = excluded.value
+            """, (period,))
+            self._quota_period = period
+            self._invalidate_task_index()
+    
+    async def apply_task_timetable(self, now: str) -> Tuple[List[int], List[int]]:
+        """Включить и выключить задания по расписанию, вернуть (включённые, выключенные)"""
+        async with self._transaction() as db:
             async with db.execute("""
-                SELECT max_participants, current_participants 
-                FROM tasks WHERE id = ? AND is_active = 1
-            """, (task_id,)) as cursor:
-                row = await cursor.fetchone()
-                if not row:
-                    return False
-                max_p = row["max_participants"]
-                current_p = row["current_participants"]
-                # Если лимит = 0, то без ограничений
-                return max_p == 0 or current_p < max_p
-    
-    async def add_screenshot(self, user_id: int, task_id: int, file_id: str, file_path: str):
-        """Добавить скриншот"""
-        async with aiosqlite.connect(self.db_path) as db:
+                UPDATE tasks SET is_active = 1, starts_at = NULL
+                WHERE starts_at IS NOT NULL AND starts_at <= ?
+                  AND (ends_at IS NULL OR ends_at > ?) AND is_active = 0
+                RETURNING id
+            """, (now, now)) as cursor:
+                activated = [row["id"] for row in await cursor.fetchall()]
+            # Задание уже включено вручную: время включения просто наступило, объявлять нечего
             await db.execute("""
+                UPDATE tasks SET starts_at = NULL
+                WHERE starts_at IS NOT NULL AND starts_at <= ? AND is_active = 1
+            """, (now,))
+            async with db.execute("""
+                UPDATE tasks SET is_active = 0
+                WHERE ends_at IS NOT NULL AND ends_at <= ? AND is_active = 1
+                RETURNING id
+            """, (now,)) as cursor:
+                deactivated = [row["id"] for row in await cursor.fetchall()]
+            if activated or deactivated:
+                self._invalidate_task_index()
+        return activated, deactivated
+    
+    async def get_task_quota_used(self, task_id: int) -> int:
+        """Выдано мест задания в текущем окне квоты"""
+        tasks = await self._get_task_index()
+        if task_id in tasks:
+            return tasks[task_id]["period_used"]
+        value = await self._fetchvalue("""
+            SELECT used FROM task_quotas WHERE period = ? AND task_id = ?
+        """, (self._quota_period, task_id))
+        return value or 0
+    
+    async def can_assign_task(self, task_id: int) -> bool:
+        """Проверить, можно ли назначить задание (лимит не исчерпан)"""
+        await self._get_task_index()
+        return task_id in self._available_tasks
+    
+    async def add_screenshot(self, user_id: int, task_id: int, file_id: str, file_path: str) -> int:
+        """Добавить скриншот, вернуть новое количество скриншотов участника"""
+        screenshots_count, _ = await self.add_screenshots(user_id, task_id, [(file_id, file_path)])
+        return screenshots_count
+    
+    async def add_screenshots(
+        self, user_id: int, task_id: int, files: List[Tuple[str, Optional[str]]]
+    ) -> Tuple[int, List[int]]:
+        """Добавить пачку скриншотов (file_id, file_path) одной транзакцией.
+        
+        file_path может быть пустым: путь в хранилище записывает set_screenshot_content.
+        
+        Возвращает новое количество скриншотов участника и id добавленных записей.
+        """
+        upload_date = datetime.now().isoformat()
+        async with self._transaction() as db:
+            await db.executemany("""
                 INSERT INTO screenshots (user_id, task_id, file_id, file_path, upload_date)
                 VALUES (?, ?, ?, ?, ?)
-            """, (user_id, task_id, file_id, file_path, datetime.now().isoformat()))
+            """, [(user_id, task_id, file_id, file_path, upload_date) for file_id, file_path in files])
             
-            await db.execute("""
+            participant = await self._update_participant(db, """
                 UPDATE participants 
-                SET screenshots_count = screenshots_count + 1
+                SET screenshots_count = screenshots_count + ?
                 WHERE user_id = ?
-            """, (user_id,))
+            """, (len(files), user_id))
+            
+            # Записи вставлены подряд под блокировкой записи - берём последние id участника
+            async with db.execute("""
+                SELECT id FROM screenshots WHERE user_id = ? AND task_id = ?
+                ORDER BY id DESC LIMIT ?
+            """, (user_id, task_id, len(files))) as cursor:
+                ids = [r["id"] for r in await cursor.fetchall()]
+        if participant is None:
+            return 0, ids[::-1]
+        self._cache_participants([participant])
+        return participant["screenshots_count"], ids[::-1]
+    
+    async def set_screenshot_content(
+        self,
+        screenshot_id: int,
+        content_hash: str,
+        file_path: str,
+        phash: Optional[str] = None,
+        verdict: Optional[str] = None,
+        verdict_reason: Optional[str] = None,
+    ) -> Optional[int]:
+        """Сохранить хэши, путь в хранилище и результат проверки скриншота.
+        
+        Отклонённый скриншот не учитывается в screenshots_count участника.
+        Возвращает id скриншота другого участника с той же картинкой.
+        """
+        async with self._transaction() as db:
+            async with db.execute(
+                "SELECT user_id FROM screenshots WHERE id = ?", (screenshot_id,)
+            ) as cursor:
+                row = await cursor.fetchone()
+            if not row:
+                return None
+            participant = None
+            
+            # Поиск по индексам content_hash и phash
+            async with db.execute("""
+                SELECT id FROM screenshots
+                WHERE (content_hash = ? OR phash = ?) AND user_id != ?
+                ORDER BY id LIMIT 1
+            """, (content_hash, phash, row["user_id"])) as cursor:
+                duplicate = await cursor.fetchone()
+            duplicate_of = duplicate["id"] if duplicate else None
             
-            await db.commit()
+            await db.execute("""
+                UPDATE screenshots
+                SET content_hash = ?, phash = ?, file_path = ?, duplicate_of = ?,
+                    verdict = ?, verdict_reason = ?
+                WHERE id = ?
+            """, (content_hash, phash, file_path, duplicate_of, verdict, verdict_reason, screenshot_id))
+            
+            if verdict == "rejected":
+                participant = await self._update_participant(db, """
+                    UPDATE participants 
+                    SET screenshots_count = MAX(screenshots_count - 1, 0)
+                    WHERE user_id = ?
+                """, (row["user_id"],))
+        if participant is not None:
+            self._cache_participants([participant])
+        return duplicate_of
+    
+    async def get_screenshots(self, user_id: int, task_id: int) -> List[Dict]:
+        """Загруженные и не отклонённые скриншоты участника по заданию"""
+        return await self._fetchall("""
+            SELECT * FROM screenshots
+            WHERE user_id = ? AND task_id = ?
+              AND content_hash IS NOT NULL AND verdict IS NOT 'rejected'
+            ORDER BY id
+        """, (user_id, task_id))
+    
+    async def get_sheet_file_ids(self, user_id: int, task_id: int, sheet_key: str) -> Optional[List[str]]:
+        """Telegram file_id листов уже отправленной сводной картинки для этого набора скриншотов"""
+        value = await self._fetchvalue("""
+            SELECT file_ids FROM contact_sheets
+            WHERE user_id = ? AND task_id = ? AND sheet_key = ?
+        """, (user_id, task_id, sheet_key))
+        return json.loads(value) if value is not None else None
+    
+    async def save_sheet_file_ids(self, user_id: int, task_id: int, sheet_key: str, file_ids: List[str]):
+        """Запомнить file_id листов сводной картинки, чтобы повторно не загружать их в Telegram"""
+        async with self._transaction() as db:
+            await db.execute("""
+                INSERT INTO contact_sheets (user_id, task_id, sheet_key, file_ids)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (user_id, task_id) DO UPDATE
+                SET sheet_key = excluded.sheet_key, file_ids = excluded.file_ids
+            """, (user_id, task_id, sheet_key, json.dumps(file_ids)))
     
     async def get_screenshots_count(self, user_id: int) -> int:
         """Получить количество скриншотов участника"""
         participant = await self.get_participant(user_id)
         return participant["screenshots_count"] if participant else 0
     
-    async def move_to_review(self, user_id: int):
-        """Переместить участника в папку 'На проверку'"""
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("""
+    async def move_to_review(self, user_id: int) -> bool:
+        """Переместить участника в папку 'На проверку'; False - участие уже обработано"""
+        async with self._transaction() as db:
+            # Только из выполнения задания: завершённое участие не возвращается на проверку
+            participant = await self._update_participant(db, """
                 UPDATE participants 
                 SET status = 'pending_review'
-                WHERE user_id = ?
+                WHERE user_id = ? AND status = 'task_assigned'
             """, (user_id,))
-            await db.commit()
+        if participant is None:
+            return False
+        self._cache_participants([participant])
+        return True
     
-    async def add_requisites(self, user_id: int, requisites: str):
-        """Добавить реквизиты участника"""
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("""
+    async def add_requisites(self, user_id: int, requisites: str) -> bool:
+        """Добавить реквизиты участника; False - участник уже отклонён или не на проверке"""
+        async with self._transaction() as db:
+            participant = await self._update_participant(db, f"""
                 UPDATE participants 
                 SET requisites = ?, status = 'pending_payment'
-                WHERE user_id = ?
+                WHERE user_id = ? AND status IN {REQUISITES_STATUSES}
             """, (requisites, user_id))
-            await db.commit()
+        if participant is None:
+            return False
+        self._cache_participants([participant])
+        return True
+    
+    async def apply_transition(self, action: str, user_ids: Iterable[int]) -> List[Dict]:
+        """Применить действие админа (approve/reject/pay) к участникам одной транзакцией.
+        
+        Участники не в допустимом исходном статусе пропускаются; возвращаются
+        изменённые строки. Изменение - один UPDATE, поэтому участие и счётчики
+        обновляются триггерами в той же транзакции, а кэш статистики сбрасывается один раз.
+        """
+        sources, target = STATUS_TRANSITIONS[action]
+        user_ids = sorted(set(user_ids))
+        if not user_ids:
+            return []
+        
+        async with self._transaction() as db:
+            # Список id передаётся одним параметром: не упираемся в лимит числа параметров
+            async with db.execute(f"""
+                UPDATE participants SET status = ?
+                WHERE user_id IN (SELECT value FROM json_each(?))
+                  AND status IN ({", ".join("?" * len(sources))})
+                RETURNING *
+            """, (target, json.dumps(user_ids), *sources)) as cursor:
+                rows = [dict(row) for row in await cursor.fetchall()]
+        self._cache_participants(rows)
+        return rows
     
     async def get_participants_by_status(self, status: str) -> List[Dict]:
         """Получить участников по статусу"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            async with db.execute("""
-                SELECT * FROM participants 
-                WHERE status = ?
-                ORDER BY task_received_date DESC
-            """, (status,)) as cursor:
-                rows = await cursor.fetchall()
-                return [dict(row) for row in rows]
+        return await self._fetchall("""
+            SELECT * FROM participants 
+            WHERE status = ?
+            ORDER BY task_received_date DESC
+        """, (status,))
     
-    async def get_statistics(self) -> Dict:
-        """Получить статистику"""
-        # TODO: Добавить кэширование статистики для производительности
-        async with aiosqlite.connect(self.db_path) as db:
-            stats = {}
-            
-            # Всего участников
-            async with db.execute("SELECT COUNT(*) FROM participants") as cursor:
-                stats["total_participants"] = (await cursor.fetchone())[0]
-            
-            # На проверку
-            async with db.execute("SELECT COUNT(*) FROM participants WHERE status = 'pending_review'") as cursor:
-                stats["pending_review"] = (await cursor.fetchone())[0]
+    async def get_participants_page(
+        self, status: str, cursor: Optional[Tuple[str, int]] = None,
+        backward: bool = False, page_size: int = 10
+    ) -> Dict:
+        """Страница участников по статусу (новые первыми) с пагинацией по ключу.
+        
+        cursor - (task_received_date, user_id) граничной записи соседней страницы:
+        при backward=False возвращаются записи после неё, при backward=True - перед ней.
+        Читается ровно page_size + 1 строка (лишняя - признак следующей страницы).
+        """
+        query = "SELECT * FROM participants WHERE status = ?"
+        params: List[Any] = [status]
+        if cursor is not None:
+            query += " AND (task_received_date, user_id) > (?, ?)" if backward else " AND (task_received_date, user_id) < (?, ?)"
+            params.extend(cursor)
+        order = "ASC" if backward else "DESC"
+        query += f" ORDER BY task_received_date {order}, user_id {order} LIMIT ?"
+        params.append(page_size + 1)
+        
+        rows = await self._fetchall(query, params)
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if backward:
+            rows.reverse()
+            return {"rows": rows, "has_prev": has_more, "has_next": True}
+        return {"rows": rows, "has_prev": cursor is not None, "has_next": has_more}
+    
+    async def get_status_count(self, status: str) -> int:
+        """Количество участников в статусе (из счётчиков, без COUNT)"""
+        value = await self._fetchvalue("""
+            SELECT value FROM counters WHERE task_id = 0 AND day = '' AND name = ?
+        """, (f"status:{status}",))
+        return value or 0
+    
+    async def get_fsm_record(self, key: str) -> Optional[Dict]:
+        """Прочитать состояние FSM по ключу"""
+        return await self._fetchone("SELECT state, data FROM fsm_states WHERE key = ?", (key,))
+    
+    async def save_fsm_records(self, records: List[Tuple[str, Optional[str], str]]):
+        """Записать пачку состояний FSM (key, state, data_json); пустые записи удаляются"""
+        empty = [(key,) for key, state, data in records if state is None and data == "{}"]
+        filled = [record for record in records if record[1] is not None or record[2] != "{}"]
+        async with self._transaction() as db:
+            if filled:
+                await db.executemany("""
+                    INSERT INTO fsm_states (key, state, data) VALUES (?, ?, ?)
+                    ON CONFLICT (key) DO UPDATE SET state = excluded.state, data = excluded.data
+                """, filled)
+            if empty:
+                await db.executemany("DELETE FROM fsm_states WHERE key = ?", empty)
+    
+    async def create_broadcast(self, text: str, task_id: Optional[int], admin_chat_id: Optional[int]) -> Dict:
+        """Создать рассылку всем участникам, не заблокировавшим бота"""
+        async with self._transaction() as db:
+            async with db.execute(
+                "SELECT COUNT(*) FROM participants WHERE blocked_date IS NULL"
+            ) as cursor:
+                total = (await cursor.fetchone())[0]
+            cursor = await db.execute("""
+                INSERT INTO broadcasts (task_id, text, admin_chat_id, total, created_date)
+                VALUES (?, ?, ?, ?, ?)
+            """, (task_id, text, admin_chat_id, total, datetime.now().isoformat()))
+            broadcast_id = cursor.lastrowid
+            async with db.execute("SELECT * FROM broadcasts WHERE id = ?", (broadcast_id,)) as cursor:
+                return dict(await cursor.fetchone())
+    
+    async def get_unfinished_broadcasts(self) -> List[Dict]:
+        """Рассылки, прерванные остановкой бота"""
+        return await self._fetchall("SELECT * FROM broadcasts WHERE status = 'running' ORDER BY id")
+    
+    async def get_broadcast_recipients(self, after_user_id: int, limit: int) -> List[int]:
+        """Следующая порция получателей рассылки (по возрастанию user_id)"""
+        rows = await self._fetchall("""
+            SELECT user_id FROM participants
+            WHERE user_id > ? AND blocked_date IS NULL
+            ORDER BY user_id LIMIT ?
+        """, (after_user_id, limit))
+        return [row["user_id"] for row in rows]
+    
+    async def save_broadcast_progress(
+        self, broadcast: Dict, blocked_user_ids: Iterable[int] = (), finished: bool = False
+    ):
+        """Сохранить прогресс рассылки и отметить заблокировавших бота участников"""
+        blocked_user_ids = list(blocked_user_ids)
+        now = datetime.now().isoformat()
+        async with self._transaction() as db:
+            await db.execute("""
+                UPDATE broadcasts
+                SET status_message_id = ?, last_user_id = ?, sent = ?, blocked = ?, failed = ?,
+                    status = ?, finished_date = ?
+                WHERE id = ?
+            """, (
+                broadcast["status_message_id"], broadcast["last_user_id"],
+                broadcast["sent"], broadcast["blocked"], broadcast["failed"],
+                "finished" if finished else "running", now if finished else None,
+                broadcast["id"],
+            ))
+            await self._mark_blocked(db, blocked_user_ids, now)
+        self._forget_participants(blocked_user_ids)
+    
+    async def mark_blocked(self, user_ids: Iterable[int]):
+        """Отметить участников, заблокировавших бота"""
+        user_ids = list(user_ids)
+        async with self._transaction() as db:
+            await self._mark_blocked(db, user_ids, datetime.now().isoformat())
+        self._forget_participants(user_ids)
+    
+    @staticmethod
+    async def _mark_blocked(db: aiosqlite.Connection, user_ids: List[int], now: str):
+        await db.executemany(
+            "UPDATE participants SET blocked_date = ? WHERE user_id = ?",
+            [(now, user_id) for user_id in user_ids],
+        )
+    
+    async def archive_participations(self, before: str, archive_name: str, batch_size: int = 500) -> Tuple[int, List[str]]:
+        """Перенести в архив пачку завершённых до before участий в выключенных заданиях.
+        
+        Участие вместе со строками его скриншотов сжимается в одну запись participations_archive
+        и удаляется из рабочих таблиц. archive_name - файл, в который будут сложены скриншоты.
+        Возвращает количество участий и хэши файлов, на которые больше не ссылается ни один скриншот.
+        """
+        async with self._transaction() as db:
+            async with db.execute("""
+                SELECT p.* FROM participations p JOIN tasks t ON t.id = p.task_id
+                WHERE p.finished_date IS NOT NULL AND p.finished_date < ? AND t.is_active = 0
+                LIMIT ?
+            """, (before, batch_size)) as cursor:
+                participations = [dict(row) for row in await cursor.fetchall()]
+            if not participations:
+                return 0, []
             
-            # На оплату
-            async with db.execute("SELECT COUNT(*) FROM participants WHERE status = 'pending_payment'") as cursor:
-                stats["pending_payment"] = (await cursor.fetchone())[0]
+            now = datetime.now().isoformat()
+            hashes = set()
+            records = []
+            for participation in participations:
+                key = (participation["user_id"], participation["task_id"])
+                async with db.execute(
+                    "SELECT * FROM screenshots WHERE user_id = ? AND task_id = ?", key
+                ) as cursor:
+                    screenshots = [dict(row) for row in await cursor.fetchall()]
+                hashes.update(s["content_hash"] for s in screenshots if s["content_hash"])
+                data = {"participation": participation, "screenshots": screenshots, "files": archive_name}
+                records.append((*key, now, zlib.compress(json.dumps(data, ensure_ascii=False).encode())))
             
-            # Активных заданий
-            async with db.execute("SELECT COUNT(*) FROM tasks WHERE is_active = 1") as cursor:
-                stats["active_tasks"] = (await cursor.fetchone())[0]
+            keys = [(user_id, task_id) for user_id, task_id, _, _ in records]
+            await db.executemany("""
+                INSERT OR REPLACE INTO participations_archive (user_id, task_id, archived_date, data)
+                VALUES (?, ?, ?, ?)
+            """, records)
+            await db.executemany("DELETE FROM screenshots WHERE user_id = ? AND task_id = ?", keys)
+            await db.executemany("DELETE FROM contact_sheets WHERE user_id = ? AND task_id = ?", keys)
+            await db.executemany("DELETE FROM participations WHERE user_id = ? AND task_id = ?", keys)
             
-            return stats
+            # Файл хранится по хэшу один раз и может быть нужен скриншотам других участий
+            orphaned = []
+            for content_hash in sorted(hashes):
+                async with db.execute(
+                    "SELECT 1 FROM screenshots WHERE content_hash = ? LIMIT 1", (content_hash,)
+                ) as cursor:
+                    if await cursor.fetchone() is None:
+                        orphaned.append(content_hash)
+        return len(records), orphaned
+    
+    async def get_referenced_hashes(self, hashes: Iterable[str]) -> List[str]:
+        """Хэши, на которые снова ссылаются скриншоты (картинку прислали повторно)"""
+        rows = await self._fetchall("""
+            SELECT DISTINCT content_hash FROM screenshots
+            WHERE content_hash IN (SELECT value FROM json_each(?))
+        """, (json.dumps(list(hashes)),))
+        return [row["content_hash"] for row in rows]
+    
+    async def get_archived_participation(self, user_id: int, task_id: int) -> Optional[Dict]:
+        """Участие из архива: {"participation", "screenshots", "files"}"""
+        value = await self._fetchvalue("""
+            SELECT data FROM participations_archive WHERE user_id = ? AND task_id = ?
+        """, (user_id, task_id))
+        return json.loads(zlib.decompress(value)) if value is not None else None
+    
+    def invalidate_statistics(self):
+        """Сбросить кэш статистики (вызывается после каждой записи)"""
+        self._stats_cache = None
+        self._stats_generation += 1
+        # Версия меняется только после COMMIT: отрисованное по старым данным не попадёт под новую версию
+        if self._tasks_changed:
+            self._tasks_changed = False
+            self._tasks_version += 1
+    
+    async def get_statistics(self) -> Dict:
+        """Получить статистику из счётчиков (общие и за сегодня)"""
+        today = datetime.now().date().isoformat()
+        cached = self._stats_cache
+        if cached is not None and cached["day"] == today:
+            return dict(cached)
+        
+        generation = self._stats_generation
+        rows = await self._fetchall("""
+            SELECT day, name, value FROM counters
+            WHERE task_id = 0 AND day IN ('', ?)
+        """, (today,))
+        totals = {row["name"]: row["value"] for row in rows if row["day"] == ""}
+        daily = {row["name"]: row["value"] for row in rows if row["day"] == today}
+        
+        stats = {
+            "day": today,
+            "total_participants": totals.get("participants", 0),
+            "pending_review": totals.get("status:pending_review", 0),
+            "pending_payment": totals.get("status:pending_payment", 0),
+            "active_tasks": totals.get("active_tasks", 0),
+            "today_assigned": daily.get("assigned", 0),
+            "today_reviewed": daily.get("reviewed", 0),
+            "today_paid": daily.get("paid", 0),
+        }
+        if generation == self._stats_generation:
+            self._stats_cache = stats
+        return dict(stats)
+    
+    async def get_task_statistics(self, task_id: int, days: int = 7) -> Dict:
+        """Получить счётчики задания: за всё время и по последним дням"""
+        rows = await self._fetchall("""
+            SELECT day, name, value FROM counters
+            WHERE task_id = ? AND (day = '' OR day >= date('now', 'localtime', ?))
+        """, (task_id, f"-{days - 1} days"))
+        stats = {"total": {}, "by_day": {}}
+        for row in rows:
+            if row["day"] == "":
+                stats["total"][row["name"]] = row["value"]
+            else:
+                stats["by_day"].setdefault(row["day"], {})[row["name"]] = row["value"]
+        return stats
 
@@ -0,0 +1,148 @@
+"""
+Фоновая загрузка скриншотов
+
+Обработчик сообщения только ставит файл в очередь и сразу отвечает
+пользователю, а загрузку выполняет пул воркеров с ограниченной очередью.
+Один и тот же файл (file_unique_id), присланный несколько раз, пока он
+ещё загружается, скачивается один раз: каждая ожидающая его запись
+скриншота получает свою копию файла и свой вызов on_complete.
+"""
+
+import asyncio
+import logging
+import os
+import shutil
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from aiogram import Bot
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class DownloadJob:
+    """Задача на загрузку одного файла"""
+    file_id: str
+    file_unique_id: str
+    destination: str
+    screenshot_id: Optional[int] = None
+    user_id: Optional[int] = None
+
+# Вызывается после успешной загрузки (например, перенос в хранилище)
+CompleteCallback = Callable[[DownloadJob], Awaitable[None]]
+
+class ScreenshotDownloader:
+    def __init__(
+        self,
+        bot: Bot,
+        workers: int = 4,
+        queue_size: int = 1000,
+        retries: int = 3,
+        backoff: float = 1.0,
+        on_complete: Optional[CompleteCallback] = None,
+    ):
+        self.bot = bot
+        self.workers = workers
+        self.queue_size = queue_size
+        self.retries = retries
+        self.backoff = backoff
+        self.on_complete = on_complete
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        # file_unique_id в очереди или в загрузке -> задачи всех ожидающих его записей скриншотов
+        self._pending: Dict[str, List[DownloadJob]] = {}
+        self._downloaded = 0
+        self._failed = 0
+        self._total_latency = 0.0
+        self._last_latency = 0.0
+
+    async def start(self):
+        """Запустить воркеры"""
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Дождаться загрузки всех файлов из очереди и остановить воркеры"""
+        if self._queue is None:
+            return
+        await self._queue.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    async def enqueue(self, job: DownloadJob) -> bool:
+        """Поставить файл в очередь.
+        
+        False - этот файл уже загружается: запись скриншота получит его по окончании загрузки.
+        """
+        waiting = self._pending.get(job.file_unique_id)
+        if waiting is not None:
+            if all(other.screenshot_id != job.screenshot_id for other in waiting):
+                waiting.append(job)
+            return False
+        self._pending[job.file_unique_id] = [job]
+        # Если очередь заполнена, ждём свободного места (обратное давление)
+        await self._queue.put(job)
+        return True
+
+    def stats(self) -> Dict:
+        """Метрики для мониторинга"""
+        return {
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "pending": sum(map(len, self._pending.values())),
+            "downloaded": self._downloaded,
+            "failed": self._failed,
+            "last_latency": self._last_latency,
+            "avg_latency": self._total_latency / self._downloaded if self._downloaded else 0.0,
+        }
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._download(job)
+            finally:
+                self._pending.pop(job.file_unique_id, None)
+                self._queue.task_done()
+
+    async def _download(self, job: DownloadJob):
+        """Загрузить файл с повторами; файл появляется на диске только целиком"""
+        started = time.monotonic()
+        tmp_path = f"{job.destination}.part"
+        for attempt in range(self.retries + 1):
+            try:
+                file_info = await self.bot.get_file(job.file_id)
+                await self.bot.download_file(file_info.file_path, tmp_path)
+                os.replace(tmp_path, job.destination)
+                break
+            except Exception as e:
+                if attempt == self.retries:
+                    self._failed += len(self._pending.pop(job.file_unique_id, [job]))
+                    logger.error("Не удалось загрузить %s: %s", job.file_id, e)
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                    return
+                await asyncio.sleep(self.backoff * 2 ** attempt)
+
+        self._last_latency = time.monotonic() - started
+        self._total_latency += self._last_latency
+        self._downloaded += 1
+
+        # Список забираем без await после загрузки: записи, поставленные позже, скачают файл заново
+        waiting = self._pending.pop(job.file_unique_id, [job])
+        for other in waiting[1:]:
+            # Каждой записи свой файл: хранилище переносит или удаляет его при обработке
+            try:
+                os.link(job.destination, other.destination)
+            except OSError:
+                shutil.copyfile(job.destination, other.destination)
+        for other in waiting:
+            if self.on_complete is None:
+                continue
+            try:
+                await self.on_complete(other)
+            except Exception:
+                logger.exception("Ошибка обработки загруженного файла %s", other.destination)
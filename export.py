@@ -0,0 +1,165 @@
+"""
+Потоковая выгрузка данных в CSV/XLSX
+
+Строки читаются из БД порциями (fetchmany) и сразу пишутся в файл,
+поэтому память не зависит от размера таблицы. Запись в файл выполняется
+в пуле потоков, чтобы не блокировать цикл событий.
+"""
+
+import asyncio
+import csv
+import gzip
+import os
+from datetime import date, datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from openpyxl import Workbook
+
+from database import Database
+
+# Запрос и колонки, по которым работают фильтры status/task/from/to
+EXPORT_KINDS = {
+    "participants": (
+        """
+        SELECT user_id, username, full_name, registration_date, current_task_id,
+               status, task_received_date, screenshots_count, requisites
+        FROM participants WHERE 1 = 1
+        """,
+        {"status": "status", "task": "current_task_id", "date": "task_received_date"},
+    ),
+    "screenshots": (
+        """
+        SELECT id, user_id, task_id, file_id, file_path, upload_date,
+               content_hash, verdict, verdict_reason, duplicate_of
+        FROM screenshots WHERE 1 = 1
+        """,
+        {"status": "verdict", "task": "task_id", "date": "upload_date"},
+    ),
+    # Выплаты - по истории участий: у участника, взявшего следующее задание,
+    # в participants уже новое задание и статус, а выплата за прошлое остаётся
+    "payouts": (
+        """
+        SELECT p.user_id, u.username, u.full_name, p.task_id, p.assigned_date,
+               p.status, p.requisites, p.finished_date
+        FROM participations p JOIN participants u ON u.user_id = p.user_id
+        WHERE p.status IN ('pending_payment', 'paid')
+        """,
+        {"status": "p.status", "task": "p.task_id", "date": "p.assigned_date"},
+    ),
+}
+
+EXPORT_USAGE = (
+    "Использование: /export [participants|screenshots|payouts] "
+    "[status=...] [task=ID] [from=ГГГГ-ММ-ДД] [to=ГГГГ-ММ-ДД] [csv|xlsx] [gz]"
+)
+
+# Количество строк, читаемых из БД за один раз
+CHUNK_SIZE = 2000
+
+ProgressCallback = Callable[[int], Awaitable[None]]
+
+def parse_export_args(text: str) -> Tuple[str, Dict[str, Any], str, bool]:
+    """Разобрать аргументы команды /export: (вид, фильтры, формат, сжатие)"""
+    kind, filters, fmt, compress = "participants", {}, "csv", False
+    for arg in text.split()[1:]:
+        if arg in EXPORT_KINDS:
+            kind = arg
+        elif arg in ("csv", "xlsx"):
+            fmt = arg
+        elif arg == "gz":
+            compress = True
+        elif "=" in arg:
+            key, value = arg.split("=", 1)
+            if key == "status":
+                filters["status"] = value
+            elif key == "task":
+                filters["task"] = int(value)
+            elif key in ("from", "to"):
+                filters[key] = date.fromisoformat(value)
+            else:
+                raise ValueError(f"неизвестный фильтр {key}")
+        else:
+            raise ValueError(f"неизвестный параметр {arg}")
+    return kind, filters, fmt, compress
+
+def build_export_query(kind: str, filters: Dict[str, Any]) -> Tuple[str, List[Any]]:
+    """Собрать SQL-запрос выгрузки с фильтрами"""
+    query, columns = EXPORT_KINDS[kind]
+    params: List[Any] = []
+    if "status" in filters:
+        query += f" AND {columns['status']} = ?"
+        params.append(filters["status"])
+    if "task" in filters:
+        query += f" AND {columns['task']} = ?"
+        params.append(filters["task"])
+    # Даты хранятся в ISO-формате, поэтому сравниваются как строки
+    if "from" in filters:
+        query += f" AND {columns['date']} >= ?"
+        params.append(filters["from"].isoformat())
+    if "to" in filters:
+        query += f" AND {columns['date']} < ?"
+        params.append((filters["to"] + timedelta(days=1)).isoformat())
+    return query, params
+
+class _CsvWriter:
+    def __init__(self, path: str, compress: bool):
+        if compress:
+            self._file = gzip.open(path, "wt", encoding="utf-8-sig", newline="")
+        else:
+            self._file = open(path, "w", encoding="utf-8-sig", newline="")
+        self._writer = csv.writer(self._file, delimiter=";")
+
+    def write_rows(self, rows: Sequence[Sequence[Any]]):
+        self._writer.writerows(rows)
+
+    def close(self):
+        self._file.close()
+
+class _XlsxWriter:
+    def __init__(self, path: str):
+        self._path = path
+        # write_only: строки сразу сбрасываются во временный файл, а не хранятся в памяти
+        self._workbook = Workbook(write_only=True)
+        self._sheet = self._workbook.create_sheet()
+
+    def write_rows(self, rows: Sequence[Sequence[Any]]):
+        for row in rows:
+            self._sheet.append(list(row))
+
+    def close(self):
+        self._workbook.save(self._path)
+
+async def export_to_file(
+    db: Database,
+    kind: str,
+    filters: Dict[str, Any],
+    fmt: str,
+    compress: bool,
+    dest_dir: str,
+    progress: Optional[ProgressCallback] = None,
+) -> Tuple[str, int]:
+    """Выгрузить данные в файл, вернуть (путь, количество строк)"""
+    os.makedirs(dest_dir, exist_ok=True)
+    filename = f"{kind}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{fmt}"
+    # XLSX уже сжат внутри, gzip применяем только к CSV
+    if fmt == "csv" and compress:
+        filename += ".gz"
+    path = os.path.join(dest_dir, filename)
+
+    loop = asyncio.get_running_loop()
+    writer = _XlsxWriter(path) if fmt == "xlsx" else _CsvWriter(path, compress)
+    query, params = build_export_query(kind, filters)
+    total = 0
+    header_written = False
+    try:
+        async for columns, rows in db.stream_rows(query, params, CHUNK_SIZE):
+            if not header_written:
+                await loop.run_in_executor(None, writer.write_rows, [columns])
+                header_written = True
+            await loop.run_in_executor(None, writer.write_rows, rows)
+            total += len(rows)
+            if progress is not None:
+                await progress(total)
+    finally:
+        await loop.run_in_executor(None, writer.close)
+    return path, total
@@ -0,0 +1,154 @@
+"""
+Хранилище состояний FSM в SQLite
+
+Состояния участников и админов переживают перезапуск бота. Чтения
+обслуживаются из LRU-кэша в памяти, а изменения копятся и записываются
+в БД пачками (write-behind) раз в flush_interval секунд или при
+накоплении flush_batch изменений. При остановке всё дописывается, а
+изменения после остановки (обработчики, которые ещё выполнялись) пишутся
+сразу.
+"""
+
+import asyncio
+import json
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+from database import Database
+
+logger = logging.getLogger(__name__)
+
+class SQLiteStorage(BaseStorage):
+    def __init__(
+        self,
+        db: Database,
+        cache_size: int = 10000,
+        flush_interval: float = 0.5,
+        flush_batch: int = 200,
+    ):
+        self.db = db
+        self.cache_size = cache_size
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        # key -> {"state": ..., "data": ...}
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._dirty: Set[str] = set()
+        # Ключи, которые сейчас записываются в БД (их тоже нельзя вытеснять)
+        self._flushing: Set[str] = set()
+        self._flusher: Optional[asyncio.Task] = None
+        self._batch_flush: Optional[asyncio.Task] = None
+        self._closed = False
+
+    @staticmethod
+    def _key(key: StorageKey) -> str:
+        return f"{key.bot_id}:{key.chat_id}:{key.user_id}:{key.thread_id or 0}:{key.destiny}"
+
+    async def _record(self, key: StorageKey) -> Dict[str, Any]:
+        """Запись из кэша или из БД"""
+        storage_key = self._key(key)
+        record = self._cache.get(storage_key)
+        if record is not None:
+            self._cache.move_to_end(storage_key)
+            return record
+
+        row = await self.db.get_fsm_record(storage_key)
+        # Пока читали из БД, запись могла появиться в кэше - она новее
+        record = self._cache.get(storage_key)
+        if record is not None:
+            return record
+        record = {
+            "state": row["state"] if row else None,
+            "data": json.loads(row["data"]) if row and row["data"] else {},
+        }
+        self._evict()
+        self._cache[storage_key] = record
+        return record
+
+    def _evict(self):
+        """Освободить место под новую запись, вытеснив самые старые уже сохранённые"""
+        if len(self._cache) < self.cache_size:
+            return
+        for storage_key in list(self._cache):
+            if len(self._cache) < self.cache_size:
+                break
+            if storage_key not in self._dirty and storage_key not in self._flushing:
+                del self._cache[storage_key]
+
+    def _mark_dirty(self, key: StorageKey):
+        self._dirty.add(self._key(key))
+        if self._closed:
+            return
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_loop())
+        # Накопилось много изменений - пишем сразу, не дожидаясь интервала
+        if len(self._dirty) >= self.flush_batch and (self._batch_flush is None or self._batch_flush.done()):
+            self._batch_flush = asyncio.create_task(self._safe_flush())
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        record = await self._record(key)
+        record["state"] = state.state if isinstance(state, State) else state
+        self._mark_dirty(key)
+        if self._closed:
+            await self.flush()
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return (await self._record(key))["state"]
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        record = await self._record(key)
+        record["data"] = data.copy()
+        self._mark_dirty(key)
+        if self._closed:
+            await self.flush()
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return (await self._record(key))["data"].copy()
+
+    async def flush(self):
+        """Записать накопленные изменения одной транзакцией"""
+        if not self._dirty:
+            return
+        keys, self._dirty = self._dirty, set()
+        self._flushing |= keys
+        records = [
+            (key, self._cache[key]["state"], json.dumps(self._cache[key]["data"], ensure_ascii=False))
+            for key in keys
+        ]
+        try:
+            await self.db.save_fsm_records(records)
+        except BaseException:
+            # Не потеряем изменения - попробуем записать в следующий раз
+            self._dirty |= keys
+            raise
+        finally:
+            self._flushing -= keys
+
+    async def _safe_flush(self):
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("Не удалось сохранить состояния FSM")
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self._safe_flush()
+
+    async def close(self) -> None:
+        """Остановить фоновую запись и дописать оставшиеся изменения.
+        
+        Повторный вызов дописывает изменения, сделанные после первого.
+        """
+        self._closed = True
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        if self._batch_flush is not None:
+            await asyncio.gather(self._batch_flush, return_exceptions=True)
+            self._batch_flush = None
+        await self.flush()
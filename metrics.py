@@ -0,0 +1,231 @@
+"""
+Метрики обработчиков и запросов к БД
+
+Middleware замеряет время каждого обработчика aiogram и считает ошибки,
+обёртка над Database - время и количество вызовов каждого метода.
+Метрики отдаются в формате Prometheus по HTTP и кратко - админу по /metrics.
+Запросы дольше порога пишутся в журнал медленных запросов.
+Всё хранится в словарях в памяти; замер - два вызова perf_counter и
+поиск корзины гистограммы, поэтому метрики можно не выключать.
+"""
+
+import functools
+import inspect
+import logging
+import time
+from bisect import bisect_left
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+slow_log = logging.getLogger("slow_queries")
+
+# Границы корзин гистограмм (секунды)
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        # Последняя корзина - значения больше всех границ (+Inf)
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Оценка квантиля по границам корзин"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+class MetricsRegistry:
+    def __init__(self):
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._counters: Dict[str, Dict[Labels, int]] = {}
+        self._gauges: Dict[str, Callable[[], float]] = {}
+        self._help: Dict[str, str] = {}
+
+    def observe(self, name: str, value: float, **labels: str):
+        series = self._histograms.setdefault(name, {})
+        key = tuple(sorted(labels.items()))
+        histogram = series.get(key)
+        if histogram is None:
+            histogram = series[key] = Histogram()
+        histogram.observe(value)
+
+    def inc(self, name: str, value: int = 1, **labels: str):
+        series = self._counters.setdefault(name, {})
+        key = tuple(sorted(labels.items()))
+        series[key] = series.get(key, 0) + value
+
+    def gauge(self, name: str, func: Callable[[], float], help_text: str = ""):
+        """Показатель, значение которого вычисляется при выгрузке"""
+        self._gauges[name] = func
+        if help_text:
+            self._help[name] = help_text
+
+    def describe(self, name: str, help_text: str):
+        self._help[name] = help_text
+
+    def histograms(self, name: str) -> Dict[Labels, Histogram]:
+        return self._histograms.get(name, {})
+
+    def counters(self, name: str) -> Dict[Labels, int]:
+        return self._counters.get(name, {})
+
+    @staticmethod
+    def _format_labels(labels: Labels, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+        # Значения меток - имена обработчиков и методов, экранирование не требуется
+        items = labels + extra
+        if not items:
+            return ""
+        return "{" + ",".join(f'{key}="{value}"' for key, value in items) + "}"
+
+    def render(self) -> str:
+        """Все метрики в текстовом формате Prometheus"""
+        lines: List[str] = []
+        for name, series in self._histograms.items():
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, histogram in series.items():
+                cumulative = 0
+                for bound, count in zip(BUCKETS, histogram.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{self._format_labels(labels, (('le', str(bound)),))} {cumulative}")
+                lines.append(f"{name}_bucket{self._format_labels(labels, (('le', '+Inf'),))} {histogram.count}")
+                lines.append(f"{name}_sum{self._format_labels(labels)} {histogram.sum}")
+                lines.append(f"{name}_count{self._format_labels(labels)} {histogram.count}")
+        for name, series in self._counters.items():
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} counter")
+            for labels, value in series.items():
+                lines.append(f"{name}{self._format_labels(labels)} {value}")
+        for name, func in self._gauges.items():
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} gauge")
+            try:
+                lines.append(f"{name} {float(func())}")
+            except Exception:
+                logger.exception("Не удалось вычислить показатель %s", name)
+        return "\n".join(lines) + "\n"
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Время выполнения и ошибки обработчиков (подключается как inner middleware)"""
+
+    def __init__(self, registry: MetricsRegistry):
+        self.registry = registry
+        registry.describe("bot_handler_seconds", "Время выполнения обработчика")
+        registry.describe("bot_handler_errors_total", "Ошибки в обработчиках")
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        handler_object = data.get("handler")
+        name = getattr(getattr(handler_object, "callback", None), "__name__", "unknown")
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            self.registry.inc("bot_handler_errors_total", handler=name)
+            raise
+        finally:
+            self.registry.observe("bot_handler_seconds", time.perf_counter() - started, handler=name)
+
+def instrument_database(db: Any, registry: MetricsRegistry, slow_threshold: Optional[float] = None):
+    """Обернуть публичные асинхронные методы Database замером времени.
+
+    Вызовы дольше slow_threshold секунд пишутся в журнал медленных запросов.
+    """
+    registry.describe("bot_db_seconds", "Время выполнения метода Database")
+    registry.describe("bot_db_errors_total", "Ошибки в методах Database")
+    for name, method in inspect.getmembers(db, inspect.iscoroutinefunction):
+        if name.startswith("_"):
+            continue
+        setattr(db, name, _timed(method, name, registry, slow_threshold))
+
+def _timed(method: Callable[..., Awaitable[Any]], name: str, registry: MetricsRegistry, slow_threshold: Optional[float]):
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await method(*args, **kwargs)
+        except Exception:
+            registry.inc("bot_db_errors_total", method=name)
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            registry.observe("bot_db_seconds", elapsed, method=name)
+            if slow_threshold is not None and elapsed >= slow_threshold:
+                # Аргументы не пишем: среди них бывают реквизиты участников
+                slow_log.warning("%s заняло %.1f мс", name, elapsed * 1000)
+    return wrapper
+
+def summary(registry: MetricsRegistry, limit: int = 5) -> str:
+    """Краткая сводка для админа: самые медленные обработчики и методы БД"""
+    lines = []
+    for title, name, label in (
+        ("⏱ Обработчики", "bot_handler_seconds", "handler"),
+        ("🗄 Запросы к БД", "bot_db_seconds", "method"),
+    ):
+        series = sorted(
+            registry.histograms(name).items(), key=lambda item: item[1].quantile(0.95), reverse=True
+        )[:limit]
+        lines.append(f"<b>{title}</b> (p95 / среднее / вызовов):")
+        if not series:
+            lines.append("• нет данных")
+        for labels, histogram in series:
+            average = histogram.sum / histogram.count * 1000
+            lines.append(
+                f"• {dict(labels)[label]}: ≤{histogram.quantile(0.95) * 1000:g} мс / {average:.2f} мс / {histogram.count}"
+            )
+        lines.append("")
+    errors = sum(registry.counters("bot_handler_errors_total").values())
+    lines.append(f"❗️ Ошибок в обработчиках: {errors}")
+    return "\n".join(lines)
+
+class MetricsServer:
+    """HTTP-сервер с метриками для Prometheus"""
+
+    def __init__(self, registry: MetricsRegistry, host: str = "127.0.0.1", port: int = 9090):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._runner: Optional[web.AppRunner] = None
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info("Метрики доступны на http://%s:%s/metrics", self.host, self.port)
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        return web.Response(text=self.registry.render(), content_type="text/plain", charset="utf-8")
@@ -0,0 +1,367 @@
+"""
+Миграции схемы базы данных
+
+Каждая миграция - упорядоченный набор идемпотентных SQL-выражений,
+которые применяются при старте в одной транзакции.
+Текущая версия схемы хранится в PRAGMA user_version.
+"""
+
+# Базовые таблицы
+BASE_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS participants (
+        user_id INTEGER PRIMARY KEY,
+        username TEXT,
+        full_name TEXT,
+        registration_date TEXT,
+        current_task_id INTEGER,
+        status TEXT DEFAULT 'registered',
+        task_received_date TEXT,
+        screenshots_count INTEGER DEFAULT 0,
+        requisites TEXT,
+        FOREIGN KEY (current_task_id) REFERENCES tasks(id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS tasks (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        description TEXT NOT NULL,
+        created_date TEXT,
+        is_active INTEGER DEFAULT 1,
+        max_participants INTEGER DEFAULT 0,
+        current_participants INTEGER DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS screenshots (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        task_id INTEGER,
+        file_id TEXT,
+        file_path TEXT,
+        upload_date TEXT,
+        FOREIGN KEY (user_id) REFERENCES participants(user_id),
+        FOREIGN KEY (task_id) REFERENCES tasks(id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS settings (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    )
+    """,
+)
+
+# Счётчики статистики поддерживаются триггерами при каждом изменении статуса и заданий.
+# Ключ (task_id, day, name): task_id = 0 - по всем заданиям, day = '' - за всё время.
+COUNTERS_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS counters (
+        task_id INTEGER NOT NULL DEFAULT 0,
+        day TEXT NOT NULL DEFAULT '',
+        name TEXT NOT NULL,
+        value INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (task_id, day, name)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS counters_participant_insert AFTER INSERT ON participants
+    BEGIN
+        INSERT INTO counters (name, value) VALUES ('participants', 1), ('status:' || NEW.status, 1)
+        ON CONFLICT (task_id, day, name) DO UPDATE SET value = value + excluded.value;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS counters_participant_delete AFTER DELETE ON participants
+    BEGIN
+        INSERT INTO counters (name, value) VALUES ('participants', -1), ('status:' || OLD.status, -1)
+        ON CONFLICT (task_id, day, name) DO UPDATE SET value = value + excluded.value;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS counters_participant_status AFTER UPDATE OF status ON participants
+    WHEN OLD.status IS NOT NEW.status
+    BEGIN
+        INSERT INTO counters (name, value) VALUES ('status:' || OLD.status, -1), ('status:' || NEW.status, 1)
+        ON CONFLICT (task_id, day, name) DO UPDATE SET value = value + excluded.value;
+    END
+    """,
+    # События по заданиям и дням: назначено, отправлено на проверку, оплачено
+    """
+    CREATE TRIGGER IF NOT EXISTS counters_participant_event AFTER UPDATE OF status ON participants
+    WHEN OLD.status IS NOT NEW.status AND NEW.status IN ('task_assigned', 'pending_review', 'paid')
+    BEGIN
+        INSERT INTO counters (task_id, day, name, value)
+        SELECT task_id, day, CASE NEW.status
+                WHEN 'task_assigned' THEN 'assigned'
+                WHEN 'pending_review' THEN 'reviewed'
+                ELSE 'paid' END, 1
+        FROM (
+            SELECT COALESCE(NEW.current_task_id, 0) AS task_id, '' AS day
+            UNION ALL SELECT 0, date('now', 'localtime')
+            UNION ALL SELECT COALESCE(NEW.current_task_id, 0), date('now', 'localtime')
+        ) WHERE true
+        ON CONFLICT (task_id, day, name) DO UPDATE SET value = value + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS counters_task_insert AFTER INSERT ON tasks
+    WHEN NEW.is_active = 1
+    BEGIN
+        INSERT INTO counters (name, value) VALUES ('active_tasks', 1)
+        ON CONFLICT (task_id, day, name) DO UPDATE SET value = value + excluded.value;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS counters_task_active AFTER UPDATE OF is_active ON tasks
+    WHEN OLD.is_active IS NOT NEW.is_active
+    BEGIN
+        INSERT INTO counters (name, value) VALUES ('active_tasks', CASE WHEN NEW.is_active = 1 THEN 1 ELSE -1 END)
+        ON CONFLICT (task_id, day, name) DO UPDATE SET value = value + excluded.value;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS counters_task_delete AFTER DELETE ON tasks
+    WHEN OLD.is_active = 1
+    BEGIN
+        INSERT INTO counters (name, value) VALUES ('active_tasks', -1)
+        ON CONFLICT (task_id, day, name) DO UPDATE SET value = value + excluded.value;
+    END
+    """,
+)
+
+# Заполнение счётчиков по уже существующим данным (существующие счётчики не трогаем)
+COUNTERS_BACKFILL = (
+    "INSERT OR IGNORE INTO counters (name, value) SELECT 'participants', COUNT(*) FROM participants",
+    "INSERT OR IGNORE INTO counters (name, value) SELECT 'status:' || status, COUNT(*) FROM participants GROUP BY status",
+    "INSERT OR IGNORE INTO counters (name, value) SELECT 'active_tasks', COUNT(*) FROM tasks WHERE is_active = 1",
+    """
+    INSERT OR IGNORE INTO counters (task_id, name, value)
+    SELECT id, 'assigned', current_participants FROM tasks WHERE current_participants > 0
+    """,
+)
+
+# Индексы для горячих запросов
+HOT_PATH_INDEXES = (
+    """
+    CREATE INDEX IF NOT EXISTS idx_participants_status_date
+    ON participants (status, task_received_date)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_screenshots_user_task
+    ON screenshots (user_id, task_id)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_tasks_active
+    ON tasks (is_active, id)
+    """,
+    "ANALYZE",
+)
+
+# Хэши содержимого скриншотов и отметка о повторно использованной картинке
+SCREENSHOT_HASHES = (
+    "ALTER TABLE screenshots ADD COLUMN content_hash TEXT",
+    "ALTER TABLE screenshots ADD COLUMN phash TEXT",
+    "ALTER TABLE screenshots ADD COLUMN duplicate_of INTEGER",
+    "CREATE INDEX IF NOT EXISTS idx_screenshots_content_hash ON screenshots (content_hash)",
+    "CREATE INDEX IF NOT EXISTS idx_screenshots_phash ON screenshots (phash)",
+)
+
+# Результат автоматической проверки скриншота
+SCREENSHOT_VERDICTS = (
+    "ALTER TABLE screenshots ADD COLUMN verdict TEXT",
+    "ALTER TABLE screenshots ADD COLUMN verdict_reason TEXT",
+)
+
+# file_id отправленных админам сводных картинок скриншотов
+CONTACT_SHEETS = (
+    """
+    CREATE TABLE IF NOT EXISTS contact_sheets (
+        user_id INTEGER NOT NULL,
+        task_id INTEGER NOT NULL,
+        sheet_key TEXT NOT NULL,
+        file_id TEXT NOT NULL,
+        PRIMARY KEY (user_id, task_id)
+    )
+    """,
+)
+
+# Состояния FSM (aiogram), чтобы они переживали перезапуск бота
+FSM_STATES = (
+    """
+    CREATE TABLE IF NOT EXISTS fsm_states (
+        key TEXT PRIMARY KEY,
+        state TEXT,
+        data TEXT
+    ) WITHOUT ROWID
+    """,
+)
+
+# Рассылки: прогресс сохраняется, чтобы прерванная рассылка продолжилась после перезапуска.
+# last_user_id - ключ последнего обработанного получателя (получатели перебираются по user_id).
+BROADCASTS = (
+    """
+    CREATE TABLE IF NOT EXISTS broadcasts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        task_id INTEGER,
+        text TEXT NOT NULL,
+        admin_chat_id INTEGER,
+        status_message_id INTEGER,
+        status TEXT NOT NULL DEFAULT 'running',
+        total INTEGER NOT NULL DEFAULT 0,
+        last_user_id INTEGER NOT NULL DEFAULT 0,
+        sent INTEGER NOT NULL DEFAULT 0,
+        blocked INTEGER NOT NULL DEFAULT 0,
+        failed INTEGER NOT NULL DEFAULT 0,
+        created_date TEXT,
+        finished_date TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_broadcasts_status ON broadcasts (status)",
+    # Дата, когда участник заблокировал бота (таким рассылка не отправляется)
+    "ALTER TABLE participants ADD COLUMN blocked_date TEXT",
+)
+
+# История участия: одна запись на пару участник × задание. В participants остаётся
+# текущее участие, статус которого триггер переносит в историю.
+PARTICIPATIONS = (
+    """
+    CREATE TABLE IF NOT EXISTS participations (
+        user_id INTEGER NOT NULL,
+        task_id INTEGER NOT NULL,
+        status TEXT NOT NULL,
+        assigned_date TEXT,
+        updated_date TEXT,
+        finished_date TEXT,
+        requisites TEXT,
+        PRIMARY KEY (user_id, task_id)
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_participations_task_status ON participations (task_id, status)",
+    """
+    CREATE TRIGGER IF NOT EXISTS participations_status AFTER UPDATE OF status, requisites ON participants
+    WHEN NEW.current_task_id IS NOT NULL
+      AND (OLD.status IS NOT NEW.status OR OLD.requisites IS NOT NEW.requisites)
+    BEGIN
+        UPDATE participations
+        SET status = NEW.status,
+            requisites = NEW.requisites,
+            updated_date = strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime'),
+            finished_date = CASE WHEN NEW.status IN ('paid', 'rejected')
+                THEN strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime') END
+        WHERE user_id = NEW.user_id AND task_id = NEW.current_task_id;
+    END
+    """,
+    # Текущие участия, начатые до появления истории
+    """
+    INSERT OR IGNORE INTO participations (user_id, task_id, status, assigned_date, updated_date, requisites)
+    SELECT user_id, current_task_id, status, task_received_date, task_received_date, requisites
+    FROM participants WHERE current_task_id IS NOT NULL
+    """,
+)
+
+# Дневные квоты и расписание заданий. period - ключ окна квоты (дата начала окна),
+# starts_at/ends_at - время включения/выключения задания по расписанию.
+TASK_QUOTAS = (
+    "ALTER TABLE tasks ADD COLUMN daily_limit INTEGER NOT NULL DEFAULT 0",
+    "ALTER TABLE tasks ADD COLUMN starts_at TEXT",
+    "ALTER TABLE tasks ADD COLUMN ends_at TEXT",
+    """
+    CREATE TABLE IF NOT EXISTS task_quotas (
+        period TEXT NOT NULL,
+        task_id INTEGER NOT NULL,
+        used INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (period, task_id)
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_tasks_starts_at ON tasks (starts_at) WHERE starts_at IS NOT NULL",
+    "CREATE INDEX IF NOT EXISTS idx_tasks_ends_at ON tasks (ends_at) WHERE ends_at IS NOT NULL",
+)
+
+# Архив завершённых участий старше срока хранения: участие и его скриншоты
+# одной сжатой записью (zlib + JSON), файлы скриншотов - в архивах tar.gz.
+PARTICIPATIONS_ARCHIVE = (
+    """
+    CREATE TABLE IF NOT EXISTS participations_archive (
+        user_id INTEGER NOT NULL,
+        task_id INTEGER NOT NULL,
+        archived_date TEXT NOT NULL,
+        data BLOB NOT NULL,
+        PRIMARY KEY (user_id, task_id)
+    )
+    """,
+    # Участия, завершённые до появления истории, получают дату завершения
+    """
+    UPDATE participations SET finished_date = updated_date
+    WHERE finished_date IS NULL AND status IN ('paid', 'rejected')
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_participations_finished
+    ON participations (finished_date) WHERE finished_date IS NOT NULL
+    """,
+)
+
+# Сводная картинка делится на листы (у Telegram ограничен размер фото):
+# file_id всех листов хранятся списком JSON
+CONTACT_SHEET_PARTS = (
+    "ALTER TABLE contact_sheets RENAME COLUMN file_id TO file_ids",
+    "UPDATE contact_sheets SET file_ids = json_array(file_ids)",
+)
+
+# (версия, выражения) - строго по возрастанию версии, уже выпущенные миграции не меняются
+MIGRATIONS = (
+    (1, BASE_SCHEMA),
+    (2, COUNTERS_SCHEMA + COUNTERS_BACKFILL),
+    (3, HOT_PATH_INDEXES),
+    (4, SCREENSHOT_HASHES),
+    (5, SCREENSHOT_VERDICTS),
+    (6, CONTACT_SHEETS),
+    (7, FSM_STATES),
+    (8, BROADCASTS),
+    (9, PARTICIPATIONS),
+    (10, TASK_QUOTAS),
+    (11, PARTICIPATIONS_ARCHIVE),
+    (12, CONTACT_SHEET_PARTS),
+)
+
+# Горячие запросы, которые не должны сканировать таблицы целиком (см. Database.find_table_scans)
+HOT_QUERIES = (
+    ("SELECT * FROM participants WHERE user_id = ?", (0,)),
+    ("SELECT * FROM participants WHERE status = ? ORDER BY task_received_date DESC", ("pending_review",)),
+    (
+        "SELECT * FROM participants WHERE status = ? AND (task_received_date, user_id) < (?, ?) "
+        "ORDER BY task_received_date DESC, user_id DESC LIMIT ?",
+        ("pending_review", "", 0, 10),
+    ),
+    (
+        "SELECT * FROM participants WHERE status = ? AND (task_received_date, user_id) > (?, ?) "
+        "ORDER BY task_received_date ASC, user_id ASC LIMIT ?",
+        ("pending_review", "", 0, 10),
+    ),
+    ("SELECT * FROM screenshots WHERE user_id = ? AND task_id = ?", (0, 0)),
+    ("SELECT * FROM screenshots WHERE user_id = ? AND task_id = ? ORDER BY id", (0, 0)),
+    ("SELECT id FROM screenshots WHERE (content_hash = ? OR phash = ?) AND user_id != ?", ("", "", 0)),
+    ("SELECT * FROM tasks WHERE is_active = 1 ORDER BY id DESC", ()),
+    ("SELECT * FROM tasks WHERE id = ?", (0,)),
+    (
+        "SELECT user_id FROM participants WHERE user_id > ? AND blocked_date IS NULL ORDER BY user_id LIMIT ?",
+        (0, 100),
+    ),
+    ("SELECT * FROM broadcasts WHERE status = 'running' ORDER BY id", ()),
+    ("SELECT task_id FROM participations WHERE user_id = ?", (0,)),
+    ("SELECT * FROM participations WHERE user_id = ? ORDER BY task_id DESC", (0,)),
+    ("SELECT COUNT(*) FROM participations WHERE task_id = ? AND status = ?", (0, "paid")),
+    ("SELECT id, description, is_active FROM tasks WHERE is_active = 0 ORDER BY id DESC LIMIT ? OFFSET ?", (10, 0)),
+    ("SELECT COUNT(*) FROM tasks WHERE is_active = 0", ()),
+    ("SELECT task_id, used FROM task_quotas WHERE period = ?", ("",)),
+    ("SELECT id FROM tasks WHERE starts_at IS NOT NULL AND starts_at <= ?", ("",)),
+    ("SELECT id FROM tasks WHERE ends_at IS NOT NULL AND ends_at <= ? AND is_active = 1", ("",)),
+    (
+        "SELECT p.* FROM participations p JOIN tasks t ON t.id = p.task_id "
+        "WHERE p.finished_date IS NOT NULL AND p.finished_date < ? AND t.is_active = 0 LIMIT ?",
+        ("", 500),
+    ),
+    ("SELECT 1 FROM screenshots WHERE content_hash = ? LIMIT 1", ("",)),
+    ("SELECT day, name, value FROM counters WHERE task_id = 0 AND day IN ('', ?)", ("",)),
+    ("SELECT file_ids FROM contact_sheets WHERE user_id = ? AND task_id = ? AND sheet_key = ?", (0, 0, "")),
+)
@@ -0,0 +1,156 @@
+"""
+Уведомления администраторам
+
+События (скриншоты на проверку, реквизиты на оплату, распроданное задание)
+не отправляются по одному, а копятся и раз в interval секунд или при
+накоплении max_batch событий сводятся в одну сводку. У каждого админа
+одно сообщение-сводка за день, которое редактируется на месте. Срочные
+события дополнительно отправляются сразу отдельным сообщением.
+"""
+
+import asyncio
+import logging
+from collections import Counter, deque
+from datetime import datetime
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError, TelegramBadRequest
+
+logger = logging.getLogger(__name__)
+
+EVENT_REVIEW = "review"
+EVENT_PAYMENT = "payment"
+EVENT_SOLD_OUT = "sold_out"
+
+EVENT_TITLES = {
+    EVENT_REVIEW: "👥 На проверку",
+    EVENT_PAYMENT: "💰 На оплату",
+    EVENT_SOLD_OUT: "🚫 Распродано заданий",
+}
+
+class AdminNotifier:
+    def __init__(
+        self,
+        bot: Bot,
+        admin_ids: List[int],
+        interval: float = 60.0,
+        max_batch: int = 20,
+        recent: int = 10,
+    ):
+        self.bot = bot
+        self.admin_ids = admin_ids
+        self.interval = interval
+        self.max_batch = max_batch
+        # Ещё не отправленные события: (вид, текст, время)
+        self._events: List[Tuple[str, str, datetime]] = []
+        # Сводка за текущий день
+        self._day: Optional[str] = None
+        self._totals: Counter = Counter()
+        self._recent: Deque[str] = deque(maxlen=recent)
+        # admin_id -> message_id сообщения-сводки за текущий день
+        self._messages: Dict[int, int] = {}
+        self._lock = asyncio.Lock()
+        self._flusher: Optional[asyncio.Task] = None
+        self._batch_flush: Optional[asyncio.Task] = None
+        self._urgent: Set[asyncio.Task] = set()
+        self._closed = False
+
+    def notify(self, kind: str, text: str, urgent: bool = False):
+        """Добавить событие в сводку; срочное сразу отправляется отдельным сообщением"""
+        self._events.append((kind, text, datetime.now()))
+        if self._closed:
+            return
+        if urgent:
+            task = asyncio.create_task(self._send_all(f"❗️ {text}"))
+            self._urgent.add(task)
+            task.add_done_callback(self._urgent.discard)
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_loop())
+        # Много событий - обновляем сводку, не дожидаясь интервала
+        if len(self._events) >= self.max_batch and (self._batch_flush is None or self._batch_flush.done()):
+            self._batch_flush = asyncio.create_task(self._safe_flush())
+
+    async def flush(self):
+        """Обновить сводку у всех админов"""
+        async with self._lock:
+            if not self._events:
+                return
+            events, self._events = self._events, []
+            today = datetime.now().strftime("%d.%m.%Y")
+            if today != self._day:
+                # Новый день - новое сообщение-сводка
+                self._day = today
+                self._totals.clear()
+                self._recent.clear()
+                self._messages.clear()
+            for kind, text, at in events:
+                self._totals[kind] += 1
+                self._recent.append(f"{at.strftime('%H:%M')} {text}")
+
+            summary = self._summary_text()
+            for admin_id in self.admin_ids:
+                await self._update_summary(admin_id, summary)
+
+    async def stop(self):
+        """Остановить фоновую отправку и отправить оставшиеся события"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        if self._batch_flush is not None:
+            await asyncio.gather(self._batch_flush, return_exceptions=True)
+        if self._urgent:
+            await asyncio.gather(*self._urgent, return_exceptions=True)
+        await self._safe_flush()
+
+    def _summary_text(self) -> str:
+        lines = [f"📬 Сводка за {self._day} (обновлено {datetime.now().strftime('%H:%M')})", ""]
+        for kind, title in EVENT_TITLES.items():
+            if self._totals[kind]:
+                lines.append(f"{title}: +{self._totals[kind]}")
+        lines += ["", "Последние события:"]
+        lines += [f"• {event}" for event in reversed(self._recent)]
+        return "\n".join(lines)
+
+    async def _update_summary(self, admin_id: int, text: str):
+        """Отредактировать сводку админа или отправить новую"""
+        message_id = self._messages.get(admin_id)
+        if message_id is not None:
+            try:
+                await self.bot.edit_message_text(text, chat_id=admin_id, message_id=message_id)
+                return
+            except TelegramBadRequest as e:
+                if "message is not modified" in e.message:
+                    return
+                # Сообщение удалено или слишком старое - отправим новое
+            except TelegramAPIError as e:
+                logger.warning("Не удалось обновить сводку админа %s: %s", admin_id, e)
+                return
+        try:
+            message = await self.bot.send_message(admin_id, text)
+        except TelegramAPIError as e:
+            logger.warning("Не удалось отправить сводку админу %s: %s", admin_id, e)
+            return
+        self._messages[admin_id] = message.message_id
+
+    async def _send_all(self, text: str):
+        for admin_id in self.admin_ids:
+            try:
+                await self.bot.send_message(admin_id, text)
+            except TelegramAPIError as e:
+                logger.warning("Не удалось отправить уведомление админу %s: %s", admin_id, e)
+
+    async def _safe_flush(self):
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("Не удалось отправить сводку админам")
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self._safe_flush()
@@ -0,0 +1,95 @@
+"""
+Планировщик дневных квот и расписания заданий
+
+Квоты считаются по окнам: окно начинается каждый день в rollover_hour по
+часовому поясу UTC+utc_offset_hours, ключ окна - дата его начала. Смена
+окна выполняется здесь, раз в tick секунд, а не при каждой выдаче
+задания: выдача сравнивает только счётчики в памяти. Заодно планировщик
+включает и выключает задания по расписанию (время в том же часовом поясе).
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Optional
+
+from database import Database
+
+logger = logging.getLogger(__name__)
+
+# Формат времени расписания; строки этого формата сравниваются как даты
+TIME_FORMAT = "%Y-%m-%dT%H:%M"
+
+class QuotaScheduler:
+    def __init__(
+        self,
+        db: Database,
+        utc_offset_hours: float = 3.0,
+        rollover_hour: int = 0,
+        on_activate: Optional[Callable[[int], Awaitable[None]]] = None,
+        tick: float = 60.0,
+    ):
+        self.db = db
+        self.tz = timezone(timedelta(hours=utc_offset_hours))
+        self.rollover_hour = rollover_hour
+        self.on_activate = on_activate
+        self.tick = tick
+        self._task: Optional[asyncio.Task] = None
+
+    def now(self) -> datetime:
+        """Текущее время в часовом поясе квот"""
+        return datetime.now(self.tz)
+
+    def now_text(self) -> str:
+        return self.now().strftime(TIME_FORMAT)
+
+    def period(self, now: Optional[datetime] = None) -> str:
+        """Ключ окна квоты для момента now"""
+        now = now or self.now()
+        return (now - timedelta(hours=self.rollover_hour)).date().isoformat()
+
+    def parse_time(self, text: str) -> str:
+        """Проверить время расписания (ГГГГ-ММ-ДДTЧЧ:ММ или «ГГГГ-ММ-ДД ЧЧ:ММ») и привести к формату БД"""
+        return datetime.strptime(text.replace(" ", "T"), TIME_FORMAT).strftime(TIME_FORMAT)
+
+    async def start(self):
+        """Выставить текущее окно и запустить фоновую проверку (до начала приёма обновлений)"""
+        await self._run_once()
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run_once(self):
+        now = self.now()
+        period = self.period(now)
+        if period != self.db.quota_period:
+            await self.db.rollover_quota_period(period)
+            logger.info("Новое окно дневных квот: %s", period)
+
+        activated, deactivated = await self.db.apply_task_timetable(now.strftime(TIME_FORMAT))
+        if deactivated:
+            logger.info("По расписанию выключены задания: %s", deactivated)
+        for task_id in activated:
+            logger.info("По расписанию включено задание #%s", task_id)
+            if self.on_activate is not None:
+                try:
+                    await self.on_activate(task_id)
+                except Exception:
+                    logger.exception("Ошибка при включении задания #%s", task_id)
+
+    def _delay(self) -> float:
+        """Секунд до следующей проверки: не больше tick и не позже начала следующей минуты"""
+        now = self.now()
+        return min(self.tick, 60 - now.second - now.microsecond / 1_000_000) + 0.01
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self._delay())
+            try:
+                await self._run_once()
+            except Exception:
+                logger.exception("Ошибка планировщика квот")
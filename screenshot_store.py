@@ -0,0 +1,60 @@
+"""
+Хранилище скриншотов с адресацией по содержимому
+
+Каждый файл хранится один раз под своим SHA-256 в подпапках по первым
+символам хэша (ab/cd/abcd....jpg), поэтому каталоги остаются небольшими,
+а одинаковые картинки от разных аккаунтов не дублируются на диске.
+Перцептивный хэш для поиска почти одинаковых картинок считается при
+проверке скриншота (validation.py).
+"""
+
+import asyncio
+import hashlib
+import os
+from typing import Tuple
+
+# Размер блока при чтении файла для хэширования
+CHUNK_SIZE = 1024 * 1024
+
+def file_sha256(path: str) -> str:
+    """SHA-256 файла, читаем блоками без загрузки целиком в память"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class ScreenshotStore:
+    def __init__(self, root: str):
+        self.root = root
+        # Сюда загрузчик складывает файлы до переноса в хранилище
+        self.incoming_dir = os.path.join(root, "incoming")
+        os.makedirs(self.incoming_dir, exist_ok=True)
+
+    def incoming_path(self, screenshot_id: int) -> str:
+        """Путь для загрузки файла до определения его хэша.
+        
+        Свой у каждой записи скриншота: одну и ту же картинку (тот же file_unique_id)
+        могут прислать несколько участников, и каждая запись должна получить хэш и проверку.
+        """
+        return os.path.join(self.incoming_dir, f"{screenshot_id}.jpg")
+
+    def path_for(self, content_hash: str) -> str:
+        """Путь файла в хранилище по его хэшу"""
+        return os.path.join(self.root, content_hash[:2], content_hash[2:4], f"{content_hash}.jpg")
+
+    def _store(self, tmp_path: str) -> Tuple[str, str]:
+        content_hash = file_sha256(tmp_path)
+        path = self.path_for(content_hash)
+        if os.path.exists(path):
+            # Такая картинка уже есть - второй копии не храним
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+        return content_hash, path
+
+    async def store(self, tmp_path: str) -> Tuple[str, str]:
+        """Перенести загруженный файл в хранилище, вернуть (sha256, путь)"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._store, tmp_path)
@@ -0,0 +1,42 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+from database import Database
+
+@pytest.fixture
+async def db(tmp_path):
+    """Чистая БД со всеми миграциями во временной папке"""
+    database = Database(str(tmp_path / "bot.db"))
+    await database.init_db()
+    try:
+        yield database
+    finally:
+        await database.close()
+
+@pytest.fixture
+async def participants(db):
+    """Фабрика зарегистрированных участников"""
+    async def create(count: int, start: int = 1):
+        user_ids = list(range(start, start + count))
+        for user_id in user_ids:
+            await db.add_participant(user_id, f"user{user_id}", f"User {user_id}")
+        return user_ids
+    return create
+
+@pytest.fixture
+def bot_module(db, tmp_path, monkeypatch):
+    """Модуль bot с тестовой БД; при первом импорте папки бота создаются во временной папке"""
+    if "bot" not in sys.modules:
+        monkeypatch.setenv("BOT_TOKEN", os.getenv("BOT_TOKEN") or "1:a")
+        cwd = os.getcwd()
+        os.chdir(tmp_path)
+        try:
+            importlib.import_module("bot")
+        finally:
+            os.chdir(cwd)
+    module = sys.modules["bot"]
+    monkeypatch.setattr(module, "db", db)
+    return module
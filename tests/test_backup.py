@@ -0,0 +1,172 @@
+import asyncio
+import glob
+import os
+import sqlite3
+import tarfile
+import time
+
+import pytest
+
+from backup import BackupManager, copy_database, restore_database
+from database import Database
+from screenshot_store import ScreenshotStore
+
+@pytest.fixture
+def store(tmp_path):
+    return ScreenshotStore(str(tmp_path / "screenshots"))
+
+@pytest.fixture
+def manager(db, store, tmp_path):
+    return BackupManager(
+        db, store,
+        backup_dir=str(tmp_path / "backups"),
+        archive_dir=str(tmp_path / "archive"),
+        keep=2,
+        archive_after_days=30,
+    )
+
+class Writer:
+    """Фоновая запись в БД, пока снимается копия: новые участники подряд"""
+
+    def __init__(self, db: Database, start: int = 100_000):
+        self.db = db
+        self.next_id = start
+        self.latencies = []
+        self._stop = asyncio.Event()
+        self._task = None
+
+    async def __aenter__(self):
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def __aexit__(self, *exc):
+        self._stop.set()
+        await self._task
+
+    async def _run(self):
+        while not self._stop.is_set():
+            started = time.monotonic()
+            await self.db.add_participant(self.next_id, "w", "Writer")
+            self.latencies.append(time.monotonic() - started)
+            self.next_id += 1
+            await asyncio.sleep(0)
+
+    @property
+    def written(self) -> int:
+        return len(self.latencies)
+
+def count_participants(path: str) -> int:
+    connection = sqlite3.connect(path)
+    try:
+        return connection.execute("SELECT COUNT(*) FROM participants").fetchone()[0]
+    finally:
+        connection.close()
+
+async def test_copy_is_consistent_under_concurrent_writes(db, participants, tmp_path):
+    await participants(500)
+    target = str(tmp_path / "copy.db")
+
+    async with Writer(db) as writer:
+        # Мелкие шаги: запись успевает вклиниться между ними и перезапустить копирование
+        await asyncio.to_thread(copy_database, db.db_path, target, 2, 0.002)
+        written_during_copy = writer.written
+
+    assert written_during_copy > 0
+    # Запись не ждала окончания копирования
+    assert max(writer.latencies) < 1.0
+    copied = count_participants(target)
+    assert 500 <= copied <= 500 + writer.written
+    # Копия - снимок на один момент: участники записаны подряд, без пропусков
+    connection = sqlite3.connect(target)
+    try:
+        ids = [row[0] for row in connection.execute(
+            "SELECT user_id FROM participants WHERE user_id >= 100000 ORDER BY user_id"
+        )]
+    finally:
+        connection.close()
+    assert ids == list(range(100_000, 100_000 + len(ids)))
+
+async def test_backup_and_restore(db, participants, manager, tmp_path):
+    await participants(200)
+    async with Writer(db):
+        path = await manager.backup()
+
+    assert path.endswith(".db.gz") and os.path.exists(path)
+    assert not glob.glob(os.path.join(manager.backup_dir, "*.part"))
+
+    restored_path = str(tmp_path / "restored.db")
+    restore_database(path, restored_path)
+    restored = Database(restored_path)
+    await restored.init_db()
+    try:
+        assert (await restored.get_participant(200))["full_name"] == "User 200"
+    finally:
+        await restored.close()
+
+async def test_restore_replaces_existing_database(db, participants, manager, tmp_path):
+    await participants(10)
+    path = await manager.backup()
+    target = str(tmp_path / "target.db")
+    other = Database(target)
+    await other.init_db()
+    await other.add_participant(1, "other", "Другая БД")
+    await other.close()
+
+    restore_database(path, target)
+
+    assert count_participants(target) == 10
+    assert not os.path.exists(f"{target}.restore")
+
+async def test_old_backups_are_rotated(db, manager):
+    os.makedirs(manager.backup_dir)
+    for name in ("bot-20000101-000000.db.gz", "bot-20000102-000000.db.gz"):
+        open(os.path.join(manager.backup_dir, name), "wb").close()
+
+    path = await manager.backup()
+
+    backups = sorted(os.listdir(manager.backup_dir))
+    assert backups == ["bot-20000102-000000.db.gz", os.path.basename(path)]
+
+async def add_screenshot(db, store, user_id, task_id, content: bytes) -> str:
+    _, (screenshot_id,) = await db.add_screenshots(user_id, task_id, [(f"file-{user_id}-{len(content)}", None)])
+    incoming = store.incoming_path(screenshot_id)
+    with open(incoming, "wb") as f:
+        f.write(content)
+    content_hash, path = await store.store(incoming)
+    await db.set_screenshot_content(screenshot_id, content_hash, path)
+    return content_hash
+
+async def test_archive_moves_old_participations(db, participants, store, manager):
+    task_id = await db.add_task("Старое задание", max_participants=0)
+    finished, in_review = await participants(2)
+    for user_id in (finished, in_review):
+        assert await db.claim_task_slot(user_id, task_id)
+    shared = await add_screenshot(db, store, finished, task_id, b"shared picture")
+    await add_screenshot(db, store, in_review, task_id, b"shared picture")
+    own = await add_screenshot(db, store, finished, task_id, b"own picture")
+    for user_id in (finished, in_review):
+        assert await db.move_to_review(user_id)
+    assert await db.apply_transition("reject", [finished])
+    await db.delete_task(task_id)
+    async with db._transaction() as connection:
+        await connection.execute("""
+            UPDATE participations SET finished_date = '2000-01-01T00:00:00' WHERE finished_date IS NOT NULL
+        """)
+
+    assert await manager.archive() == 1
+
+    archived = await db.get_archived_participation(finished, task_id)
+    assert archived["participation"]["user_id"] == finished
+    assert {s["content_hash"] for s in archived["screenshots"]} == {shared, own}
+    remaining = await db._fetchall("SELECT user_id FROM participations WHERE task_id = ?", (task_id,))
+    assert [row["user_id"] for row in remaining] == [in_review]
+    assert await db.get_screenshots(finished, task_id) == []
+
+    # Файл, нужный другому участию, остаётся; собственный - переезжает в архив
+    assert os.path.exists(store.path_for(shared))
+    assert not os.path.exists(store.path_for(own))
+    with tarfile.open(os.path.join(manager.archive_dir, archived["files"])) as archive:
+        assert archive.getnames() == [os.path.basename(store.path_for(own))]
+
+    # Повторный запуск ничего не переносит
+    assert await manager.archive() == 0
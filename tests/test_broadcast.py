@@ -0,0 +1,156 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+from aiogram.methods import EditMessageText, SendMessage
+from aiogram.types import Chat, Message
+
+from broadcast import SEND_BLOCKED, SEND_SENT, Broadcaster
+
+ADMIN_ID = 999
+
+class FakeSession(BaseSession):
+    """Сессия aiogram без сети: записывает вызовы API и имитирует ответы Telegram"""
+
+    def __init__(self, delay: float = 0.0):
+        super().__init__()
+        self.delay = delay
+        self.blocked = set()
+        # user_id -> сколько раз ответить RetryAfter и на сколько секунд
+        self.retry_after = {}
+        self.sent = []
+        self.edits = 0
+
+    async def make_request(self, bot, method, timeout=None):
+        loop = asyncio.get_running_loop()
+        if isinstance(method, EditMessageText):
+            self.edits += 1
+            return True
+        assert isinstance(method, SendMessage)
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if method.chat_id in self.blocked:
+            raise TelegramForbiddenError(method, "Forbidden: bot was blocked by the user")
+        times, seconds = self.retry_after.get(method.chat_id, (0, 0))
+        if times:
+            self.retry_after[method.chat_id] = (times - 1, seconds)
+            raise TelegramRetryAfter(method, "Flood control exceeded", seconds)
+        self.sent.append((loop.time(), method.chat_id))
+        return Message(
+            message_id=len(self.sent),
+            date=datetime.now(),
+            chat=Chat(id=method.chat_id, type="private"),
+            text=method.text,
+        )
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        raise NotImplementedError
+        yield b""
+
+    async def close(self):
+        pass
+
+    def recipients(self):
+        return [chat_id for _, chat_id in self.sent if chat_id != ADMIN_ID]
+
+@pytest.fixture
+def session():
+    return FakeSession()
+
+@pytest.fixture
+async def bot(session):
+    bot = Bot("1:a", session=session)
+    yield bot
+    await bot.session.close()
+
+async def wait_finished(broadcaster: Broadcaster):
+    while broadcaster.active():
+        await asyncio.sleep(0.01)
+
+async def get_broadcast(db, broadcast_id: int):
+    return await db._fetchone("SELECT * FROM broadcasts WHERE id = ?", (broadcast_id,))
+
+async def test_broadcast_reaches_everyone_and_marks_blocked(db, participants, bot, session):
+    user_ids = await participants(120)
+    session.blocked = {7, 50}
+    broadcaster = Broadcaster(bot, db, rate=1000, page_size=25)
+    broadcast = await broadcaster.start("Новое задание", admin_chat_id=ADMIN_ID)
+    await wait_finished(broadcaster)
+
+    assert sorted(session.recipients()) == sorted(set(user_ids) - {7, 50})
+    row = await get_broadcast(db, broadcast["id"])
+    assert (row["status"], row["sent"], row["blocked"], row["failed"]) == ("finished", 118, 2, 0)
+    assert (await db.get_participant(7))["blocked_date"] is not None
+    assert (await db.get_participant(8))["blocked_date"] is None
+    # Заблокировавшие бота не попадают в следующую рассылку
+    assert 7 not in await db.get_broadcast_recipients(0, 1000)
+    # Статистика у админа: первое сообщение и финальная правка
+    assert session.edits >= 1
+
+async def test_rate_limit(db, participants, bot, session):
+    await participants(30)
+    rate = 50
+    broadcaster = Broadcaster(bot, db, rate=rate)
+    await broadcaster.start("Текст")
+    await wait_finished(broadcaster)
+
+    times = [sent_at for sent_at, _ in session.sent]
+    assert len(times) == 30
+    # Без всплесков: 30 сообщений не быстрее чем за (30 - 1) / rate секунд
+    assert times[-1] - times[0] >= (len(times) - 1) / rate * 0.95
+    # В любом окне длиной 0.2 с не больше rate * 0.2 + 1 сообщений
+    for i, start in enumerate(times):
+        assert sum(1 for t in times[i:] if t < start + 0.2) <= rate * 0.2 + 1
+
+async def test_retry_after_pauses_everyone(db, participants, bot, session):
+    await participants(20)
+    session.retry_after = {5: (1, 1)}
+    broadcaster = Broadcaster(bot, db, rate=1000)
+    broadcast = await broadcaster.start("Текст")
+    await wait_finished(broadcaster)
+
+    assert sorted(session.recipients()) == list(range(1, 21))
+    row = await get_broadcast(db, broadcast["id"])
+    assert (row["sent"], row["failed"]) == (20, 0)
+    # После RetryAfter в течение паузы не уходит ни одно сообщение
+    times = [sent_at for sent_at, _ in session.sent]
+    gaps = [b - a for a, b in zip(times, times[1:])]
+    assert max(gaps) >= 0.95
+
+async def test_interrupted_broadcast_resumes(db, participants, bot, session):
+    user_ids = await participants(60)
+    session.delay = 0.01
+    broadcaster = Broadcaster(bot, db, rate=1000, page_size=10)
+    broadcast = await broadcaster.start("Текст")
+    while (await get_broadcast(db, broadcast["id"]))["last_user_id"] < 20:
+        await asyncio.sleep(0.01)
+    await broadcaster.stop()
+
+    row = await get_broadcast(db, broadcast["id"])
+    assert row["status"] == "running"
+    delivered_before = set(session.recipients())
+    assert set(range(1, row["last_user_id"] + 1)) <= delivered_before
+
+    # «Перезапуск» бота: новый рассыльщик продолжает с сохранённого места
+    session.sent.clear()
+    restarted = Broadcaster(bot, db, rate=1000, page_size=10)
+    await restarted.resume()
+    await wait_finished(restarted)
+
+    resumed = session.recipients()
+    assert min(resumed) > row["last_user_id"]
+    assert delivered_before | set(resumed) == set(user_ids)
+    assert len(resumed) == len(set(resumed))
+    assert (await get_broadcast(db, broadcast["id"]))["status"] == "finished"
+
+async def test_send_many_marks_blocked(db, participants, bot, session):
+    await participants(10)
+    session.blocked = {3}
+    broadcaster = Broadcaster(bot, db, rate=1000)
+    results = await broadcaster.send_many((user_id, f"Привет, {user_id}") for user_id in range(1, 11))
+
+    assert results == {SEND_SENT: 9, SEND_BLOCKED: 1}
+    assert (await db.get_participant(3))["blocked_date"] is not None
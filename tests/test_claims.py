@@ -0,0 +1,80 @@
+import asyncio
+
+async def test_no_overselling_under_flash_crowd(db, participants):
+    task_id = await db.add_task("Раздача", max_participants=50)
+    user_ids = await participants(1000)
+
+    results = await asyncio.gather(*(db.claim_task_slot(user_id, task_id) for user_id in user_ids))
+
+    assert sum(results) == 50
+    task = await db.get_task(task_id)
+    assert task["current_participants"] == 50
+    rows = await db._fetchall("SELECT user_id FROM participations WHERE task_id = ?", (task_id,))
+    winners = {user_id for user_id, claimed in zip(user_ids, results) if claimed}
+    assert {row["user_id"] for row in rows} == winners
+    assigned = await db._fetchvalue(
+        "SELECT COUNT(*) FROM participants WHERE current_task_id = ?", (task_id,)
+    )
+    assert assigned == 50
+
+async def test_claim_next_task_spreads_over_tasks(db, participants):
+    first = await db.add_task("Первое", max_participants=30)
+    second = await db.add_task("Второе", max_participants=20)
+    user_ids = await participants(100)
+
+    tasks = await asyncio.gather(*(db.claim_next_task(user_id) for user_id in user_ids))
+
+    claimed = [task["id"] for task in tasks if task is not None]
+    assert claimed.count(first) == 30
+    assert claimed.count(second) == 20
+    assert tasks.count(None) == 50
+
+async def test_sold_out_rejections_do_not_touch_db(db, participants, monkeypatch):
+    task_id = await db.add_task("Раздача", max_participants=1)
+    first, *others = await participants(20)
+    assert await db.claim_task_slot(first, task_id)
+
+    calls = []
+    for name in ("_fetchone", "_fetchall", "_fetchvalue", "_transaction"):
+        original = getattr(db, name)
+        def counted(*args, _original=original, _name=name, **kwargs):
+            calls.append(_name)
+            return _original(*args, **kwargs)
+        monkeypatch.setattr(db, name, counted)
+
+    results = await asyncio.gather(*(db.claim_task_slot(user_id, task_id) for user_id in others))
+
+    assert not any(results)
+    assert calls == []
+
+async def test_claim_next_task_without_available_tasks_does_not_touch_db(db, participants, monkeypatch):
+    task_id = await db.add_task("Раздача", max_participants=1)
+    first, second = await participants(2)
+    assert await db.claim_next_task(first) is not None
+    # Участник уже участвовал: без раннего выхода история читалась бы из БД
+    db._participants.clear()
+
+    calls = []
+    for name in ("_fetchone", "_fetchall", "_fetchvalue", "_transaction", "get_participation_task_ids"):
+        original = getattr(db, name)
+        def counted(*args, _original=original, _name=name, **kwargs):
+            calls.append(_name)
+            return _original(*args, **kwargs)
+        monkeypatch.setattr(db, name, counted)
+
+    assert await db.claim_next_task(first) is None
+    assert await db.claim_next_task(second) is None
+    assert calls == []
+    assert (await db.get_task(task_id))["current_participants"] == 1
+
+async def test_participant_takes_each_task_once(db, participants):
+    task_id = await db.add_task("Раздача", max_participants=0)
+    (user_id,) = await participants(1)
+
+    assert await db.claim_task_slot(user_id, task_id)
+    assert await db.move_to_review(user_id)
+    assert await db.apply_transition("reject", [user_id])
+
+    # Участие завершено, но в то же задание второй раз не попасть
+    assert not await db.claim_task_slot(user_id, task_id)
+    assert await db.claim_next_task(user_id) is None
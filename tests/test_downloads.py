@@ -0,0 +1,94 @@
+from types import SimpleNamespace
+
+import pytest
+
+from downloads import DownloadJob, ScreenshotDownloader
+
+class FakeBot:
+    """Вместо aiogram.Bot: «скачивает» файл, записывая его file_id, и может несколько раз упасть"""
+
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.downloads = []
+
+    async def get_file(self, file_id):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("сеть недоступна")
+        return SimpleNamespace(file_path=f"photos/{file_id}.jpg")
+
+    async def download_file(self, file_path, destination):
+        self.downloads.append(file_path)
+        with open(destination, "w") as f:
+            f.write(file_path)
+
+@pytest.fixture
+def completed():
+    return []
+
+async def run_jobs(bot, jobs, completed, **kwargs):
+    async def on_complete(job):
+        completed.append(job.screenshot_id)
+
+    downloader = ScreenshotDownloader(bot, workers=2, backoff=0, on_complete=on_complete, **kwargs)
+    await downloader.start()
+    accepted = [await downloader.enqueue(job) for job in jobs]
+    await downloader.stop()
+    return downloader, accepted
+
+async def test_same_file_from_two_participants_is_downloaded_once(tmp_path, completed):
+    # Одна и та же картинка (общий file_unique_id) от двух участников - две записи скриншотов
+    jobs = [
+        DownloadJob("file-a", "unique", str(tmp_path / "1.jpg"), screenshot_id=1, user_id=10),
+        DownloadJob("file-b", "unique", str(tmp_path / "2.jpg"), screenshot_id=2, user_id=20),
+    ]
+    bot = FakeBot()
+
+    downloader, accepted = await run_jobs(bot, jobs, completed)
+
+    assert accepted == [True, False]
+    assert bot.downloads == ["photos/file-a.jpg"]
+    # Файл получила каждая запись
+    assert sorted(completed) == [1, 2]
+    assert (tmp_path / "1.jpg").read_text() == (tmp_path / "2.jpg").read_text() == "photos/file-a.jpg"
+    assert downloader.stats()["downloaded"] == 1
+    assert downloader.stats()["pending"] == 0
+
+async def test_failed_shared_download_fails_every_row(tmp_path, completed):
+    jobs = [
+        DownloadJob("file-a", "unique", str(tmp_path / "1.jpg"), screenshot_id=1),
+        DownloadJob("file-b", "unique", str(tmp_path / "2.jpg"), screenshot_id=2),
+    ]
+
+    downloader, _ = await run_jobs(FakeBot(failures=10), jobs, completed, retries=1)
+
+    assert completed == []
+    assert downloader.stats()["failed"] == 2
+    assert downloader.stats()["pending"] == 0
+
+async def test_same_screenshot_is_enqueued_once(tmp_path, completed):
+    job = DownloadJob("file-a", "unique", str(tmp_path / "1.jpg"), screenshot_id=1)
+
+    downloader, accepted = await run_jobs(FakeBot(), [job, job], completed)
+
+    assert accepted == [True, False]
+    assert completed == [1]
+    assert downloader.stats()["pending"] == 0
+
+async def test_download_is_retried(tmp_path, completed):
+    bot = FakeBot(failures=2)
+    job = DownloadJob("file-a", "unique", str(tmp_path / "1.jpg"), screenshot_id=1)
+
+    downloader, _ = await run_jobs(bot, [job], completed, retries=3)
+
+    assert completed == [1]
+    assert downloader.stats()["failed"] == 0
+
+async def test_failed_download_leaves_no_partial_file(tmp_path, completed):
+    job = DownloadJob("file-a", "unique", str(tmp_path / "1.jpg"), screenshot_id=1)
+
+    downloader, _ = await run_jobs(FakeBot(failures=10), [job], completed, retries=1)
+
+    assert completed == []
+    assert downloader.stats()["failed"] == 1
+    assert list(tmp_path.iterdir()) == []
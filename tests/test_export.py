@@ -0,0 +1,52 @@
+import csv
+
+from export import build_export_query, export_to_file, parse_export_args
+
+def read_csv(path):
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        return list(csv.DictReader(f, delimiter=";"))
+
+async def pay(db, user_id, task_id):
+    assert await db.claim_task_slot(user_id, task_id)
+    assert await db.move_to_review(user_id)
+    assert await db.add_requisites(user_id, f"card-{user_id}-{task_id}")
+    assert await db.apply_transition("pay", [user_id])
+
+async def test_payouts_survive_next_task(db, participants, tmp_path):
+    first = await db.add_task("Первое", max_participants=0)
+    second = await db.add_task("Второе", max_participants=0)
+    (user_id,) = await participants(1)
+    await pay(db, user_id, first)
+    # Участник взял следующее задание: в participants уже новое задание и статус
+    assert await db.claim_task_slot(user_id, second)
+
+    path, total = await export_to_file(db, "payouts", {}, "csv", False, str(tmp_path))
+
+    assert total == 1
+    (row,) = read_csv(path)
+    assert (row["task_id"], row["status"], row["requisites"]) == (str(first), "paid", f"card-{user_id}-{first}")
+
+async def test_payouts_filters(db, participants, tmp_path):
+    first = await db.add_task("Первое", max_participants=0)
+    second = await db.add_task("Второе", max_participants=0)
+    paid, pending = await participants(2)
+    await pay(db, paid, first)
+    await pay(db, paid, second)
+    assert await db.claim_task_slot(pending, first)
+    assert await db.move_to_review(pending)
+    assert await db.add_requisites(pending, "card")
+
+    async def export(text):
+        _, filters, _, _ = parse_export_args(f"/export payouts {text}")
+        path, _ = await export_to_file(db, "payouts", filters, "csv", False, str(tmp_path))
+        return sorted((int(row["user_id"]), int(row["task_id"]), row["status"]) for row in read_csv(path))
+
+    assert await export("") == [(paid, first, "paid"), (paid, second, "paid"), (pending, first, "pending_payment")]
+    assert await export(f"task={first}") == [(paid, first, "paid"), (pending, first, "pending_payment")]
+    assert await export("status=pending_payment") == [(pending, first, "pending_payment")]
+    assert await export("from=2000-01-01 to=2000-12-31") == []
+
+def test_payout_filters_are_qualified():
+    query, params = build_export_query("payouts", {"status": "paid", "task": 3})
+    assert "p.status = ?" in query and "p.task_id = ?" in query
+    assert params == ["paid", 3]
@@ -0,0 +1,50 @@
+from aiogram.fsm.storage.base import StorageKey
+
+from database import Database
+from fsm_storage import SQLiteStorage
+
+KEY = StorageKey(bot_id=1, chat_id=10, user_id=10)
+
+async def reopen(db: Database) -> SQLiteStorage:
+    """Хранилище поверх заново открытой БД - как после перезапуска бота"""
+    await db.close()
+    await db.init_db()
+    return SQLiteStorage(db)
+
+async def test_state_survives_restart(db):
+    storage = SQLiteStorage(db, flush_interval=60)
+    await storage.set_state(KEY, "ParticipantStates:waiting_for_screenshots")
+    await storage.set_data(KEY, {"task_id": 7})
+    await storage.close()
+
+    storage = await reopen(db)
+    assert await storage.get_state(KEY) == "ParticipantStates:waiting_for_screenshots"
+    assert await storage.get_data(KEY) == {"task_id": 7}
+
+async def test_batch_is_flushed_before_interval(db):
+    storage = SQLiteStorage(db, flush_interval=60, flush_batch=5)
+    for user_id in range(5):
+        await storage.set_state(StorageKey(bot_id=1, chat_id=user_id, user_id=user_id), "S:a")
+    await storage._batch_flush
+    assert await db._fetchvalue("SELECT COUNT(*) FROM fsm_states") == 5
+    await storage.close()
+
+async def test_changes_after_close_are_persisted(db):
+    storage = SQLiteStorage(db, flush_interval=60)
+    await storage.set_state(KEY, "S:first")
+    await storage.close()
+    # Обработчик, ещё выполнявшийся при остановке, меняет состояние уже после close
+    await storage.set_state(KEY, "S:second")
+    await storage.set_data(KEY, {"step": 2})
+
+    storage = await reopen(db)
+    assert await storage.get_state(KEY) == "S:second"
+    assert await storage.get_data(KEY) == {"step": 2}
+
+async def test_second_close_flushes(db):
+    storage = SQLiteStorage(db, flush_interval=60)
+    await storage.close()
+    storage._dirty.add(storage._key(KEY))
+    storage._cache[storage._key(KEY)] = {"state": "S:late", "data": {}}
+    await storage.close()
+    assert await db._fetchvalue("SELECT state FROM fsm_states") == "S:late"
@@ -0,0 +1,126 @@
+from types import SimpleNamespace
+
+import pytest
+
+from screenshot_store import ScreenshotStore
+
+class StubMessage:
+    """Сообщение Telegram с фото: записывает ответы бота"""
+
+    def __init__(self, user_id: int, file_id: str, media_group_id=None):
+        self.from_user = SimpleNamespace(id=user_id)
+        self.photo = [SimpleNamespace(file_id=f"{file_id}-small", file_unique_id=f"{file_id}-u-small"),
+                      SimpleNamespace(file_id=file_id, file_unique_id=f"{file_id}-u")]
+        self.media_group_id = media_group_id
+        self.answers = []
+
+    async def answer(self, text, reply_markup=None, **kwargs):
+        self.answers.append((text, reply_markup))
+
+class StubCallback:
+    """Нажатие inline-кнопки: записывает отредактированный текст и всплывающие ответы"""
+
+    def __init__(self, data: str):
+        self.data = data
+        self.edits = []
+        self.alerts = []
+        self.message = SimpleNamespace(edit_text=self.edit_text)
+
+    async def edit_text(self, text, reply_markup=None, **kwargs):
+        self.edits.append((text, reply_markup))
+
+    async def answer(self, text=None, **kwargs):
+        self.alerts.append(text)
+
+class StubDownloader:
+    def __init__(self):
+        self.jobs = []
+
+    async def enqueue(self, job):
+        self.jobs.append(job)
+        return True
+
+@pytest.fixture
+def handlers(bot_module, tmp_path, monkeypatch):
+    monkeypatch.setattr(bot_module, "downloader", StubDownloader())
+    monkeypatch.setattr(bot_module, "screenshot_store", ScreenshotStore(str(tmp_path / "store")))
+    return bot_module
+
+@pytest.fixture
+def task_list(bot_module, monkeypatch):
+    """Модуль bot с пустым кэшем списка заданий: у каждого теста своя БД"""
+    monkeypatch.setattr(bot_module, "task_list_cache", {})
+    monkeypatch.setattr(bot_module, "task_list_cache_version", -1)
+    return bot_module
+
+@pytest.fixture
+async def assigned(db, participants):
+    """Участник, получивший задание"""
+    task_id = await db.add_task("Раздача", max_participants=0)
+    (user_id,) = await participants(1)
+    assert await db.claim_task_slot(user_id, task_id)
+    return user_id, task_id
+
+def buttons(markup):
+    return [button.callback_data for row in markup.inline_keyboard for button in row]
+
+async def test_single_screenshot_is_saved_and_acknowledged(handlers, db, assigned):
+    user_id, task_id = assigned
+    message = StubMessage(user_id, "photo-1")
+
+    await handlers.process_screenshots([message])
+
+    ((text, markup),) = message.answers
+    assert text.startswith("✅ Скриншот получен! (Всего: 1)")
+    assert buttons(markup) == ["screenshots_done"]
+    rows = await db._fetchall("SELECT id, file_id FROM screenshots WHERE user_id = ? AND task_id = ?", (user_id, task_id))
+    assert [row["file_id"] for row in rows] == ["photo-1"]
+    # Загружается самое большое фото, в папку записи скриншота
+    (job,) = handlers.downloader.jobs
+    assert (job.file_id, job.screenshot_id, job.user_id) == ("photo-1", rows[0]["id"], user_id)
+
+async def test_album_is_acknowledged_once(handlers, db, assigned):
+    user_id, _ = assigned
+    messages = [StubMessage(user_id, f"photo-{i}", media_group_id="album") for i in range(3)]
+
+    await handlers.process_screenshots(messages)
+
+    # Ответ - на первое сообщение альбома, одним сообщением на всю пачку
+    ((text, markup),) = messages[0].answers
+    assert text.startswith("✅ Получено скриншотов: 3! (Всего: 3)")
+    assert buttons(markup) == ["screenshots_done"]
+    assert all(not message.answers for message in messages[1:])
+    assert len(handlers.downloader.jobs) == 3
+
+async def test_screenshot_without_task_is_rejected(handlers, db, participants):
+    (user_id,) = await participants(1)
+    message = StubMessage(user_id, "photo-1")
+
+    await handlers.process_screenshots([message])
+
+    assert message.answers == [("Сначала зарегистрируйтесь на участие в раздаче.", None)]
+    assert handlers.downloader.jobs == []
+
+@pytest.mark.parametrize("data", ["task_info_{id}_r_2", "task_info_{id}"])
+async def test_task_card_back_button(task_list, db, data):
+    task_id = await db.add_task("Раздача")
+    callback = StubCallback(data.format(id=task_id))
+
+    await task_list.task_info_handler(callback)
+
+    ((text, markup),) = callback.edits
+    assert text.startswith(f"📝 <b>Задание #{task_id}</b>")
+    # Кнопки старых сообщений (только id) возвращают на первую страницу активных
+    expected = "r_2" if data.endswith("_r_2") else "a_0"
+    assert buttons(markup) == [f"task_delete_{task_id}_{expected}", f"tl_{expected}"]
+
+async def test_task_delete_from_old_button(task_list, db):
+    task_id = await db.add_task("Раздача")
+    callback = StubCallback(f"task_delete_{task_id}")
+
+    await task_list.task_delete_handler(callback)
+
+    assert callback.alerts == ["✅ Задание удалено!"]
+    assert not (await db.get_task(task_id))["is_active"]
+    ((text, _),) = callback.edits
+    assert text.startswith("📋 <b>Список заданий</b>\n✅ Активные: 0")
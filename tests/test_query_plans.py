@@ -0,0 +1,22 @@
+import pytest
+
+from migrations import HOT_QUERIES, MIGRATIONS
+
+@pytest.mark.parametrize("query, params", HOT_QUERIES, ids=lambda value: " ".join(str(value).split())[:60])
+async def test_hot_query_uses_index(db, query, params):
+    plan = await db._fetchall(f"EXPLAIN QUERY PLAN {query}", params)
+    details = [step["detail"] for step in plan]
+    assert not any(detail.startswith("SCAN") or "TEMP B-TREE" in detail for detail in details), details
+
+async def test_find_table_scans_is_clean(db):
+    assert await db.find_table_scans() == []
+
+async def test_migrations_are_ordered_and_recorded(db):
+    versions = [version for version, _ in MIGRATIONS]
+    assert versions == sorted(versions) == list(range(1, len(versions) + 1))
+    assert await db._fetchvalue("PRAGMA user_version") == versions[-1]
+
+async def test_init_db_is_idempotent(db):
+    await db.close()
+    await db.init_db()
+    assert await db._fetchvalue("PRAGMA user_version") == MIGRATIONS[-1][0]
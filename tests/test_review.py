@@ -0,0 +1,52 @@
+import pytest
+
+from database import STATUS_TRANSITIONS
+
+async def test_move_to_review_only_from_task_assigned(db, participants):
+    task_id = await db.add_task("Раздача", max_participants=0)
+    (user_id,) = await participants(1)
+
+    # Без задания на проверку не попасть
+    assert not await db.move_to_review(user_id)
+    assert await db.claim_task_slot(user_id, task_id)
+    assert await db.move_to_review(user_id)
+    # Повторное «Готово» (двойное нажатие, старая кнопка) ничего не меняет
+    assert not await db.move_to_review(user_id)
+
+    assert await db.add_requisites(user_id, "card")
+    assert await db.apply_transition("pay", [user_id])
+    # Оплаченное участие не возвращается на проверку
+    assert not await db.move_to_review(user_id)
+    assert (await db.get_participant(user_id))["status"] == "paid"
+
+@pytest.mark.parametrize("action", sorted(STATUS_TRANSITIONS))
+async def test_transition_skips_other_statuses(db, participants, action):
+    task_id = await db.add_task("Раздача", max_participants=0)
+    assigned, in_review, pending_payment = await participants(3)
+    for user_id in (assigned, in_review, pending_payment):
+        assert await db.claim_task_slot(user_id, task_id)
+    for user_id in (in_review, pending_payment):
+        assert await db.move_to_review(user_id)
+    assert await db.add_requisites(pending_payment, "card")
+
+    sources, target = STATUS_TRANSITIONS[action]
+    changed = await db.apply_transition(action, [assigned, in_review, pending_payment])
+
+    expected = {
+        user_id for user_id, status in (
+            (assigned, "task_assigned"), (in_review, "pending_review"), (pending_payment, "pending_payment")
+        ) if status in sources
+    }
+    assert {row["user_id"] for row in changed} == expected
+    assert all(row["status"] == target for row in changed)
+    assert (await db.get_participant(assigned))["status"] == "task_assigned"
+
+async def test_requisites_only_while_reviewed(db, participants):
+    task_id = await db.add_task("Раздача", max_participants=0)
+    (user_id,) = await participants(1)
+    assert await db.claim_task_slot(user_id, task_id)
+
+    assert not await db.add_requisites(user_id, "card")
+    assert await db.move_to_review(user_id)
+    assert await db.apply_transition("reject", [user_id])
+    assert not await db.add_requisites(user_id, "card")
@@ -0,0 +1,52 @@
+from datetime import datetime
+
+import pytest
+
+from scheduler import QuotaScheduler
+
+NOW = "2026-06-01T12:00"
+
+@pytest.fixture
+def announced():
+    return []
+
+@pytest.fixture
+def scheduler(db, announced):
+    async def on_activate(task_id):
+        announced.append(task_id)
+
+    scheduler = QuotaScheduler(db, on_activate=on_activate)
+    scheduler.now = lambda: datetime.strptime(NOW, "%Y-%m-%dT%H:%M").replace(tzinfo=scheduler.tz)
+    return scheduler
+
+async def test_scheduled_task_is_announced_once(db, scheduler, announced):
+    task_id = await db.add_task("Раздача")
+    await db.schedule_task(task_id, "2026-06-01T11:00", None, "2026-06-01T10:00")
+    assert not (await db.get_task(task_id))["is_active"]
+
+    await scheduler._run_once()
+    await scheduler._run_once()
+
+    assert announced == [task_id]
+    task = await db.get_task(task_id)
+    assert (task["is_active"], task["starts_at"]) == (1, None)
+
+async def test_active_task_is_not_announced_again(db, scheduler, announced):
+    task_id = await db.add_task("Раздача")
+    # Время включения уже прошло, задание и так включено - объявлять нечего
+    await db.schedule_task(task_id, "2026-01-01T00:00", "2099-01-01T00:00", NOW)
+
+    assert await db.apply_task_timetable(NOW) == ([], [])
+    await scheduler._run_once()
+
+    assert announced == []
+    task = await db.get_task(task_id)
+    assert (task["is_active"], task["starts_at"], task["ends_at"]) == (1, None, "2099-01-01T00:00")
+
+async def test_task_is_deactivated_at_end(db, scheduler, announced):
+    task_id = await db.add_task("Раздача")
+    await db.schedule_task(task_id, None, "2026-06-01T11:00", "2026-06-01T10:00")
+
+    assert await db.apply_task_timetable(NOW) == ([], [task_id])
+    assert not (await db.get_task(task_id))["is_active"]
+    assert await db.apply_task_timetable(NOW) == ([], [])
@@ -0,0 +1,78 @@
+import os
+import sqlite3
+
+import pytest
+from PIL import Image
+
+from database import Database
+from migrations import MIGRATIONS
+from thumbnails import SHEET_MAX_TILES, ContactSheetCache
+
+# Telegram не принимает фото, у которого сумма сторон больше этого
+TELEGRAM_PHOTO_MAX_SIDES = 10000
+
+@pytest.fixture
+def make_screenshots(tmp_path):
+    """Фабрика записей скриншотов с файлами-картинками"""
+    folder = tmp_path / "screenshots"
+    folder.mkdir()
+
+    def create(count: int, start: int = 1):
+        screenshots = []
+        for screenshot_id in range(start, start + count):
+            path = folder / f"{screenshot_id}.jpg"
+            Image.new("RGB", (540, 1170), (screenshot_id % 256, 80, 160)).save(path)
+            screenshots.append({"id": screenshot_id, "content_hash": f"hash{screenshot_id}", "file_path": str(path)})
+        return screenshots
+
+    return create
+
+async def test_large_set_is_split_into_sheets(tmp_path, make_screenshots):
+    cache = ContactSheetCache(str(tmp_path / "cache"))
+    screenshots = make_screenshots(SHEET_MAX_TILES * 2 + 5)
+
+    key, paths = await cache.get_sheets(1, 1, screenshots)
+
+    assert len(paths) == 3
+    for path in paths:
+        with Image.open(path) as sheet:
+            assert sheet.width + sheet.height <= TELEGRAM_PHOTO_MAX_SIDES
+            assert max(sheet.size) / min(sheet.size) <= 20
+    assert key == cache.sheet_key(screenshots)
+
+async def test_new_screenshot_replaces_old_sheets(tmp_path, make_screenshots):
+    cache = ContactSheetCache(str(tmp_path / "cache"))
+    screenshots = make_screenshots(SHEET_MAX_TILES + 1)
+    _, old_paths = await cache.get_sheets(1, 1, screenshots)
+
+    _, new_paths = await cache.get_sheets(1, 1, screenshots + make_screenshots(1, start=100))
+
+    assert len(new_paths) == 2 and set(new_paths).isdisjoint(old_paths)
+    assert sorted(p.name for p in (tmp_path / "cache" / "sheets").iterdir()) == sorted(map(os.path.basename, new_paths))
+
+async def test_sheet_file_ids_roundtrip(db):
+    assert await db.get_sheet_file_ids(1, 1, "key") is None
+    await db.save_sheet_file_ids(1, 1, "key", ["a", "b"])
+    assert await db.get_sheet_file_ids(1, 1, "key") == ["a", "b"]
+    # Другой набор скриншотов - другой ключ, старые file_id не подходят
+    assert await db.get_sheet_file_ids(1, 1, "other") is None
+
+async def test_single_file_ids_are_migrated(tmp_path):
+    path = str(tmp_path / "old.db")
+    connection = sqlite3.connect(path)
+    for version, statements in MIGRATIONS:
+        if version > 11:
+            break
+        for statement in statements:
+            connection.execute(statement)
+    connection.execute("PRAGMA user_version = 11")
+    connection.execute("INSERT INTO contact_sheets (user_id, task_id, sheet_key, file_id) VALUES (1, 1, 'key', 'old')")
+    connection.commit()
+    connection.close()
+
+    db = Database(path)
+    await db.init_db()
+    try:
+        assert await db.get_sheet_file_ids(1, 1, "key") == ["old"]
+    finally:
+        await db.close()
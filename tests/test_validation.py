@@ -0,0 +1,76 @@
+import time
+
+import pytest
+from PIL import Image
+
+import validation
+from validation import VERDICT_OK, VERDICT_REJECTED, VERDICT_UNKNOWN, ScreenshotValidator
+
+def hang(path):
+    """Проверка, которая никогда не заканчивается вовремя (выполняется в дочернем процессе)"""
+    time.sleep(60)
+
+@pytest.fixture
+def images(tmp_path):
+    screenshot = tmp_path / "screenshot.jpg"
+    Image.effect_noise((1080, 2340), 50).convert("RGB").save(screenshot, quality=85)
+    photo = tmp_path / "photo.jpg"
+    Image.effect_noise((2000, 1500), 50).convert("RGB").save(photo, quality=85)
+    blank = tmp_path / "blank.png"
+    Image.new("RGB", (1080, 2340), "white").save(blank)
+    tiny = tmp_path / "tiny.jpg"
+    tiny.write_bytes(b"\xff\xd8" + b"0" * 100)
+    return {"screenshot": str(screenshot), "photo": str(photo), "blank": str(blank), "tiny": str(tiny)}
+
+@pytest.fixture
+def validator():
+    validator = ScreenshotValidator(workers=1, timeout=30)
+    validator.start()
+    yield validator
+    validator.stop()
+
+async def test_verdicts(validator, images):
+    assert (await validator.validate(images["screenshot"]))["verdict"] == VERDICT_OK
+    photo = await validator.validate(images["photo"])
+    assert (photo["verdict"], photo["reason"]) == (VERDICT_REJECTED, "не похоже на скриншот телефона")
+    assert (await validator.validate(images["tiny"]))["reason"] == "файл слишком маленький"
+    # Белый PNG сжимается до нескольких КБ - отклоняется ещё по размеру файла
+    assert (await validator.validate(images["blank"]))["verdict"] == VERDICT_REJECTED
+
+async def test_pool_uses_spawn(validator):
+    assert validator._executor._mp_context.get_start_method() == "spawn"
+
+async def test_hung_workers_are_replaced(validator, images, monkeypatch):
+    validator.timeout = 0.5
+    # Пул запускает процессы при первой задаче: сначала обычная проверка
+    assert (await validator.validate(images["screenshot"]))["verdict"] == VERDICT_OK
+    old_executor = validator._executor
+    old_processes = list(old_executor._processes.values())
+
+    monkeypatch.setattr(validation, "validate_image", hang)
+    result = await validator.validate(images["screenshot"])
+    monkeypatch.undo()
+
+    assert result["verdict"] == VERDICT_UNKNOWN
+    # Единственный процесс завис - пул заменён, старый процесс завершён
+    assert validator._executor is not old_executor
+    for process in old_processes:
+        process.join(timeout=5)
+        assert not process.is_alive()
+    validator.timeout = 30
+    assert (await validator.validate(images["screenshot"]))["verdict"] == VERDICT_OK
+
+async def test_single_timeout_keeps_pool(images, monkeypatch):
+    validator = ScreenshotValidator(workers=2, timeout=0.5)
+    validator.start()
+    try:
+        executor = validator._executor
+        monkeypatch.setattr(validation, "validate_image", hang)
+        assert (await validator.validate(images["screenshot"]))["verdict"] == VERDICT_UNKNOWN
+        # Один процесс из двух ещё свободен - пул не трогаем
+        assert validator._executor is executor
+        assert validator._timeouts == 1
+    finally:
+        for process in list(validator._executor._processes.values()):
+            process.terminate()
+        validator.stop()
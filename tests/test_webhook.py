@@ -0,0 +1,139 @@
+import asyncio
+import time
+
+import pytest
+from aiogram import Bot
+from aiohttp.test_utils import TestClient, TestServer
+
+from webhook import SECRET_HEADER, WebhookServer
+
+class FakeDispatcher:
+    """Вместо aiogram-диспетчера: записывает порядок обработки и число одновременных обновлений"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.delays = {}
+        self.handled = []
+        self.active = 0
+        self.max_active = 0
+        self.finished_at = {}
+
+    async def feed_update(self, bot, update):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delays.get(update.message.from_user.id, self.delay))
+        finally:
+            self.active -= 1
+        self.handled.append((update.message.from_user.id, update.update_id))
+        self.finished_at[update.update_id] = time.monotonic()
+
+def make_update(update_id: int, user_id: int) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": f"User {user_id}"},
+            "text": str(update_id),
+        },
+    }
+
+@pytest.fixture
+async def bot():
+    bot = Bot("1:a")
+    try:
+        yield bot
+    finally:
+        await bot.session.close()
+
+@pytest.fixture
+async def webhook(bot):
+    """Поднять WebhookServer на локальном порту и вернуть (server, dispatcher, client)"""
+    started = []
+
+    async def start(dispatcher=None, **kwargs):
+        dispatcher = dispatcher or FakeDispatcher()
+        server = WebhookServer(dispatcher, bot, **kwargs)
+        client = TestClient(TestServer(server.create_app()))
+        await client.start_server()
+        started.append((server, client))
+        return server, dispatcher, client
+
+    yield start
+    for server, client in started:
+        await server.stop()
+        await client.close()
+
+async def post(client, update_id, user_id, **headers):
+    response = await client.post("/webhook", json=make_update(update_id, user_id), headers=headers)
+    return response.status
+
+async def test_updates_of_one_user_keep_order(webhook):
+    server, dispatcher, client = await webhook(FakeDispatcher(delay=0.01))
+    statuses = [await post(client, update_id, 1) for update_id in range(1, 21)]
+    await server.stop()
+    assert statuses == [200] * 20
+    assert [update_id for _, update_id in dispatcher.handled] == list(range(1, 21))
+
+async def test_in_flight_limit(webhook):
+    server, dispatcher, client = await webhook(FakeDispatcher(delay=0.02), max_in_flight=5)
+    statuses = await asyncio.gather(*(post(client, user_id, user_id) for user_id in range(1, 51)))
+    await server.stop()
+    assert statuses == [200] * 50
+    assert len(dispatcher.handled) == 50
+    assert dispatcher.max_active == 5
+
+async def test_busy_user_does_not_starve_others(webhook):
+    dispatcher = FakeDispatcher()
+    dispatcher.delays = {1: 0.05, 2: 0}
+    server, dispatcher, client = await webhook(dispatcher, max_in_flight=2)
+    # Пользователь 1 присылает пачку медленных обновлений, затем приходит пользователь 2
+    for update_id in range(1, 11):
+        assert await post(client, update_id, 1) == 200
+    started = time.monotonic()
+    assert await post(client, 100, 2) == 200
+    assert time.monotonic() - started < 0.05
+    await server.stop()
+    # Обновление пользователя 2 обработано, не дожидаясь всей очереди пользователя 1
+    assert dispatcher.finished_at[100] < dispatcher.finished_at[3]
+
+async def test_user_queue_is_capped(webhook):
+    server, dispatcher, client = await webhook(FakeDispatcher(delay=0.05), max_user_queue=3)
+    statuses = [await post(client, update_id, 1) for update_id in range(1, 6)]
+    # Другой пользователь в это время обслуживается как обычно
+    assert await post(client, 100, 2) == 200
+    await server.stop()
+    assert statuses == [200, 200, 200, 429, 429]
+    assert server.stats()["rejected"] == 2
+    assert sorted(update_id for _, update_id in dispatcher.handled) == [1, 2, 3, 100]
+
+async def test_backlog_is_capped(webhook):
+    server, dispatcher, client = await webhook(FakeDispatcher(delay=0.05), max_in_flight=2, max_backlog=4)
+    statuses = [await post(client, user_id, user_id) for user_id in range(1, 7)]
+    await server.stop()
+    assert statuses == [200] * 4 + [503] * 2
+
+async def test_secret_token(webhook):
+    server, dispatcher, client = await webhook(secret_token="s3cret")
+    assert await post(client, 1, 1) == 401
+    assert await post(client, 2, 1, **{SECRET_HEADER: "wrong"}) == 401
+    assert await post(client, 3, 1, **{SECRET_HEADER: "s3cret"}) == 200
+    await server.stop()
+    assert dispatcher.handled == [(1, 3)]
+
+async def test_bad_update(webhook):
+    server, dispatcher, client = await webhook()
+    response = await client.post("/webhook", data=b"not json")
+    assert response.status == 400
+
+async def test_stop_drains_accepted_updates(webhook):
+    server, dispatcher, client = await webhook(FakeDispatcher(delay=0.01))
+    for update_id in range(1, 11):
+        assert await post(client, update_id, update_id % 3) == 200
+    await server.stop()
+    assert len(dispatcher.handled) == 10
+    assert server.stats()["in_flight"] == 0
+    # После остановки новые обновления не принимаются, Telegram повторит их позже
+    assert await post(client, 11, 1) == 503
@@ -0,0 +1,81 @@
+"""
+Защита от флуда
+
+Middleware отсекает повторные нажатия и команды до того, как обработчик
+обратится к БД. Ограничения задаются флагами обработчика:
+- throttle - минимальный интервал между вызовами обработчика одним
+  пользователем (секунды);
+- dedup - не запускать обработчик, пока предыдущий вызов этого
+  пользователя ещё выполняется.
+Отклонённые нажатия кнопок сразу получают ответ из памяти. Записи о
+вызовах устаревают и удаляются, поэтому память ограничена числом
+активных пользователей. Админы ограничениям не подвержены.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, Set, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import CallbackQuery, TelegramObject
+
+Key = Tuple[int, str]
+
+class ThrottlingMiddleware(BaseMiddleware):
+    def __init__(self, admin_ids: Iterable[int] = (), ttl: float = 60.0):
+        self.admin_ids = set(admin_ids)
+        # Записи старше ttl удаляются (ttl должен быть не меньше самого большого throttle)
+        self.ttl = ttl
+        # (user_id, обработчик) -> время последнего принятого вызова, старые записи в начале
+        self._last_call: "OrderedDict[Key, float]" = OrderedDict()
+        self._in_flight: Set[Key] = set()
+        self.throttled = 0
+
+    def _expire(self, now: float):
+        while self._last_call:
+            key, called_at = next(iter(self._last_call.items()))
+            if now - called_at < self.ttl:
+                break
+            del self._last_call[key]
+
+    async def _reject(self, event: TelegramObject, text: str):
+        self.throttled += 1
+        # Кнопку нужно «отпустить», иначе у пользователя крутятся часики
+        if isinstance(event, CallbackQuery):
+            await event.answer(text)
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        interval = get_flag(data, "throttle")
+        dedup = get_flag(data, "dedup", default=False)
+        user = data.get("event_from_user")
+        if (interval is None and not dedup) or user is None or user.id in self.admin_ids:
+            return await handler(event, data)
+
+        key = (user.id, data["handler"].callback.__name__)
+        if dedup and key in self._in_flight:
+            await self._reject(event, "⏳ Ваш запрос уже обрабатывается")
+            return None
+
+        now = time.monotonic()
+        self._expire(now)
+        if interval is not None:
+            called_at = self._last_call.get(key)
+            if called_at is not None and now - called_at < interval:
+                await self._reject(event, "⏳ Слишком часто, подождите немного")
+                return None
+            self._last_call[key] = now
+            self._last_call.move_to_end(key)
+
+        if not dedup:
+            return await handler(event, data)
+        self._in_flight.add(key)
+        try:
+            return await handler(event, data)
+        finally:
+            self._in_flight.discard(key)
@@ -0,0 +1,105 @@
+"""
+Превью скриншотов для админов
+
+Вместо отправки каждого скриншота целиком админ получает сводную
+картинку (contact sheet) со всеми скриншотами участника по заданию.
+Telegram не принимает фото, у которого сумма сторон больше 10000 пикселей,
+поэтому на одном листе не больше SHEET_MAX_TILES превью, а большие наборы
+делятся на несколько листов.
+Превью и сводные картинки строятся по запросу и кэшируются на диске:
+превью - по хэшу содержимого, сводная картинка - по набору скриншотов,
+поэтому новый скриншот автоматически даёт новый ключ.
+"""
+
+import asyncio
+import glob
+import hashlib
+import os
+from typing import Dict, List, Tuple
+
+from PIL import Image
+
+THUMB_SIZE = (240, 520)
+SHEET_COLUMNS = 4
+SHEET_PADDING = 8
+# 6 рядов по 4 превью: лист 1000 x 3176 пикселей
+SHEET_MAX_TILES = 24
+
+def build_thumbnail(source: str, dest: str):
+    """Уменьшенная копия скриншота"""
+    with Image.open(source) as image:
+        image = image.convert("RGB")
+        image.thumbnail(THUMB_SIZE)
+        tmp_path = f"{dest}.part"
+        image.save(tmp_path, "JPEG", quality=80)
+    os.replace(tmp_path, dest)
+
+def build_contact_sheet(thumbnails: List[str], dest: str):
+    """Склеить превью в одну картинку по сетке"""
+    columns = min(SHEET_COLUMNS, len(thumbnails))
+    rows = (len(thumbnails) + columns - 1) // columns
+    cell_w, cell_h = THUMB_SIZE
+    sheet = Image.new(
+        "RGB",
+        (columns * (cell_w + SHEET_PADDING) + SHEET_PADDING, rows * (cell_h + SHEET_PADDING) + SHEET_PADDING),
+        "white",
+    )
+    for index, path in enumerate(thumbnails):
+        with Image.open(path) as thumb:
+            x = SHEET_PADDING + (index % columns) * (cell_w + SHEET_PADDING)
+            y = SHEET_PADDING + (index // columns) * (cell_h + SHEET_PADDING)
+            # Центрируем превью в ячейке
+            sheet.paste(thumb, (x + (cell_w - thumb.width) // 2, y + (cell_h - thumb.height) // 2))
+    tmp_path = f"{dest}.part"
+    sheet.save(tmp_path, "JPEG", quality=85)
+    os.replace(tmp_path, dest)
+
+class ContactSheetCache:
+    def __init__(self, cache_dir: str):
+        self.thumbs_dir = os.path.join(cache_dir, "thumbs")
+        self.sheets_dir = os.path.join(cache_dir, "sheets")
+        os.makedirs(self.thumbs_dir, exist_ok=True)
+        os.makedirs(self.sheets_dir, exist_ok=True)
+
+    @staticmethod
+    def sheet_key(screenshots: List[Dict]) -> str:
+        """Ключ набора скриншотов: меняется при добавлении любого нового скриншота"""
+        digest = hashlib.sha1()
+        for screenshot in sorted(screenshots, key=lambda s: s["id"]):
+            digest.update(f"{screenshot['id']}:{screenshot['content_hash']};".encode())
+        return digest.hexdigest()[:16]
+
+    def _build(self, user_id: int, task_id: int, key: str, screenshots: List[Dict]) -> List[str]:
+        screenshots = sorted(screenshots, key=lambda s: s["id"])
+        parts = [
+            screenshots[start:start + SHEET_MAX_TILES]
+            for start in range(0, len(screenshots), SHEET_MAX_TILES)
+        ]
+        sheet_paths = [
+            os.path.join(self.sheets_dir, f"{user_id}_{task_id}_{key}_{index}.jpg")
+            for index in range(len(parts))
+        ]
+
+        for part, sheet_path in zip(parts, sheet_paths):
+            if os.path.exists(sheet_path):
+                continue
+            thumbnails = []
+            for screenshot in part:
+                thumb_path = os.path.join(self.thumbs_dir, f"{screenshot['content_hash']}.jpg")
+                if not os.path.exists(thumb_path):
+                    build_thumbnail(screenshot["file_path"], thumb_path)
+                thumbnails.append(thumb_path)
+            build_contact_sheet(thumbnails, sheet_path)
+
+        # Старые сводные картинки этого участника больше не нужны
+        for old_path in glob.glob(os.path.join(self.sheets_dir, f"{user_id}_{task_id}_*.jpg")):
+            if old_path not in sheet_paths:
+                os.remove(old_path)
+        return sheet_paths
+
+    async def get_sheets(self, user_id: int, task_id: int, screenshots: List[Dict]) -> Tuple[str, List[str]]:
+        """Вернуть (ключ, пути листов) сводной картинки, построив её при необходимости"""
+        key = self.sheet_key(screenshots)
+        loop = asyncio.get_running_loop()
+        paths = await loop.run_in_executor(None, self._build, user_id, task_id, key, screenshots)
+        return key, paths
@@ -0,0 +1,151 @@
+"""
+Проверка скриншотов в пуле процессов
+
+Декодирование картинок занимает процессор, поэтому выполняется в
+ProcessPoolExecutor, а не в цикле событий. Проверяются размер файла,
+разрешение, соотношение сторон (скриншот телефона, а не фото) и
+признаки пустой или размытой картинки. Заодно считается перцептивный
+хэш, чтобы не декодировать картинку второй раз.
+
+Процессы пула запускаются через spawn, а не fork: у бота есть потоки
+(соединения aiosqlite, пул потоков), и копия процесса, снятая fork посреди
+их работы, может зависнуть на унаследованной блокировке. Дочерний процесс
+импортирует модуль запуска бота заново, поэтому на уровне модуля там не
+должно быть действий кроме создания объектов.
+
+Проверка, не уложившаяся в timeout, получает вердикт unknown, но её процесс
+продолжает работать и занимает место в пуле. Если подряд зависло столько
+проверок, сколько процессов в пуле, пул заменяется новым, а процессы старого
+завершаются.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+
+from PIL import Image, ImageFilter, ImageStat
+
+logger = logging.getLogger(__name__)
+
+# Границы проверок
+MIN_FILE_SIZE = 10 * 1024
+MAX_FILE_SIZE = 20 * 1024 * 1024
+MIN_SIDE = 480
+# Отношение длинной стороны к короткой у скриншотов телефонов ~1.8-2.3, у фото 1.33-1.5
+MIN_ASPECT = 1.5
+MAX_ASPECT = 2.8
+# Стандартное отклонение яркости ниже порога - картинка почти однотонная
+BLANK_STDDEV = 6.0
+# Дисперсия контуров ниже порога - картинка размыта
+BLUR_VARIANCE = 40.0
+
+VERDICT_OK = "ok"
+VERDICT_REJECTED = "rejected"
+# Проверка не завершилась (таймаут/ошибка) - оставляем на ручную проверку
+VERDICT_UNKNOWN = "unknown"
+
+def image_dhash(image: Image.Image, hash_size: int = 8) -> Optional[str]:
+    """Разностный перцептивный хэш (64 бита в hex)"""
+    pixels = list(image.resize((hash_size + 1, hash_size), Image.LANCZOS).getdata())
+    bits = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            bits = (bits << 1) | (left > right)
+    # У однотонных картинок хэш вырожден и совпадал бы у всех - такие не сравниваем
+    if bits == 0 or bits == (1 << hash_size * hash_size) - 1:
+        return None
+    return f"{bits:0{hash_size * hash_size // 4}x}"
+
+def _verdict(verdict: str, reason: Optional[str] = None, phash: Optional[str] = None) -> Dict:
+    return {"verdict": verdict, "reason": reason, "phash": phash}
+
+def validate_image(path: str) -> Dict:
+    """Проверить картинку (выполняется в дочернем процессе)"""
+    size = os.path.getsize(path)
+    if size < MIN_FILE_SIZE:
+        return _verdict(VERDICT_REJECTED, "файл слишком маленький")
+    if size > MAX_FILE_SIZE:
+        return _verdict(VERDICT_REJECTED, "файл слишком большой")
+
+    try:
+        with Image.open(path) as image:
+            width, height = image.size
+            gray = image.convert("L")
+    except OSError:
+        return _verdict(VERDICT_REJECTED, "файл не является изображением")
+
+    phash = image_dhash(gray)
+    if min(width, height) < MIN_SIDE:
+        return _verdict(VERDICT_REJECTED, "слишком низкое разрешение", phash)
+
+    aspect = max(width, height) / min(width, height)
+    if not MIN_ASPECT <= aspect <= MAX_ASPECT:
+        return _verdict(VERDICT_REJECTED, "не похоже на скриншот телефона", phash)
+
+    # Для эвристик достаточно уменьшенной копии
+    gray.thumbnail((512, 512))
+    if ImageStat.Stat(gray).stddev[0] < BLANK_STDDEV:
+        return _verdict(VERDICT_REJECTED, "пустое изображение", phash)
+    edges = gray.filter(ImageFilter.FIND_EDGES)
+    if ImageStat.Stat(edges).var[0] < BLUR_VARIANCE:
+        return _verdict(VERDICT_REJECTED, "изображение размыто", phash)
+
+    return _verdict(VERDICT_OK, phash=phash)
+
+class ScreenshotValidator:
+    def __init__(self, workers: int = 2, timeout: float = 10.0):
+        self.workers = workers
+        self.timeout = timeout
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # Таймауты подряд в текущем пуле
+        self._timeouts = 0
+
+    def start(self):
+        """Запустить пул процессов"""
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+        )
+        self._timeouts = 0
+
+    def stop(self):
+        """Остановить пул процессов"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def _recycle(self):
+        """Заменить пул, все процессы которого заняты зависшими проверками"""
+        old = self._executor
+        # Снимок до shutdown: после него пул перестаёт отслеживать процессы
+        processes = list((old._processes or {}).values())
+        self.start()
+        old.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            process.terminate()
+
+    async def validate(self, path: str) -> Dict:
+        """Проверить картинку, не блокируя цикл событий"""
+        loop = asyncio.get_running_loop()
+        executor = self._executor
+        try:
+            result = await asyncio.wait_for(
+                loop.run_in_executor(executor, validate_image, path), self.timeout
+            )
+        except asyncio.TimeoutError:
+            # Таймауты проверок, отправленных в уже заменённый пул, не считаем
+            if executor is self._executor:
+                self._timeouts += 1
+                if self._timeouts >= self.workers:
+                    logger.warning("Зависли все процессы проверки скриншотов, пул перезапускается")
+                    self._recycle()
+            return _verdict(VERDICT_UNKNOWN, "превышено время проверки")
+        except Exception as e:
+            return _verdict(VERDICT_UNKNOWN, f"ошибка проверки: {e}")
+        if executor is self._executor:
+            self._timeouts = 0
+        return result
@@ -0,0 +1,191 @@
+"""
+Приём обновлений через вебхук
+
+Вместо long polling Telegram сам присылает обновления POST-запросами на
+aiohttp-сервер. Обновления обрабатываются параллельно, но не более
+max_in_flight одновременно. Обновления одного пользователя выполняются
+строго по очереди, в порядке поступления; место в общем лимите занимается
+только когда подошла очередь обновления, поэтому поток сообщений от одного
+пользователя не задерживает остальных. Очередь пользователя ограничена
+max_user_queue обновлениями, общая очередь - max_backlog: сверх этого
+сервер отвечает 429/503, и Telegram повторяет доставку позже.
+При остановке сервер перестаёт принимать новые обновления и дожидается
+обработки уже принятых.
+"""
+
+import asyncio
+import logging
+import signal
+from contextlib import suppress
+from typing import Dict, Optional, Set
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+class _UserQueue:
+    """Очередь обновлений одного пользователя"""
+    __slots__ = ("lock", "refs")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.refs = 0
+
+class WebhookServer:
+    def __init__(
+        self,
+        dispatcher: Dispatcher,
+        bot: Bot,
+        path: str = "/webhook",
+        secret_token: Optional[str] = None,
+        max_in_flight: int = 100,
+        max_user_queue: int = 20,
+        max_backlog: Optional[int] = None,
+        drain_timeout: float = 30.0,
+    ):
+        self.dispatcher = dispatcher
+        self.bot = bot
+        self.path = path
+        self.secret_token = secret_token
+        self.max_in_flight = max_in_flight
+        self.max_user_queue = max_user_queue
+        self.max_backlog = max_backlog if max_backlog is not None else max_in_flight * 10
+        self.drain_timeout = drain_timeout
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._users: Dict[int, _UserQueue] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._runner: Optional[web.AppRunner] = None
+        self._closing = False
+        self._processed = 0
+        self._failed = 0
+        self._rejected = 0
+
+    def create_app(self) -> web.Application:
+        """aiohttp-приложение с обработчиком вебхука"""
+        app = web.Application()
+        app.router.add_post(self.path, self._handle)
+        return app
+
+    async def start(self, host: str, port: int):
+        """Начать принимать обновления"""
+        self._closing = False
+        self._runner = web.AppRunner(self.create_app())
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        logger.info("Вебхук слушает %s:%s%s", host, port, self.path)
+
+    async def stop(self):
+        """Перестать принимать обновления и дождаться обработки принятых"""
+        self._closing = True
+        if self._tasks:
+            _, pending = await asyncio.wait(set(self._tasks), timeout=self.drain_timeout)
+            if pending:
+                logger.warning("Не дождались обработки %s обновлений", len(pending))
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def stats(self) -> Dict:
+        """Метрики для мониторинга"""
+        return {
+            "in_flight": len(self._tasks),
+            "processed": self._processed,
+            "failed": self._failed,
+            "rejected": self._rejected,
+        }
+
+    async def run(self, url: str, host: str, port: int):
+        """Зарегистрировать вебхук и обрабатывать обновления до SIGINT/SIGTERM"""
+        stop_signal = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        with suppress(NotImplementedError):
+            # На Windows обработчики сигналов не поддерживаются
+            loop.add_signal_handler(signal.SIGTERM, stop_signal.set)
+            loop.add_signal_handler(signal.SIGINT, stop_signal.set)
+
+        await self.dispatcher.emit_startup(bot=self.bot, dispatcher=self.dispatcher)
+        try:
+            await self.start(host, port)
+            await self.bot.set_webhook(
+                url,
+                secret_token=self.secret_token,
+                allowed_updates=self.dispatcher.resolve_used_update_types(),
+                max_connections=self.max_in_flight,
+            )
+            await stop_signal.wait()
+        finally:
+            await self.stop()
+            try:
+                await self.dispatcher.emit_shutdown(bot=self.bot, dispatcher=self.dispatcher)
+            finally:
+                await self.bot.session.close()
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        if self.secret_token and request.headers.get(SECRET_HEADER) != self.secret_token:
+            return web.Response(status=401)
+        if self._closing:
+            # Telegram повторит доставку после перезапуска
+            return web.Response(status=503)
+        try:
+            update = Update.model_validate(await request.json(), context={"bot": self.bot})
+        except ValueError:
+            return web.Response(status=400)
+
+        if len(self._tasks) >= self.max_backlog:
+            self._rejected += 1
+            return web.Response(status=503)
+        user_id = self._user_id(update)
+        if user_id is not None:
+            # Регистрируемся в очереди пользователя сразу, чтобы сохранить порядок поступления
+            queue = self._users.get(user_id)
+            if queue is None:
+                queue = self._users[user_id] = _UserQueue()
+            elif queue.refs >= self.max_user_queue:
+                # Пользователь присылает быстрее, чем мы обрабатываем: Telegram повторит позже
+                self._rejected += 1
+                return web.Response(status=429)
+            queue.refs += 1
+        task = asyncio.create_task(self._process(update, user_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return web.Response()
+
+    @staticmethod
+    def _user_id(update: Update) -> Optional[int]:
+        try:
+            user = getattr(update.event, "from_user", None)
+        except Exception:
+            return None
+        return user.id if user is not None else None
+
+    async def _process(self, update: Update, user_id: Optional[int]):
+        if user_id is None:
+            async with self._slots:
+                await self._feed(update)
+            return
+        queue = self._users[user_id]
+        try:
+            # asyncio.Lock отдаёт блокировку ожидающим по порядку (FIFO); место в общем
+            # лимите занимаем только под ней, чтобы очередь одного пользователя не держала слоты
+            async with queue.lock:
+                async with self._slots:
+                    await self._feed(update)
+        finally:
+            queue.refs -= 1
+            if queue.refs == 0:
+                del self._users[user_id]
+
+    async def _feed(self, update: Update):
+        try:
+            await self.dispatcher.feed_update(self.bot, update)
+            self._processed += 1
+        except Exception:
+            self._failed += 1
+            logger.exception("Ошибка обработки обновления %s", update.update_id)